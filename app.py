@@ -6,20 +6,90 @@ from flask import (
     url_for,
     session,
     flash,
-    send_from_directory,
     jsonify,
-    abort
+    abort,
+    g,
+    has_request_context,
+    send_file,
 )
 from flask_socketio import SocketIO, emit, join_room
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.exceptions import (
+    ClientDisconnected,
+    NotFound,
+    RequestedRangeNotSatisfiable,
+)
+from markupsafe import Markup, escape
+from message_bus import socketio_queue_options
+from migrations import (
+    ARCHIVE_STATS_QUERY,
+    LATEST_VERSION,
+    rebuild_archive_stats,
+    rebuild_chat_counters,
+    rebuild_chat_summary,
+    rebuild_messages_fts,
+    schema_version,
+    upgrade_database,
+    verify_chat_counters,
+)
+import static_assets
+
+try:
+    import thumbnails
+except ImportError:  # без Pillow миниатюры не строятся, отдаются оригиналы
+    thumbnails = None
+try:
+    import brotli
+except ImportError:  # без brotli страницы из кэша отдаются в gzip
+    brotli = None
+try:
+    import fcntl
+except ImportError:  # не POSIX: хранилище блокируется только внутри процесса
+    fcntl = None
 import sqlite3
+import base64
+import hashlib
+import secrets
+import mimetypes
+import tempfile
+import json
+import gzip
 from datetime import datetime, timezone, timedelta
 import os
-from werkzeug.utils import secure_filename
+import re
+import unicodedata
+import threading
+import queue
+import multiprocessing
+import atexit
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+import click
 
 app = Flask(__name__)
 app.secret_key = "super_secret_arkonix_key"
-socketio = SocketIO(app, cors_allowed_origins="*")
+
+# Шина для рассылки событий Socket.IO между воркерами (см. message_bus.py)
+app.config["SOCKETIO_MESSAGE_QUEUE"] = os.environ.get("ARKONIX_SOCKETIO_QUEUE", "")
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    **socketio_queue_options(app.config["SOCKETIO_MESSAGE_QUEUE"]),
+)
+
+# ==================== БАЗА ДАННЫХ ====================
+
+app.config["DATABASE"] = os.environ.get("ARKONIX_DATABASE", "database.db")
+app.config["DB_POOL_SIZE"] = int(os.environ.get("ARKONIX_DB_POOL_SIZE", 16))
+app.config["DB_BUSY_TIMEOUT_MS"] = 5000
+app.config["DB_MMAP_SIZE"] = 256 * 1024 * 1024
+app.config["DB_CACHE_SIZE_KB"] = 32 * 1024
+app.config["DB_STATEMENT_CACHE"] = 512
+# Применять миграции при запуске; при выключенном — только `flask migrate`
+app.config["AUTO_MIGRATE"] = os.environ.get("ARKONIX_AUTO_MIGRATE", "1") != "0"
 
 
 UPLOAD_FOLDER = "uploads/contracts"
@@ -37,6 +107,66 @@ CHAT_ATTACHMENTS_FOLDER = "uploads/chat_attachments"
 app.config["CHAT_ATTACHMENTS_FOLDER"] = CHAT_ATTACHMENTS_FOLDER
 os.makedirs(CHAT_ATTACHMENTS_FOLDER, exist_ok=True)
 
+COMPANY_ARCHIVE_FOLDER = "uploads/company_archive"
+app.config["COMPANY_ARCHIVE_FOLDER"] = COMPANY_ARCHIVE_FOLDER
+os.makedirs(COMPANY_ARCHIVE_FOLDER, exist_ok=True)
+
+# Общее хранилище загрузок по содержимому: uploads/blobs/ab/cd/<sha256>
+BLOBS_FOLDER = "uploads/blobs"
+app.config["BLOBS_FOLDER"] = BLOBS_FOLDER
+app.config["BLOB_GC_GRACE"] = 600
+os.makedirs(os.path.join(BLOBS_FOLDER, "tmp"), exist_ok=True)
+
+# Загрузка частями: лимит размера файла на развёртывание (одиночный
+# multipart-запрос по-прежнему ограничен MAX_CONTENT_LENGTH)
+PARTIAL_UPLOADS_FOLDER = "uploads/partial"
+app.config["PARTIAL_UPLOADS_FOLDER"] = PARTIAL_UPLOADS_FOLDER
+app.config["UPLOAD_MAX_SIZE"] = int(
+    os.environ.get("ARKONIX_UPLOAD_MAX_SIZE", 2 * 1024 * 1024 * 1024)
+)
+app.config["UPLOAD_CHUNK_SIZE"] = 8 * 1024 * 1024
+app.config["UPLOAD_SESSION_TTL"] = 24 * 3600
+os.makedirs(PARTIAL_UPLOADS_FOLDER, exist_ok=True)
+
+# Папка загрузок -> (каталог старых файлов, таблица, столбец с именем файла)
+UPLOAD_FOLDERS = {
+    "contracts": (UPLOAD_FOLDER, "team_members", "contract_filename"),
+    "staff_documents": (STAFF_DOCUMENTS_FOLDER, "staff_documents", "filename"),
+    "chat_attachments": (CHAT_ATTACHMENTS_FOLDER, "messages", "attachment_filename"),
+    "company_archive": (COMPANY_ARCHIVE_FOLDER, "company_archive", "filename"),
+}
+
+# Миниатюры изображений-вложений лежат рядом с оригиналом: <файл>.w<ширина>.webp
+app.config["THUMBNAIL_WIDTHS"] = (160, 320, 640)
+app.config["THUMBNAIL_DEFAULT_WIDTH"] = 320
+app.config["THUMBNAIL_WORKERS"] = int(os.environ.get("ARKONIX_THUMBNAIL_WORKERS", 2))
+THUMBNAIL_SOURCE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp", "bmp"}
+
+# Кэширование отдаваемых файлов по папке: (max-age в секундах, immutable).
+# Ответы private — файлы доступны только после входа (кроме собранной статики,
+# см. static_asset); при max-age 0 браузер перепроверяет файл по ETag и
+# получает 304 без тела, при None — не сохраняет ответ вовсе.
+# Политику папки вызывающий код может заменить (send_stored_file(policy=...)),
+# если файл отдаётся временно под чужим адресом.
+app.config["FILE_CACHE_POLICIES"] = {
+    "transient": (None, False),
+    "contracts": (0, False),
+    "staff_documents": (0, False),
+    "company_archive": (0, False),
+    "chat_attachments": (7 * 24 * 3600, False),
+    "thumbnails": (365 * 24 * 3600, True),
+    "static_assets": (365 * 24 * 3600, True),
+}
+
+# Собранная статика (flask build-static): имена с отпечатком содержимого
+app.config["STATIC_BUILD_FOLDER"] = os.path.join(app.static_folder, "dist")
+# Аватары команды показываются по 130px: 1x, 2x и 3x
+app.config["STATIC_IMAGE_WIDTHS"] = (130, 260, 390)
+# Сторонние скрипты кладутся в static при сборке; до этого берутся с CDN
+VENDOR_ASSETS = {
+    "vendor/socket.io.min.js": "https://cdn.socket.io/4.5.4/socket.io.min.js",
+}
+
 
 ALLOWED_EXTENSIONS = {
     "jpg",
@@ -81,153 +211,739 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def init_db():
-    conn = sqlite3.connect("database.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password TEXT,
-        email TEXT,
-        role TEXT DEFAULT 'client'
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS reviews (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_name TEXT NOT NULL,
-        rating INTEGER NOT NULL,
-        text TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS chats (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_id INTEGER,
-        staff_id INTEGER,
-        service_name TEXT,
-        status TEXT DEFAULT 'waiting',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (client_id) REFERENCES users(id),
-        FOREIGN KEY (staff_id) REFERENCES users(id)
-    )
-    """)
+def get_ledger_stats(db, ledger):
+    """Итоги по статусам: {status: {"count": ..., "amount": ...}}"""
+    return {
+        row["status"]: {"count": row["count"], "amount": row["amount"]}
+        for row in db.execute(
+            "SELECT status, count, amount FROM ledger_stats WHERE ledger = ?",
+            (ledger,),
+        ).fetchall()
+    }
 
 
+def get_archive_stats(db):
+    """Статистика архива из счётчиков: итоги и разбивка по категориям"""
+    by_category = [
+        dict(row)
+        for row in db.execute(
+            """
+            SELECT category, count, total_size FROM archive_stats
+            WHERE count > 0
+            ORDER BY count DESC
+            """
+        ).fetchall()
+    ]
+    return {
+        "total_documents": sum(row["count"] for row in by_category),
+        "total_categories": len(by_category),
+        "total_size": sum(row["total_size"] for row in by_category),
+        "by_category": by_category,
+    }
+
+
+def init_db():
+    """Проверить версию схемы; при AUTO_MIGRATE применить недостающие миграции"""
+    conn = sqlite3.connect(app.config["DATABASE"])
     try:
-        cursor.execute("PRAGMA table_info(chats)")
-        columns = [column[1] for column in cursor.fetchall()]
+        version = schema_version(conn)
+    finally:
+        conn.close()
+
+    if version >= LATEST_VERSION:
+        return
+    if app.config["AUTO_MIGRATE"]:
+        upgrade_database(app.config["DATABASE"])
+    else:
+        print(
+            f"⚠️ Схема базы устарела (версия {version}, нужна {LATEST_VERSION}): "
+            "выполните flask migrate"
+        )
+
+init_db()
 
-        if "order_price" not in columns:
-            cursor.execute("ALTER TABLE chats ADD COLUMN order_price REAL DEFAULT NULL")
-            print("✅ Добавлен столбец order_price")
 
-        if "payment_status" not in columns:
-            cursor.execute(
-                "ALTER TABLE chats ADD COLUMN payment_status TEXT DEFAULT 'pending'"
-            )
-            print("✅ Добавлен столбец payment_status")
-    except Exception as e:
-        print(f"⚠️ Ошибка при добавлении столбцов: {e}")
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        chat_id INTEGER,
-        sender_id INTEGER,
-        text TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (chat_id) REFERENCES chats(id),
-        FOREIGN KEY (sender_id) REFERENCES users(id)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        service TEXT NOT NULL,
-        description TEXT,
-        status TEXT DEFAULT 'new',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id)
+class PooledConnection(sqlite3.Connection):
+    """Соединение из пула: close() только откатывает незавершённую транзакцию"""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Пул соединений SQLite, общий для потоков и гринлетов воркера"""
+
+    def __init__(self, config):
+        self.path = config["DATABASE"]
+        self.size = config["DB_POOL_SIZE"]
+        self.busy_timeout_ms = config["DB_BUSY_TIMEOUT_MS"]
+        self.mmap_size = config["DB_MMAP_SIZE"]
+        self.cache_size_kb = config["DB_CACHE_SIZE_KB"]
+        self.statement_cache = config["DB_STATEMENT_CACHE"]
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            conn.dispose()
+            return
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.dispose()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.dispose()
+
+
+def get_db_pool():
+    pool = app.extensions.get("db_pool")
+    if pool is None or pool.path != app.config["DATABASE"]:
+        pool = ConnectionPool(app.config)
+        app.extensions["db_pool"] = pool
+    return pool
+
+
+def get_db():
+    """Соединение текущего запроса (берётся из пула один раз на контекст)"""
+    if "db" not in g:
+        g.db = get_db_pool().acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exception):
+    db = g.pop("db", None)
+    if db is not None:
+        get_db_pool().release(db)
+
+
+# ==================== ХРАНИЛИЩЕ ФАЙЛОВ ====================
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+# Запись нового файла и сборка мусора не должны пересекаться по одному sha256.
+# flask gc-blobs и воркеры — разные процессы, поэтому кроме threading.Lock
+# берётся flock на файл в папке хранилища (как migration_lock в migrations.py).
+_blob_lock = threading.Lock()
+
+
+@contextmanager
+def blob_lock():
+    with _blob_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(app.config["BLOBS_FOLDER"], ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def blob_path(sha256):
+    return os.path.join(app.config["BLOBS_FOLDER"], sha256[:2], sha256[2:4], sha256)
+
+
+def thumbnail_path(source, width):
+    return f"{source}.w{width}.webp"
+
+
+def _register_blob(db, sha256, size):
+    blob = db.execute(
+        """
+        INSERT INTO blobs (sha256, size) VALUES (?, ?)
+        ON CONFLICT (sha256) DO UPDATE SET last_used_at = CURRENT_TIMESTAMP
+        RETURNING id
+        """,
+        (sha256, size),
+    ).fetchone()
+    db.commit()
+    return blob["id"]
+
+
+def _commit_blob(db, path, sha256, size):
+    """Переименовать готовый файл в blob_path(sha256) или удалить, если такой уже есть"""
+    with blob_lock():
+        target = blob_path(sha256)
+        if os.path.exists(target):
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        return _register_blob(db, sha256, size), size
+
+
+def store_blob(db, stream):
+    """
+    Сохранить загрузку по содержимому. Хэш считается по ходу чтения потока;
+    если такое содержимое уже есть, на диск ничего не пишется.
+    Возвращает (blob_id, size); ссылку учитывает триггер при записи строки
+    с этим blob_id, а blob без ссылок удалит collect_blobs().
+    """
+    seekable = getattr(stream, "seekable", lambda: False)()
+
+    if seekable:
+        # загрузка уже во временном файле werkzeug — сначала только читаем
+        start = stream.tell()
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: stream.read(BLOB_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        with blob_lock():
+            if os.path.exists(blob_path(sha256)):
+                return _register_blob(db, sha256, size), size
+        stream.seek(start)
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(
+        dir=os.path.join(app.config["BLOBS_FOLDER"], "tmp"), delete=False
     )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS team_members (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        first_name TEXT NOT NULL,
-        last_name TEXT NOT NULL,
-        position TEXT NOT NULL,
-        contract_filename TEXT NOT NULL,
-        username TEXT NOT NULL,
-        password TEXT NOT NULL,
-        email TEXT,
-        status TEXT DEFAULT 'pending',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    try:
+        with tmp:
+            for chunk in iter(lambda: stream.read(BLOB_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        return _commit_blob(db, tmp.name, digest.hexdigest(), size)
+    except BaseException:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+
+
+def store_blob_file(db, path):
+    """
+    Перенести готовый файл (например, собранную загрузку частями) в хранилище
+    без копирования: файл переименовывается, а при совпадении содержимого удаляется.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return _commit_blob(db, path, digest.hexdigest(), size)
+
+
+def collect_blobs(db, grace=None):
+    """Удалить файлы без ссылок (старше grace секунд), вернуть их число"""
+    if grace is None:
+        grace = app.config["BLOB_GC_GRACE"]
+
+    with blob_lock():
+        unused = db.execute(
+            """
+            DELETE FROM blobs
+            WHERE refcount <= 0 AND last_used_at <= datetime('now', ?)
+            RETURNING sha256
+            """,
+            (f"-{int(grace)} seconds",),
+        ).fetchall()
+        db.commit()
+
+        for blob in unused:
+            path = blob_path(blob["sha256"])
+            for stale in [path] + [
+                thumbnail_path(path, width) for width in app.config["THUMBNAIL_WIDTHS"]
+            ]:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+    return len(unused)
+
+
+def find_blob(db, folder, filename, blob_id=None):
+    """sha256 содержимого загрузки или None для файла, загруженного до хранилища"""
+    if blob_id is None:
+        _, table, column = UPLOAD_FOLDERS[folder]
+        blob = db.execute(
+            f"""
+            SELECT b.sha256 FROM {table} t JOIN blobs b ON b.id = t.blob_id
+            WHERE t.{column} = ?
+            LIMIT 1
+            """,
+            (filename,),
+        ).fetchone()
+    else:
+        blob = db.execute("SELECT sha256 FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+    return blob["sha256"] if blob else None
+
+
+def stored_file_path(db, folder, filename, blob_id=None):
+    """Путь к файлу загрузки на диске (None, если имя выходит за папку)"""
+    sha256 = find_blob(db, folder, filename, blob_id)
+    if sha256:
+        return blob_path(sha256)
+    return safe_join(UPLOAD_FOLDERS[folder][0], filename)
+
+
+def serve_file(path, policy, download_name=None, mimetype=None, etag=None, as_attachment=False):
+    """
+    Общая отдача файлов с диска: Range/206 и If-Range, ETag, If-None-Match и
+    If-Modified-Since (304) — через send_file(conditional=True), Cache-Control —
+    по политике из FILE_CACHE_POLICIES.
+    Без etag он строится из идентичности файла: inode, mtime и размер.
+    """
+    if not path or not os.path.isfile(path):
+        raise NotFound()
+
+    if etag is None:
+        stat = os.stat(path)
+        etag = f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    download_name = download_name or os.path.basename(path)
+    max_age, immutable = app.config["FILE_CACHE_POLICIES"][policy]
+
+    try:
+        response = send_file(
+            os.path.abspath(path),
+            mimetype=mimetype
+            or mimetypes.guess_type(download_name)[0]
+            or "application/octet-stream",
+            as_attachment=as_attachment,
+            download_name=download_name,
+            etag=etag,
+            conditional=True,
+        )
+    except RequestedRangeNotSatisfiable as e:
+        # 416 с Content-Range: bytes */<размер>, а не ошибка для вызывающего кода
+        return e.get_response()
+    response.cache_control.private = True
+    if max_age is None:
+        # временный ответ: без валидаторов, чтобы его нельзя было подтвердить 304
+        response.cache_control.no_store = True
+        response.headers.pop("ETag", None)
+        response.headers.pop("Last-Modified", None)
+        return response
+    response.cache_control.no_cache = None if max_age else True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
+
+def send_stored_file(folder, filename, as_attachment=False, blob_id=None, policy=None):
+    """
+    Отдать загруженный файл: из хранилища по blob_id строки, а для файлов,
+    загруженных до хранилища, — из старой папки. Кэширование — по политике
+    папки, если policy не задана явно.
+    """
+    sha256 = find_blob(get_db(), folder, filename, blob_id)
+    path = (
+        blob_path(sha256) if sha256 else safe_join(UPLOAD_FOLDERS[folder][0], filename)
     )
-    """)
-
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS staff_documents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        member_id INTEGER NOT NULL,
-        document_name TEXT NOT NULL,
-        document_type TEXT NOT NULL,
-        filename TEXT NOT NULL,
-        description TEXT,
-        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (member_id) REFERENCES team_members(id)
+    return serve_file(
+        path,
+        policy or folder,
+        download_name=filename,
+        etag=sha256,
+        as_attachment=as_attachment,
     )
-    """)
 
-    try:
-        cursor.execute(
-            "INSERT INTO users (username, password, email, role) VALUES ('admin', 'admin123', 'admin@arkonix.com', 'admin')"
+
+@app.cli.command("gc-blobs")
+@click.option("--grace", default=None, type=int, help="Не трогать файлы моложе N секунд")
+def gc_blobs_command(grace):
+    """Удалить файлы хранилища без ссылок и брошенные загрузки частями"""
+    db = get_db()
+    removed = collect_blobs(db, grace)
+    expired = collect_upload_sessions(db)
+    print(f"✅ Удалено файлов без ссылок: {removed}, брошенных загрузок: {expired}")
+
+
+@app.cli.command("import-blobs")
+def import_blobs_command():
+    """Перенести файлы, загруженные до хранилища, в хранилище по содержимому"""
+    db = get_db()
+    imported = 0
+    saved = 0
+
+    for folder, (legacy_folder, table, column) in UPLOAD_FOLDERS.items():
+        if not db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone():
+            continue
+
+        rows = db.execute(
+            f"SELECT id, {column} AS filename FROM {table} "
+            f"WHERE blob_id IS NULL AND {column} IS NOT NULL AND {column} != ''"
+        ).fetchall()
+
+        for row in rows:
+            path = os.path.join(legacy_folder, row["filename"])
+            if not os.path.isfile(path):
+                print(f"⚠️ {folder}: файл не найден {row['filename']}")
+                continue
+
+            with open(path, "rb") as f:
+                blob_id, size = store_blob(db, f)
+            first_use = db.execute(
+                "SELECT refcount FROM blobs WHERE id = ?", (blob_id,)
+            ).fetchone()["refcount"] == 0
+            db.execute(f"UPDATE {table} SET blob_id = ? WHERE id = ?", (blob_id, row["id"]))
+            db.commit()
+
+            # старые файлы с одинаковыми именами могут делить одну копию
+            if not db.execute(
+                f"SELECT 1 FROM {table} WHERE {column} = ? AND blob_id IS NULL",
+                (row["filename"],),
+            ).fetchone():
+                os.remove(path)
+            imported += 1
+            if not first_use:
+                saved += size
+
+    print(f"✅ Перенесено файлов: {imported}, сэкономлено: {format_file_size(saved)}")
+
+
+# ==================== МИНИАТЮРЫ ВЛОЖЕНИЙ ====================
+_thumbnail_pool_lock = threading.Lock()
+_thumbnail_lock = threading.Lock()
+_thumbnail_jobs = {}
+
+
+def get_thumbnail_pool():
+    pool = app.extensions.get("thumbnail_pool")
+    if pool is None:
+        with _thumbnail_pool_lock:
+            pool = app.extensions.get("thumbnail_pool")
+            if pool is None:
+                # fork скопировал бы потоки сервера вместе с захваченными блокировками
+                # (пул БД, MessageWriter, socketio) — процессы берутся из forkserver
+                method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                pool = ProcessPoolExecutor(
+                    max_workers=app.config["THUMBNAIL_WORKERS"],
+                    mp_context=multiprocessing.get_context(method),
+                )
+                app.extensions["thumbnail_pool"] = pool
+                atexit.register(pool.shutdown, cancel_futures=True)
+    return pool
+
+
+def can_thumbnail(filename):
+    ext = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+    return thumbnails is not None and ext in THUMBNAIL_SOURCE_EXTENSIONS
+
+
+def thumbnail_url(filename, width=None):
+    width = width or app.config["THUMBNAIL_DEFAULT_WIDTH"]
+    return f"/chat/attachment/thumb/{filename}?w={width}"
+
+
+def _thumbnail_done(source, future):
+    with _thumbnail_lock:
+        _thumbnail_jobs.pop(source, None)
+    if not future.cancelled() and future.exception():
+        app.logger.warning("Миниатюры %s не построены: %s", source, future.exception())
+
+
+def schedule_thumbnails(source):
+    """Построить недостающие миниатюры source в пуле процессов, не дожидаясь результата"""
+    targets = [
+        (width, thumbnail_path(source, width))
+        for width in app.config["THUMBNAIL_WIDTHS"]
+        if not os.path.exists(thumbnail_path(source, width))
+    ]
+    if not targets or not os.path.isfile(source):
+        return None
+
+    with _thumbnail_lock:
+        future = _thumbnail_jobs.get(source)
+        if future is not None:
+            return future
+        future = get_thumbnail_pool().submit(
+            thumbnails.render_thumbnails, source, targets
         )
-        print("✅ Создан админ: username='admin', password='admin123'")
-    except sqlite3.IntegrityError:
-        pass
+        _thumbnail_jobs[source] = future
 
-    conn.commit()
-    conn.close()
+    # колбэк вызывается сразу, если задача уже завершена, — только вне блокировки
+    future.add_done_callback(lambda done: _thumbnail_done(source, done))
+    return future
 
 
-init_db()
+@app.cli.command("build-thumbnails")
+def build_thumbnails_command():
+    """Построить недостающие миниатюры для изображений-вложений чатов"""
+    db = get_db()
+    rows = db.execute(
+        """
+        SELECT attachment_filename, blob_id FROM messages
+        WHERE attachment_type = 'image' AND attachment_filename IS NOT NULL
+        """
+    ).fetchall()
+
+    sources = {
+        stored_file_path(db, "chat_attachments", row["attachment_filename"], row["blob_id"])
+        for row in rows
+        if can_thumbnail(row["attachment_filename"])
+    }
+    futures = [
+        future
+        for future in map(schedule_thumbnails, filter(None, sources))
+        if future is not None
+    ]
 
+    failed = sum(1 for future in futures if future.exception())
+    print(f"✅ Построено миниатюр: {len(futures) - failed}, ошибок: {failed}")
 
-def get_db():
-    conn = sqlite3.connect("database.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Применить недостающие миграции схемы базы"""
+    applied = upgrade_database(app.config["DATABASE"])
+    if not applied:
+        print(f"✅ Схема актуальна: версия {LATEST_VERSION}")
+
+
+@app.cli.command("rebuild-chat-summary")
+def rebuild_chat_summary_command():
+    """Пересобрать сводку чатов для админ-доски"""
+    db = get_db()
+    rebuild_chat_summary(db)
+    db.commit()
+    count = db.execute("SELECT COUNT(*) as count FROM chat_summary").fetchone()["count"]
+    print(f"✅ chat_summary пересобрана: {count} чатов")
+
+
+@app.cli.command("verify-archive-stats")
+@click.option("--rebuild", is_flag=True, help="Пересобрать счётчики при расхождении")
+def verify_archive_stats_command(rebuild):
+    """Сверить счётчики archive_stats с company_archive"""
+    db = get_db()
+    actual = {
+        row["category"]: (row["count"], row["total_size"])
+        for row in db.execute(ARCHIVE_STATS_QUERY)
+    }
+    stored = {
+        row["category"]: (row["count"], row["total_size"])
+        for row in db.execute(
+            "SELECT * FROM archive_stats WHERE count != 0 OR total_size != 0"
+        )
+    }
+
+    mismatched = sorted(
+        category
+        for category in actual.keys() | stored.keys()
+        if actual.get(category) != stored.get(category)
+    )
+    for category in mismatched:
+        print(f"⚠️ {category}: счётчики {stored.get(category)}, по таблице {actual.get(category)}")
+
+    if not mismatched:
+        print(f"✅ archive_stats сходится: {len(actual)} категорий")
+    elif rebuild:
+        rebuild_archive_stats(db)
+        db.commit()
+        print(f"✅ archive_stats пересобрана: {len(actual)} категорий")
+    else:
+        print("Запустите с --rebuild, чтобы пересобрать счётчики")
+        raise SystemExit(1)
+
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """Пересобрать полнотекстовый индекс сообщений"""
+    db = get_db()
+    rebuild_messages_fts(db)
+    db.commit()
+    count = db.execute("SELECT COUNT(*) as count FROM messages").fetchone()["count"]
+    print(f"✅ messages_fts пересобран: {count} сообщений")
+
+
+@app.cli.command("check-chat-counters")
+@click.option("--rebuild", is_flag=True, help="Пересчитать счётчики при расхождении")
+def check_chat_counters_command(rebuild):
+    """Проверить счётчики чатов для /api/chat_stats"""
+    db = get_db()
+    mismatches = verify_chat_counters(db)
+
+    if not mismatches:
+        print("✅ chat_counters совпадают с таблицей chats")
+        return
+
+    for column, values in mismatches.items():
+        print(f"⚠️ {column}: в таблице {values['stored']}, на самом деле {values['actual']}")
+
+    if rebuild:
+        rebuild_chat_counters(db)
+        db.commit()
+        print("✅ chat_counters пересчитаны")
+
+
+# ==================== ОТЗЫВЫ НА ГЛАВНОЙ ====================
+# Главная показывает последние HOME_REVIEWS_LIMIT отзывов, остальные — /api/reviews.
+# Готовый HTML блока отзывов хранится в памяти процесса по языку. add_review и
+# delete_review сбрасывают кэш; версия отзывов в ключе не даёт другим воркерам
+# отдать устаревший блок.
+app.config["HOME_REVIEWS_LIMIT"] = 6
+REVIEWS_PAGE_MAX = 50
+
+_reviews_cache = {}
+_reviews_cache_lock = threading.Lock()
+
+
+def get_review_stats(db):
+    """Число отзывов, средняя оценка и гистограмма {оценка: число} из review_stats"""
+    histogram = {rating: 0 for rating in range(5, 0, -1)}
+    for row in db.execute("SELECT rating, count FROM review_stats WHERE count > 0"):
+        histogram[row["rating"]] = row["count"]
+
+    count = sum(histogram.values())
+    total = sum(rating * n for rating, n in histogram.items())
+    return {
+        "count": count,
+        "average": round(total / count, 1) if count else 0,
+        "histogram": histogram,
+    }
+
+
+def reviews_version(db):
+    """Меняется при каждом добавлении и удалении отзыва (id не переиспользуются)"""
+    return tuple(
+        db.execute(
+            "SELECT (SELECT MAX(id) FROM reviews), (SELECT SUM(count) FROM review_stats)"
+        ).fetchone()
+    )
+
+
+def fetch_reviews(db, before=None, limit=None):
+    """Отзывы от новых к старым с id меньше before; возвращает (reviews, has_more)"""
+    limit = limit or app.config["HOME_REVIEWS_LIMIT"]
+    if before is None:
+        rows = db.execute(
+            """SELECT id, user_name, rating, text, created_at
+               FROM reviews
+               ORDER BY id DESC
+               LIMIT ?""",
+            (limit + 1,),
+        ).fetchall()
+    else:
+        rows = db.execute(
+            """SELECT id, user_name, rating, text, created_at
+               FROM reviews
+               WHERE id<?
+               ORDER BY id DESC
+               LIMIT ?""",
+            (before, limit + 1),
+        ).fetchall()
+
+    return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+
+def reviews_block(db):
+    """HTML блока отзывов главной на текущем языке"""
+    lang = get_language()
+    key = (lang, reviews_version(db))
+    html = _reviews_cache.get(key)
+    if html is None:
+        reviews, has_more = fetch_reviews(db)
+        html = Markup(
+            render_template(
+                "partials/home_reviews.html",
+                reviews=reviews,
+                has_more=has_more,
+                stats=get_review_stats(db),
+            )
+        )
+        with _reviews_cache_lock:
+            for stale in [k for k in _reviews_cache if k[0] == lang]:
+                del _reviews_cache[stale]
+            _reviews_cache[key] = html
+    return html
+
+
+def invalidate_reviews_cache():
+    with _reviews_cache_lock:
+        _reviews_cache.clear()
 
 
 @app.route("/")
 def main():
     db = get_db()
-    reviews = db.execute(
-        "SELECT user_name, rating, text, created_at FROM reviews ORDER BY id DESC"
-    ).fetchall()
+    block = reviews_block(db)
+    db.close()
+    return render_template("index.html", reviews_block=block)
+
+
+@app.route("/api/reviews")
+def reviews_api():
+    """Следующие отзывы для кнопки «Показать ещё» на главной"""
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", app.config["HOME_REVIEWS_LIMIT"], type=int)
+    limit = max(1, min(limit, REVIEWS_PAGE_MAX))
+
+    db = get_db()
+    reviews, has_more = fetch_reviews(db, before, limit)
+    stats = get_review_stats(db)
     db.close()
-    return render_template("index.html", reviews=reviews)
+
+    return jsonify(
+        {
+            "reviews": reviews,
+            "has_more": has_more,
+            "next_before": reviews[-1]["id"] if has_more else None,
+            "stats": stats,
+        }
+    )
 
 
 @app.route("/add_review", methods=["POST"])
 def add_review():
+    rating = request.form.get("rating", type=int)
+    if rating not in range(1, 6):
+        flash("❌ Выберите оценку от 1 до 5")
+        return redirect("/#reviews")
+
     db = get_db()
     db.execute(
         "INSERT INTO reviews(user_name,rating,text) VALUES(?,?,?)",
-        (request.form["name"], request.form["rating"], request.form["comment"]),
+        (request.form["name"], rating, request.form["comment"]),
     )
     db.commit()
     db.close()
+    invalidate_reviews_cache()
     return redirect("/")
 
 
@@ -298,11 +1014,11 @@ def staff_register():
             filename = secure_filename(file.filename)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             unique_filename = f"{timestamp}_{username}_{filename}"
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
-            file.save(filepath)
 
             db = get_db()
             try:
+                blob_id, _ = store_blob(db, file.stream)
+
                 existing = db.execute(
                     "SELECT username FROM team_members WHERE username=?", (username,)
                 ).fetchone()
@@ -315,8 +1031,8 @@ def staff_register():
                 cursor = db.execute(
                     """
                     INSERT INTO team_members 
-                    (first_name, last_name, position, contract_filename, username, password, email, status) 
-                    VALUES (?,?,?,?,?,?,?,?)
+                    (first_name, last_name, position, contract_filename, username, password, email, status, blob_id) 
+                    VALUES (?,?,?,?,?,?,?,?,?)
                 """,
                     (
                         first_name,
@@ -327,6 +1043,7 @@ def staff_register():
                         password,
                         email,
                         "pending",
+                        blob_id,
                     ),
                 )
 
@@ -495,15 +1212,14 @@ def staff_upload_document():
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_filename = f"{timestamp}_{session['username']}_{filename}"
-        filepath = os.path.join(app.config["STAFF_DOCUMENTS_FOLDER"], unique_filename)
-        file.save(filepath)
 
         db = get_db()
+        blob_id, _ = store_blob(db, file.stream)
         db.execute(
             """
             INSERT INTO staff_documents 
-            (member_id, document_name, document_type, filename, description)
-            VALUES (?,?,?,?,?)
+            (member_id, document_name, document_type, filename, description, blob_id)
+            VALUES (?,?,?,?,?,?)
             """,
             (
                 session["staff_member_id"],
@@ -511,6 +1227,7 @@ def staff_upload_document():
                 document_type,
                 unique_filename,
                 description,
+                blob_id,
             ),
         )
         db.commit()
@@ -544,10 +1261,8 @@ def staff_view_document(doc_id):
         if not member:
             return "Файл не найден", 404
 
-        return send_from_directory(
-            os.path.abspath(UPLOAD_FOLDER),
-            member["contract_filename"],
-            as_attachment=False,
+        return send_stored_file(
+            "contracts", member["contract_filename"], as_attachment=False
         )
 
   
@@ -562,10 +1277,11 @@ def staff_view_document(doc_id):
     if not document:
         return "Файл не найден", 404
 
-    return send_from_directory(
-        os.path.abspath(STAFF_DOCUMENTS_FOLDER),
+    return send_stored_file(
+        "staff_documents",
         document["filename"],
         as_attachment=False,
+        blob_id=document["blob_id"],
     )
 
 
@@ -591,10 +1307,8 @@ def staff_download_document(doc_id):
         if not member:
             return "Файл не найден", 404
 
-        return send_from_directory(
-            os.path.abspath(UPLOAD_FOLDER),
-            member["contract_filename"],
-            as_attachment=True,
+        return send_stored_file(
+            "contracts", member["contract_filename"], as_attachment=True
         )
 
  
@@ -608,10 +1322,11 @@ def staff_download_document(doc_id):
     if not document:
         return "Файл не найден", 404
 
-    return send_from_directory(
-        os.path.abspath(STAFF_DOCUMENTS_FOLDER),
+    return send_stored_file(
+        "staff_documents",
         document["filename"],
         as_attachment=True,
+        blob_id=document["blob_id"],
     )
 
 
@@ -651,26 +1366,44 @@ def admin_balance():
     if session["role"] != "admin":
         abort(403)
 
-    conn = sqlite3.connect("database.db")
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    cur.execute(
+    db = get_db()
+    balance = db.execute(
         """
         SELECT balance FROM admin_balance
         WHERE admin_id = ?
     """,
         (session["user_id"],),
-    )
-
-    balance = cur.fetchone()["balance"]
-    conn.close()
+    ).fetchone()["balance"]
+    db.close()
 
     return f"Баланс админа: ${balance}"
 
 
 
 
+ADMIN_BOARD_QUERY = """
+    SELECT 
+        chats.id,
+        chats.client_id,
+        users.username, 
+        users.email,
+        chats.service_name, 
+        chats.status,
+        chats.order_price,
+        chats.payment_status,
+        chats.created_at,
+        cs.message_count,
+        cs.last_message_text as last_message,
+        CASE
+            WHEN cs.last_message_id IS NULL THEN NULL
+            ELSE cs.last_activity_at
+        END as last_message_time
+    FROM chat_summary cs
+    JOIN chats ON chats.id = cs.chat_id
+    JOIN users ON users.id = chats.client_id
+"""
+
+
 @app.route("/profile")
 def profile():
     if "user_id" not in session:
@@ -679,31 +1412,8 @@ def profile():
     db = get_db()
 
     if session["role"] == "admin":
-        chats = db.execute("""
-            SELECT 
-                chats.id,
-                chats.client_id,
-                users.username, 
-                users.email,
-                chats.service_name, 
-                chats.status,
-                chats.order_price,
-                chats.payment_status,
-                chats.created_at,
-                (SELECT COUNT(*) FROM messages WHERE chat_id = chats.id) as message_count,
-                (SELECT text FROM messages WHERE chat_id = chats.id ORDER BY id DESC LIMIT 1) as last_message,
-                (SELECT created_at FROM messages WHERE chat_id = chats.id ORDER BY id DESC LIMIT 1) as last_message_time
-            FROM chats
-            JOIN users ON users.id = chats.client_id
-            ORDER BY 
-                CASE 
-                    WHEN chats.status = 'waiting' THEN 0
-                    ELSE 1
-                END,
-                COALESCE(
-                    (SELECT created_at FROM messages WHERE chat_id = chats.id ORDER BY id DESC LIMIT 1),
-                    chats.created_at
-                ) DESC
+        chats = db.execute(ADMIN_BOARD_QUERY + """
+            ORDER BY cs.status_rank, cs.last_activity_at DESC
         """).fetchall()
 
 
@@ -768,6 +1478,8 @@ def create_chat():
     db.commit()
     db.close()
 
+    notify_admins("chat_created", chat_id)
+
     return redirect(f"/chat/{chat_id}")
 
 
@@ -779,6 +1491,94 @@ def join(data):
     join_room(f"chat_{data['chat_id']}")
 
 
+ADMIN_ROOM = "admins"
+
+
+@socketio.on("connect")
+def on_connect():
+    if "user_id" in session:
+        join_room(user_room(session["user_id"]))
+    if session.get("role") == "admin":
+        join_room(ADMIN_ROOM)
+
+
+def user_room(user_id):
+    return f"user_{user_id}"
+
+
+def notify_user(user_id, event_type, chat_id, **data):
+    """Дельта для карточек профиля: чат клиента user_id изменился"""
+    socketio.emit(
+        "chat_update",
+        {"type": event_type, "chat_id": chat_id, **data},
+        to=user_room(user_id),
+    )
+
+
+def get_chat_client_id(db, chat_id):
+    """Владелец чата (поиск по первичному ключу)"""
+    row = db.execute("SELECT client_id FROM chats WHERE id=?", (chat_id,)).fetchone()
+    return row["client_id"] if row else None
+
+
+def notify_reply(db, chat_id, sender_role, text, message):
+    """Новый ответ админа или сотрудника — клиенту в личную комнату"""
+    if sender_role not in ["admin", "staff"]:
+        return
+    client_id = get_chat_client_id(db, chat_id)
+    if client_id is None:
+        return
+
+    data = {"text": text, "created_at": message["created_at"]}
+    if message["status_changed"]:
+        data["status"] = "in_progress"
+    notify_user(client_id, "new_reply", chat_id, **data)
+
+
+def notify_admins(event_type, chat_id, **data):
+    """Дельта для живой админ-доски: чат chat_id изменился"""
+    socketio.emit(
+        "board_update", {"type": event_type, "chat_id": chat_id, **data}, to=ADMIN_ROOM
+    )
+
+
+@app.route("/admin/board/chat/<int:chat_id>")
+def admin_board_chat(chat_id):
+    """Одна строка админ-доски (для точечного обновления без перезагрузки)"""
+    if "user_id" not in session or session.get("role") != "admin":
+        return "Доступ запрещён", 403
+
+    db = get_db()
+    chat = db.execute(
+        ADMIN_BOARD_QUERY + "WHERE chats.id = ?", (chat_id,)
+    ).fetchone()
+    db.close()
+
+    if not chat:
+        return "Чат не найден", 404
+
+    return render_template("partials/admin_board_chat.html", chat=chat)
+
+
+@app.route("/profile/chat/<int:chat_id>")
+def profile_chat_card(chat_id):
+    """Одна карточка обсуждения клиента (для обновления без перезагрузки)"""
+    if "user_id" not in session:
+        return "Доступ запрещён", 403
+
+    db = get_db()
+    chat = db.execute(
+        "SELECT id, service_name, status, order_price, payment_status FROM chats WHERE id=? AND client_id=?",
+        (chat_id, session["user_id"]),
+    ).fetchone()
+    db.close()
+
+    if not chat:
+        return "Чат не найден", 404
+
+    return render_template("partials/profile_chat_card.html", chat=chat)
+
+
 
 
 
@@ -830,10 +1630,11 @@ def admin_download_staff_document(doc_id):
     if not document:
         return "Файл не найден", 404
 
-    return send_from_directory(
-        os.path.abspath(STAFF_DOCUMENTS_FOLDER),
+    return send_stored_file(
+        "staff_documents",
         document["filename"],
         as_attachment=True,
+        blob_id=document["blob_id"],
     )
 
 
@@ -899,10 +1700,12 @@ def delete_team_member(member_id):
     db = get_db()
 
     member = db.execute(
-        "SELECT contract_filename FROM team_members WHERE id=?", (member_id,)
+        "SELECT contract_filename, blob_id FROM team_members WHERE id=?", (member_id,)
     ).fetchone()
 
-    if member and member["contract_filename"]:
+    # Файлы из хранилища освобождают триггеры при удалении строк,
+    # напрямую удаляем только файлы, загруженные до хранилища
+    if member and member["contract_filename"] and member["blob_id"] is None:
         filepath = os.path.join(
             app.config["UPLOAD_FOLDER"], member["contract_filename"]
         )
@@ -911,7 +1714,8 @@ def delete_team_member(member_id):
 
 
     documents = db.execute(
-        "SELECT filename FROM staff_documents WHERE member_id=?", (member_id,)
+        "SELECT filename FROM staff_documents WHERE member_id=? AND blob_id IS NULL",
+        (member_id,),
     ).fetchall()
 
     for doc in documents:
@@ -922,6 +1726,7 @@ def delete_team_member(member_id):
     db.execute("DELETE FROM staff_documents WHERE member_id=?", (member_id,))
     db.execute("DELETE FROM team_members WHERE id=?", (member_id,))
     db.commit()
+    collect_blobs(db)
     db.close()
 
     flash("Участник удалён из базы")
@@ -934,14 +1739,10 @@ def download_contract(filename):
         return "Доступ запрещён", 403
 
     try:
-        upload_dir = os.path.abspath(UPLOAD_FOLDER)
-        file_path = os.path.join(upload_dir, filename)
-
-        if not os.path.exists(file_path):
-            flash(f"Файл не найден: {filename}")
-            return redirect("/admin/team")
-
-        return send_from_directory(upload_dir, filename, as_attachment=True)
+        return send_stored_file("contracts", filename, as_attachment=True)
+    except NotFound:
+        flash(f"Файл не найден: {filename}")
+        return redirect("/admin/team")
     except Exception as e:
         flash(f"Ошибка при скачивании: {str(e)}")
         return redirect("/admin/team")
@@ -953,14 +1754,10 @@ def view_contract(filename):
         return "Доступ запрещён", 403
 
     try:
-        upload_dir = os.path.abspath(UPLOAD_FOLDER)
-        file_path = os.path.join(upload_dir, filename)
-
-        if not os.path.exists(file_path):
-            flash(f"Файл не найден: {filename}")
-            return redirect("/admin/team")
-
-        return send_from_directory(upload_dir, filename, as_attachment=False)
+        return send_stored_file("contracts", filename, as_attachment=False)
+    except NotFound:
+        flash(f"Файл не найден: {filename}")
+        return redirect("/admin/team")
     except Exception as e:
         flash(f"Ошибка при открытии файла: {str(e)}")
         return redirect("/admin/team")
@@ -1017,6 +1814,8 @@ def set_price():
     socketio.emit(
         "price_updated", {"chat_id": chat_id, "price": price}, room=f"chat_{chat_id}"
     )
+    notify_admins("price_set", chat_id, price=price)
+    notify_user(chat["client_id"], "price_set", chat_id, price=price, status="in_progress")
 
     return jsonify({"success": True, "price": price})
 
@@ -1032,22 +1831,22 @@ def discussions():
 
 @app.route("/services")
 def services():
-    return render_template("services.html")
+    return render_cached_page("services.html")
 
 
 @app.route("/team")
 def team():
-    return render_template("team.html")
+    return render_cached_page("team.html")
 
 
 @app.route("/terms")
 def terms():
-    return render_template("terms.html")
+    return render_cached_page("terms.html")
 
 
 @app.route("/privacy")
 def privacy():
-    return render_template("privacy.html")
+    return render_cached_page("privacy.html")
 
 
 @app.route("/delete_review/<int:review_id>", methods=["POST"])
@@ -1060,44 +1859,166 @@ def delete_review(review_id):
     db.execute("DELETE FROM reviews WHERE id=?", (review_id,))
     db.commit()
     db.close()
+    invalidate_reviews_cache()
 
     flash("Отзыв успешно удалён")
     return redirect("/admin/reviews")
 
 
-@app.route("/admin/reviews")
-def admin_reviews():
-    if "user_id" not in session or session.get("role") != "admin":
-        flash("Доступ запрещён. Требуются права администратора.")
-        return redirect("/login")
+# ==================== ПОСТРАНИЧНЫЙ ВЫВОД (KEYSET) ====================
+LEDGER_PAGE_SIZE = 50
+LEDGER_PAGE_MAX = 200
+app.config["LEDGER_PAGE_SIZE"] = LEDGER_PAGE_SIZE
 
-    db = get_db()
-    reviews = db.execute(
-        "SELECT id, user_name, rating, text, created_at FROM reviews ORDER BY id DESC"
-    ).fetchall()
-    db.close()
 
-    return render_template("admin_reviews.html", reviews=reviews)
+def encode_cursor(sort_value, row_id):
+    """Курсор страницы: последняя пара (sort_key, id) в base64"""
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
+def decode_cursor(cursor):
+    """Разбор курсора; None, если курсор пустой или повреждён"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        return None
 
 
+def parse_date(value):
+    """Дата фильтра в формате YYYY-MM-DD или None"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def ledger_args():
+    """Параметры страницы из query string: курсор, размер, направление, фильтры"""
+    limit = request.args.get("limit", app.config["LEDGER_PAGE_SIZE"], type=int)
+    return {
+        "cursor": request.args.get("cursor", ""),
+        "limit": max(1, min(limit, LEDGER_PAGE_MAX)),
+        "direction": "asc" if request.args.get("direction") == "asc" else "desc",
+        "status": request.args.get("status", ""),
+        "category": request.args.get("category", ""),
+        "date_from": parse_date(request.args.get("date_from")),
+        "date_to": parse_date(request.args.get("date_to")),
+    }
 
 
+def date_filters(column, args):
+    """Условия WHERE по диапазону дат (по индексу, без date() над столбцом)"""
+    where, params = [], []
+    if args["date_from"]:
+        where.append(f"{column} >= ?")
+        params.append(args["date_from"])
+    if args["date_to"]:
+        where.append(f"{column} < date(?, '+1 day')")
+        params.append(args["date_to"])
+    return where, params
 
 
+def keyset_page(db, query, sort_key, id_key, where=(), params=(), args=None):
+    """
+    Страница выборки по ключу (sort_key, id) вместо OFFSET.
+    query — SELECT ... FROM ... без WHERE и ORDER BY; в строках выборки
+    должны быть столбцы с именами sort_key и id_key без префикса таблицы.
+    """
+    args = args or ledger_args()
+    where = list(where)
+    params = list(params)
+    descending = args["direction"] == "desc"
+
+    after = decode_cursor(args["cursor"])
+    if after:
+        where.append(f"({sort_key}, {id_key}) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+
+    order = "DESC" if descending else "ASC"
+    rows = db.execute(
+        f"""
+        {query}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {sort_key} {order}, {id_key} {order}
+        LIMIT ?
+        """,
+        params + [args["limit"] + 1],
+    ).fetchall()
 
+    has_more = len(rows) > args["limit"]
+    rows = rows[: args["limit"]]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            last[sort_key.split(".")[-1]], last[id_key.split(".")[-1]]
+        )
 
+    return {"items": rows, "has_more": has_more, "next_cursor": next_cursor}
 
 
+def ledger_response(template, page, **context):
+    """HTML-страница или JSON (?format=json) для постраничного списка"""
+    if request.args.get("format") == "json":
+        return jsonify(
+            {
+                "items": [dict(row) for row in page["items"]],
+                "has_more": page["has_more"],
+                "next_cursor": page["next_cursor"],
+            }
+        )
 
+    if page["next_cursor"]:
+        next_args = request.args.to_dict()
+        next_args["cursor"] = page["next_cursor"]
+        page["next_url"] = url_for(request.endpoint, **next_args)
+    if request.args.get("cursor"):
+        first_args = request.args.to_dict()
+        first_args.pop("cursor")
+        page["first_url"] = url_for(request.endpoint, **first_args)
 
+    return render_template(template, page=page, **context)
 
 
- 
+@app.route("/admin/reviews")
+def admin_reviews():
+    if "user_id" not in session or session.get("role") != "admin":
+        flash("Доступ запрещён. Требуются права администратора.")
+        return redirect("/login")
 
+    args = ledger_args()
+    where, params = date_filters("created_at", args)
+    rating = request.args.get("rating", type=int)
+    if rating:
+        where.append("rating = ?")
+        params.append(rating)
 
+    db = get_db()
+    page = keyset_page(
+        db,
+        "SELECT id, user_name, rating, text, created_at FROM reviews",
+        "id",
+        "id",
+        where,
+        params,
+        args,
+    )
+    histogram = get_review_stats(db)["histogram"]
+    stats = {
+        "total": sum(histogram.values()),
+        "five_star": histogram[5],
+        "four_plus": histogram[5] + histogram[4],
+    }
+    db.close()
 
+    return ledger_response(
+        "admin_reviews.html", page, reviews=page["items"], stats=stats
+    )
 
 
 
@@ -1105,60 +2026,24 @@ def admin_reviews():
 
 
 
-@socketio.on("send_message")
-def send_message(data):
-    if "user_id" not in session:
-        return
 
-    chat_id = data["chat_id"]
-    text = data["text"]
-    sender_id = session["user_id"]
-    sender_role = session.get("role")
 
-    db = get_db()
 
 
-    cursor = db.execute(
-        "INSERT INTO messages (chat_id, sender_id, text) VALUES (?,?,?)",
-        (chat_id, sender_id, text),
-    )
-    message_id = cursor.lastrowid
 
 
-    chat_info = db.execute(
-        "SELECT status, client_id FROM chats WHERE id=?", (chat_id,)
-    ).fetchone()
 
 
-    if (
-        sender_role in ["admin", "staff"]
-        and chat_info
-        and chat_info["status"] == "waiting"
-    ):
-        db.execute("UPDATE chats SET status=? WHERE id=?", ("in_progress", chat_id))
 
-    db.commit()
+ 
+
+
+
 
 
-    message_time = db.execute(
-        "SELECT created_at FROM messages WHERE id=?", (message_id,)
-    ).fetchone()
 
-    db.close()
 
 
-    emit(
-        "new_message",
-        {
-            "text": text,
-            "sender_id": sender_id,
-            "created_at": message_time["created_at"]
-            if message_time
-            else datetime.now().isoformat(),
-        },
-        room=f"chat_{chat_id}",
-        include_self=True,
-    )
 
 
 @app.route("/admin/payment_settings", methods=["GET", "POST"])
@@ -1318,6 +2203,8 @@ def confirm_payment(chat_id):
         db.commit()
         db.close()
 
+        notify_admins("payment_submitted", chat_id)
+
         flash("✅ Заявка на оплату отправлена! Ожидайте подтверждения администратора.")
 
         return redirect(f"/chat/{chat_id}")
@@ -1335,10 +2222,17 @@ def admin_payments():
         flash("Доступ запрещён")
         return redirect("/login")
 
-    db = get_db()
+    args = ledger_args()
+    where, params = date_filters("payments.payment_date", args)
+    if args["status"] in ("pending", "completed", "rejected"):
+        where.append("payments.status = ?")
+        params.append(args["status"])
 
+    db = get_db()
 
-    payments = db.execute("""
+    page = keyset_page(
+        db,
+        """
         SELECT 
             payments.*,
             users.username,
@@ -1348,12 +2242,27 @@ def admin_payments():
         FROM payments
         JOIN users ON users.id = payments.client_id
         JOIN chats ON chats.id = payments.chat_id
-        ORDER BY payments.payment_date DESC
-    """).fetchall()
+        """,
+        "payments.payment_date",
+        "payments.id",
+        where,
+        params,
+        args,
+    )
+
+    # Сводка по всем платежам, а не только по текущей странице
+    totals = get_ledger_stats(db, "payments")
+    stats = {
+        status: totals.get(status, {}).get("count", 0)
+        for status in ("pending", "completed", "rejected")
+    }
+    stats["completed_amount"] = totals.get("completed", {}).get("amount", 0)
 
     db.close()
 
-    return render_template("admin_payments.html", payments=payments)
+    return ledger_response(
+        "admin_payments.html", page, payments=page["items"], stats=stats
+    )
 
 
 
@@ -1393,6 +2302,13 @@ def admin_approve_payment(payment_id):
             {"chat_id": payment["chat_id"]},
             room=f"chat_{payment['chat_id']}",
         )
+        notify_admins("payment_approved", payment["chat_id"])
+        notify_user(
+            payment["client_id"],
+            "payment_approved",
+            payment["chat_id"],
+            payment_status="paid",
+        )
 
         return redirect("/admin/payments")
 
@@ -1430,6 +2346,14 @@ def admin_reject_payment(payment_id):
         db.commit()
         db.close()
 
+        notify_admins("payment_rejected", payment["chat_id"])
+        notify_user(
+            payment["client_id"],
+            "payment_rejected",
+            payment["chat_id"],
+            payment_status="pending",
+        )
+
         flash("⚠️ Платёж отклонён")
         return redirect("/admin/payments")
 
@@ -1476,6 +2400,8 @@ def complete_chat(chat_id):
             {"chat_id": chat_id, "message": "Администратор завершил чат"},
             room=f"chat_{chat_id}",
         )
+        notify_admins("status_changed", chat_id, status="completed")
+        notify_user(chat["client_id"], "status_changed", chat_id, status="completed")
 
         return redirect("/profile")
 
@@ -1499,7 +2425,10 @@ def update_chat_status(chat_id):
     db = get_db()
 
     try:
-        db.execute("UPDATE chats SET status=? WHERE id=?", (new_status, chat_id))
+        chat = db.execute(
+            "UPDATE chats SET status=? WHERE id=? RETURNING client_id",
+            (new_status, chat_id),
+        ).fetchone()
         db.commit()
         db.close()
 
@@ -1509,6 +2438,9 @@ def update_chat_status(chat_id):
             {"chat_id": chat_id, "new_status": new_status},
             room=f"chat_{chat_id}",
         )
+        notify_admins("status_changed", chat_id, status=new_status)
+        if chat:
+            notify_user(chat["client_id"], "status_changed", chat_id, status=new_status)
 
         return jsonify({"success": True, "status": new_status})
 
@@ -1525,23 +2457,21 @@ def chat_stats():
 
     db = get_db()
 
+    counters = db.execute(
+        """
+        SELECT total, waiting, in_progress, completed, paid, awaiting_confirmation
+        FROM chat_counters
+        WHERE id = 1
+        """
+    ).fetchone()
+
     stats = {
-        "total": db.execute("SELECT COUNT(*) as count FROM chats").fetchone()["count"],
-        "waiting": db.execute(
-            "SELECT COUNT(*) as count FROM chats WHERE status='waiting'"
-        ).fetchone()["count"],
-        "in_progress": db.execute(
-            "SELECT COUNT(*) as count FROM chats WHERE status='in_progress'"
-        ).fetchone()["count"],
-        "completed": db.execute(
-            "SELECT COUNT(*) as count FROM chats WHERE status='completed'"
-        ).fetchone()["count"],
-        "paid": db.execute(
-            "SELECT COUNT(*) as count FROM chats WHERE payment_status='paid'"
-        ).fetchone()["count"],
-        "awaiting_payment": db.execute(
-            "SELECT COUNT(*) as count FROM chats WHERE payment_status='awaiting_confirmation'"
-        ).fetchone()["count"],
+        "total": counters["total"],
+        "waiting": counters["waiting"],
+        "in_progress": counters["in_progress"],
+        "completed": counters["completed"],
+        "paid": counters["paid"],
+        "awaiting_payment": counters["awaiting_confirmation"],
     }
 
     db.close()
@@ -1582,6 +2512,73 @@ def format_file_size(size_bytes):
 
 
 
+UKRAINE_TZ = timezone(timedelta(hours=2))
+
+CHAT_PAGE_SIZE = 50
+CHAT_PAGE_MAX = 200
+app.config["CHAT_PAGE_SIZE"] = CHAT_PAGE_SIZE
+
+# "direct" — коммит на каждое сообщение, "batched" — групповой коммит
+app.config["CHAT_INGEST_MODE"] = os.environ.get("ARKONIX_CHAT_INGEST", "direct")
+app.config["CHAT_INGEST_BATCH_SIZE"] = 64
+app.config["CHAT_INGEST_LINGER_MS"] = 5
+# Сколько ждать коммита от потока-писателя, прежде чем записать сообщение самим
+app.config["CHAT_INGEST_TIMEOUT"] = 10
+
+
+def serialize_message(msg):
+    """Подготовить строку messages к выводу: время по Киеву и размер вложения"""
+    msg_dict = dict(msg)
+    if msg_dict["created_at"]:
+        try:
+            utc_time = datetime.fromisoformat(
+                msg_dict["created_at"].replace("Z", "+00:00")
+            )
+            msg_dict["created_at"] = utc_time.astimezone(UKRAINE_TZ).isoformat()
+        except ValueError:
+            pass
+
+    if msg_dict.get("attachment_size"):
+        msg_dict["formatted_size"] = format_file_size(msg_dict["attachment_size"])
+
+    if msg_dict.get("attachment_type") == "image" and msg_dict.get("attachment_filename"):
+        msg_dict["thumbnail_url"] = thumbnail_url(msg_dict["attachment_filename"])
+
+    return msg_dict
+
+
+def fetch_chat_messages(db, chat_id, before=None, limit=CHAT_PAGE_SIZE):
+    """
+    Страница истории чата по ключу (chat_id, id): последние `limit` сообщений
+    с id меньше `before`, в хронологическом порядке.
+    Возвращает (messages, has_more).
+    """
+    if before is None:
+        rows = db.execute(
+            """SELECT id, text, sender_id, created_at,
+                      attachment_type, attachment_filename, attachment_size
+               FROM messages
+               WHERE chat_id=?
+               ORDER BY id DESC
+               LIMIT ?""",
+            (chat_id, limit + 1),
+        ).fetchall()
+    else:
+        rows = db.execute(
+            """SELECT id, text, sender_id, created_at,
+                      attachment_type, attachment_filename, attachment_size
+               FROM messages
+               WHERE chat_id=? AND id<?
+               ORDER BY id DESC
+               LIMIT ?""",
+            (chat_id, before, limit + 1),
+        ).fetchall()
+
+    has_more = len(rows) > limit
+    messages = [serialize_message(row) for row in reversed(rows[:limit])]
+    return messages, has_more
+
+
 @app.route("/chat/<int:chat_id>")
 def chat(chat_id):
     if "user_id" not in session:
@@ -1600,34 +2597,9 @@ def chat(chat_id):
         return "Доступ запрещен", 403
 
 
-    messages_raw = db.execute(
-        """SELECT id, text, sender_id, created_at, 
-                  attachment_type, attachment_filename, attachment_size 
-           FROM messages 
-           WHERE chat_id=? 
-           ORDER BY id""",
-        (chat_id,),
-    ).fetchall()
-
-    ukraine_tz = timezone(timedelta(hours=2))
-    messages = []
-    for msg in messages_raw:
-        msg_dict = dict(msg)
-        if msg_dict["created_at"]:
-            try:
-                utc_time = datetime.fromisoformat(
-                    msg_dict["created_at"].replace("Z", "+00:00")
-                )
-                ukraine_time = utc_time.astimezone(ukraine_tz)
-                msg_dict["created_at"] = ukraine_time.isoformat()
-            except:
-                msg_dict["created_at"] = msg_dict["created_at"]
-
-   
-        if msg_dict.get("attachment_size"):
-            msg_dict["formatted_size"] = format_file_size(msg_dict["attachment_size"])
-
-        messages.append(msg_dict)
+    messages, has_more = fetch_chat_messages(
+        db, chat_id, limit=app.config["CHAT_PAGE_SIZE"]
+    )
 
     if session["role"] == "client":
         sender_name = "Поддержка ARKONIX"
@@ -1643,6 +2615,7 @@ def chat(chat_id):
         "chat.html",
         chat_id=chat_id,
         messages=messages,
+        has_more_messages=has_more,
         user_id=session["user_id"],
         sender_name=sender_name,
         service_name=chat_info["service_name"],
@@ -1655,200 +2628,675 @@ def chat(chat_id):
 
 
 
-@app.route("/chat/<int:chat_id>/upload", methods=["POST"])
-def upload_chat_file(chat_id):
-    if "user_id" not in session:
-        return jsonify({"error": "Unauthorized"}), 401
-
-    db = get_db()
+def write_message(db, chat_id, sender_id, sender_role, text, attachment=None):
+    """
+    Запись сообщения чата без коммита: INSERT ... RETURNING и условный переход
+    waiting → in_progress, если отвечает админ или сотрудник.
+    attachment — (attachment_type, attachment_filename, attachment_size, blob_id).
+    """
+    attachment_type, attachment_filename, attachment_size, blob_id = attachment or (
+        None,
+        None,
+        None,
+        None,
+    )
 
+    message = db.execute(
+        """INSERT INTO messages
+           (chat_id, sender_id, text, attachment_type, attachment_filename,
+            attachment_size, blob_id)
+           VALUES (?,?,?,?,?,?,?)
+           RETURNING id, created_at""",
+        (
+            chat_id,
+            sender_id,
+            text,
+            attachment_type,
+            attachment_filename,
+            attachment_size,
+            blob_id,
+        ),
+    ).fetchone()
 
-    chat_info = db.execute("SELECT * FROM chats WHERE id=?", (chat_id,)).fetchone()
+    status_changed = False
+    if sender_role in ["admin", "staff"]:
+        cursor = db.execute(
+            "UPDATE chats SET status='in_progress' WHERE id=? AND status='waiting'",
+            (chat_id,),
+        )
+        status_changed = cursor.rowcount > 0
 
-    if not chat_info:
-        db.close()
-        return jsonify({"error": "Chat not found"}), 404
+    return {
+        "id": message["id"],
+        "created_at": message["created_at"],
+        "status_changed": status_changed,
+    }
 
-    if session["role"] == "client" and chat_info["client_id"] != session["user_id"]:
-        db.close()
-        return jsonify({"error": "Access denied"}), 403
 
+def ingest_message(db, chat_id, sender_id, sender_role, text, attachment=None):
+    """Единая запись сообщения чата одним коммитом"""
+    message = write_message(db, chat_id, sender_id, sender_role, text, attachment)
+    db.commit()
+    return message
 
-    if "file" not in request.files:
-        db.close()
-        return jsonify({"error": "No file provided"}), 400
 
-    file = request.files["file"]
-    message_text = request.form.get("text", "").strip()
+class MessageWriterUnavailable(RuntimeError):
+    """Писатель остановлен или не успел — сообщение им не записано"""
 
-    if file.filename == "":
-        db.close()
-        return jsonify({"error": "No file selected"}), 400
 
-    if not allowed_file(file.filename):
-        db.close()
-        return jsonify({"error": "File type not allowed"}), 400
+class MessageWriter:
+    """
+    Групповая запись сообщений: вызывающие кладут сообщения в очередь,
+    один поток-писатель коммитит их пачками (по размеру пачки или по
+    истечении задержки) и возвращает каждому id и created_at.
+    """
 
-    try:
-  
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{chat_id}_{session['user_id']}_{filename}"
-        filepath = os.path.join(app.config["CHAT_ATTACHMENTS_FOLDER"], unique_filename)
+    _STOP = object()
+
+    def __init__(self, pool, batch_size, linger_ms, timeout):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self._closed = False
+        self._closing_lock = threading.Lock()
+        self.stats = {
+            "messages": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "errors": 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="message-writer", daemon=True
+        )
+        self._thread.start()
 
-        file.save(filepath)
-        file_size = os.path.getsize(filepath)
-        file_type = get_file_type(filename)
+    def submit(self, chat_id, sender_id, sender_role, text, attachment=None):
+        """
+        Поставить сообщение в очередь и дождаться его коммита. Если писатель
+        остановлен или не взял сообщение за timeout секунд, оно снимается
+        с очереди и поднимается MessageWriterUnavailable — записать его
+        должен вызывающий.
+        """
+        future = Future()
+        with self._closing_lock:
+            if self._closed or not self._thread.is_alive():
+                raise MessageWriterUnavailable("писатель сообщений остановлен")
+            self.queue.put(
+                (future, (chat_id, sender_id, sender_role, text, attachment))
+            )
 
-     
-     
-        cursor = db.execute(
-            """INSERT INTO messages 
-               (chat_id, sender_id, text, attachment_type, attachment_filename, attachment_size) 
-               VALUES (?,?,?,?,?,?)""",
-            (
-                chat_id,
-                session["user_id"],
-                message_text or "",
-                file_type,
-                unique_filename,
-                file_size,
-            ),
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise MessageWriterUnavailable("писатель сообщений не ответил")
+            # пачка уже пишется — поток-писатель обязательно завершит future
+            return future.result()
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["average_batch_size"] = (
+            stats["messages"] / stats["batches"] if stats["batches"] else 0
         )
-        message_id = cursor.lastrowid
+        return stats
+
+    def stop(self):
+        """Дописать всё, что осталось в очереди, и остановить поток"""
+        with self._closing_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.queue.put(self._STOP)
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _collect(self):
+        item = self.queue.get()
+        if item is self._STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self.queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self.queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        db = self.pool.acquire()
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._write_batch(db, batch)
+        finally:
+            self.pool.release(db)
+
+    def _write_batch(self, db, batch):
+        # снятые по таймауту сообщения записал сам вызывающий
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
 
-      
-        sender_role = session.get("role")
-        if sender_role in ["admin", "staff"] and chat_info["status"] == "waiting":
-            db.execute("UPDATE chats SET status=? WHERE id=?", ("in_progress", chat_id))
+        try:
+            results = [write_message(db, *args) for _, args in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            # пачка откатилась целиком — пишем по одному, чтобы ошибка
+            # досталась только тому сообщению, которое её вызвало
+            for future, args in batch:
+                try:
+                    future.set_result(ingest_message(db, *args))
+                except Exception as e:
+                    db.rollback()
+                    future.set_exception(e)
+                    with self._stats_lock:
+                        self.stats["errors"] += 1
+            results = None
+
+        if results is not None:
+            for (future, _), result in zip(batch, results):
+                future.set_result(result)
+
+        with self._stats_lock:
+            self.stats["messages"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["last_batch_size"] = len(batch)
+            self.stats["max_batch_size"] = max(
+                self.stats["max_batch_size"], len(batch)
+            )
 
-        db.commit()
 
+_message_writer_lock = threading.Lock()
 
-        message_time = db.execute(
-            "SELECT created_at FROM messages WHERE id=?", (message_id,)
-        ).fetchone()
 
-        db.close()
+def get_message_writer():
+    writer = app.extensions.get("message_writer")
+    if writer is None:
+        with _message_writer_lock:
+            writer = app.extensions.get("message_writer")
+            if writer is None:
+                writer = MessageWriter(
+                    get_db_pool(),
+                    app.config["CHAT_INGEST_BATCH_SIZE"],
+                    app.config["CHAT_INGEST_LINGER_MS"],
+                    app.config["CHAT_INGEST_TIMEOUT"],
+                )
+                app.extensions["message_writer"] = writer
+                atexit.register(writer.stop)
+    return writer
 
 
-        socketio.emit(
-            "new_message",
-            {
-                "id": message_id,
-                "text": message_text or "",
-                "sender_id": session["user_id"],
-                "created_at": message_time["created_at"]
-                if message_time
-                else datetime.now().isoformat(),
-                "attachment_type": file_type,
-                "attachment_filename": unique_filename,
-                "attachment_size": file_size,
-                "formatted_size": format_file_size(file_size),
-            },
-            room=f"chat_{chat_id}",
-        )
+def submit_message(db, chat_id, sender_id, sender_role, text, attachment=None):
+    """
+    Записать сообщение напрямую или через групповой коммит (CHAT_INGEST_MODE);
+    если писатель остановлен или не ответил — напрямую
+    """
+    if app.config["CHAT_INGEST_MODE"] == "batched":
+        try:
+            return get_message_writer().submit(
+                chat_id, sender_id, sender_role, text, attachment
+            )
+        except MessageWriterUnavailable:
+            pass
+    return ingest_message(db, chat_id, sender_id, sender_role, text, attachment)
 
-        return jsonify(
-            {
-                "success": True,
-                "message_id": message_id,
-                "filename": unique_filename,
-                "file_type": file_type,
-            }
-        )
 
-    except Exception as e:
-        db.close()
-        return jsonify({"error": str(e)}), 500
+@app.route("/api/admin/ingest_stats")
+def ingest_stats():
+    if "user_id" not in session or session.get("role") != "admin":
+        return jsonify({"error": "Forbidden"}), 403
 
+    writer = app.extensions.get("message_writer")
+    return jsonify(
+        {
+            "mode": app.config["CHAT_INGEST_MODE"],
+            "writer": writer.snapshot() if writer else None,
+        }
+    )
 
 
-@app.route("/chat/attachment/<filename>")
-def download_chat_attachment(filename):
+@app.route("/api/chat/<int:chat_id>/messages")
+def chat_messages_api(chat_id):
     if "user_id" not in session:
-        return "Доступ запрещён", 403
+        return jsonify({"error": "Unauthorized"}), 401
 
-    try:
-        return send_from_directory(
-            os.path.abspath(app.config["CHAT_ATTACHMENTS_FOLDER"]),
-            filename,
-            as_attachment=True,
-        )
-    except Exception as e:
-        return f"Файл не найден: {str(e)}", 404
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", app.config["CHAT_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, CHAT_PAGE_MAX))
 
+    db = get_db()
 
+    chat_info = db.execute(
+        "SELECT client_id FROM chats WHERE id=?", (chat_id,)
+    ).fetchone()
 
-@app.route("/chat/attachment/view/<filename>")
-def view_chat_attachment(filename):
-    if "user_id" not in session:
-        return "Доступ запрещён", 403
+    if not chat_info:
+        db.close()
+        return jsonify({"error": "Chat not found"}), 404
 
-    try:
-        return send_from_directory(
-            os.path.abspath(app.config["CHAT_ATTACHMENTS_FOLDER"]),
-            filename,
-            as_attachment=False,
-        )
-    except Exception as e:
-        return f"Файл не найден: {str(e)}", 404
+    if session["role"] == "client" and chat_info["client_id"] != session["user_id"]:
+        db.close()
+        return jsonify({"error": "Access denied"}), 403
 
+    messages, has_more = fetch_chat_messages(db, chat_id, before=before, limit=limit)
+    db.close()
 
+    return jsonify(
+        {
+            "messages": messages,
+            "has_more": has_more,
+            "next_before": messages[0]["id"] if messages else None,
+        }
+    )
 
-@socketio.on("send_message")
-def send_message(data):
-    if "user_id" not in session:
-        return
 
-    chat_id = data["chat_id"]
-    text = data["text"]
-    sender_id = session["user_id"]
-    sender_role = session.get("role")
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_MAX = 100
+SEARCH_SNIPPET_TOKENS = 12
+SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
 
-    db = get_db()
 
-    
-    cursor = db.execute(
-        "INSERT INTO messages (chat_id, sender_id, text) VALUES (?,?,?)",
-        (chat_id, sender_id, text),
+def parse_search_terms(text):
+    """
+    Слова запроса: [(слово, по_префиксу)]. Префиксный поиск — только для слов
+    со звёздочкой на конце («счёт*»).
+    """
+    terms = []
+    for word in text.lower().split():
+        tokens = SEARCH_TOKEN_RE.findall(word)
+        terms.extend((token, False) for token in tokens[:-1])
+        if tokens:
+            terms.append((tokens[-1], word.endswith("*")))
+    return terms
+
+
+def build_fts_query(terms):
+    """Слова запроса -> выражение FTS5 (AND между словами, без синтаксиса FTS5)"""
+    return " ".join(f'"{token}"' + ("*" if prefix else "") for token, prefix in terms)
+
+
+def normalize_token(token):
+    """Слово без регистра и диакритики — как его видит токенизатор messages_fts"""
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", token.casefold())
+        if not unicodedata.combining(char)
     )
-    message_id = cursor.lastrowid
 
-    chat_info = db.execute(
-        "SELECT status, client_id FROM chats WHERE id=?", (chat_id,)
-    ).fetchone()
 
-  
-    if (
-        sender_role in ["admin", "staff"]
-        and chat_info
-        and chat_info["status"] == "waiting"
-    ):
-        db.execute("UPDATE chats SET status=? WHERE id=?", ("in_progress", chat_id))
+def term_matches(token, terms):
+    token = normalize_token(token)
+    return any(
+        token == term or (prefix and token.startswith(term)) for term, prefix in terms
+    )
 
-    db.commit()
 
+def make_snippet(text, terms):
+    """Фрагмент текста вокруг первого совпадения, совпадения в <mark>, остальное экранировано"""
+    terms = [(normalize_token(term), prefix) for term, prefix in terms]
+    tokens = list(SEARCH_TOKEN_RE.finditer(text))
+    hits = [i for i, token in enumerate(tokens) if term_matches(token.group(), terms)]
+    if not hits:
+        return None
+
+    first = max(0, hits[0] - SEARCH_SNIPPET_TOKENS // 4)
+    last = min(len(tokens), first + SEARCH_SNIPPET_TOKENS)
+    start = tokens[first].start() if first else 0
+    end = tokens[last - 1].end() if last < len(tokens) else len(text)
+
+    parts = ["…" if start else ""]
+    position = start
+    for i in range(first, last):
+        token = tokens[i]
+        parts.append(str(escape(text[position:token.start()])))
+        if i in hits:
+            parts.append(f"<mark>{escape(token.group())}</mark>")
+        else:
+            parts.append(str(escape(token.group())))
+        position = token.end()
+    parts.append(str(escape(text[position:end])))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
 
-    message_time = db.execute(
-        "SELECT created_at FROM messages WHERE id=?", (message_id,)
-    ).fetchone()
 
-    db.close()
+def search_messages(db, text, client_id=None, chat_id=None, offset=0,
+                    limit=SEARCH_PAGE_SIZE):
+    """
+    Поиск по messages_fts: порядок по релевантности (bm25, при равенстве —
+    новее выше) считает сам FTS5 по всем совпадениям, Python только собирает
+    фрагменты для найденной страницы. client_id ограничивает выдачу чатами
+    клиента — те же правила доступа, что и в chat(). Возвращает (results, has_more).
+    """
+    terms = parse_search_terms(text)
+    if not terms:
+        return [], False
+
+    scope, scope_params = [], []
+    if client_id is not None:
+        scope.append("c.client_id = ?")
+        scope_params.append(client_id)
+    if chat_id is not None:
+        scope.append("m.chat_id = ?")
+        scope_params.append(chat_id)
+
+    joins = ""
+    where = ["messages_fts MATCH ?"]
+    if scope:
+        # фильтр через JOIN по rowid совпадений: с rowid IN (...) FTS5
+        # заново раскрывает префиксные термы для каждого rowid чатов клиента
+        joins = (
+            "JOIN messages m ON m.id = messages_fts.rowid "
+            "JOIN chats c ON c.id = m.chat_id"
+        )
+        where.extend(scope)
+    ranked = db.execute(
+        f"""
+        SELECT messages_fts.rowid AS id
+        FROM messages_fts
+        {joins}
+        WHERE {" AND ".join(where)}
+        ORDER BY bm25(messages_fts), messages_fts.rowid DESC
+        LIMIT ? OFFSET ?
+        """,
+        [build_fts_query(terms)] + scope_params + [limit + 1, offset],
+    ).fetchall()
 
-    emit(
+    has_more = len(ranked) > limit
+    ids = [row["id"] for row in ranked[:limit]]
+    if not ids:
+        return [], False
+
+    rows = db.execute(
+        f"""
+        SELECT
+            m.id, m.chat_id, m.sender_id, m.text, m.created_at,
+            m.attachment_type, m.attachment_filename, m.attachment_size,
+            u.username AS sender_name, u.role AS sender_role,
+            c.service_name
+        FROM messages m
+        JOIN chats c ON c.id = m.chat_id
+        LEFT JOIN users u ON u.id = m.sender_id
+        WHERE m.id IN ({",".join("?" * len(ids))})
+        """,
+        ids,
+    ).fetchall()
+    by_id = {row["id"]: row for row in rows}
+
+    results = []
+    for message_id in ids:
+        row = by_id[message_id]
+        result = serialize_message(row)
+        result["snippet"] = make_snippet(row["text"] or "", terms) or make_snippet(
+            row["attachment_filename"] or "", terms
+        )
+        del result["text"]
+        if client_id is not None and row["sender_id"] != client_id:
+            # клиент видит ответы от имени поддержки, как в chat()
+            result["sender_name"] = "Поддержка ARKONIX"
+        results.append(result)
+    return results, has_more
+
+
+@app.route("/api/search/messages")
+def search_messages_api():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    query = request.args.get("q", "").strip()
+    chat_id = request.args.get("chat_id", type=int)
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = request.args.get("limit", SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+
+    client_id = session["user_id"] if session["role"] == "client" else None
+
+    db = get_db()
+    try:
+        results, has_more = search_messages(
+            db, query, client_id=client_id, chat_id=chat_id, offset=offset, limit=limit
+        )
+    except sqlite3.OperationalError as e:
+        db.close()
+        return jsonify({"error": f"Search unavailable: {e}"}), 503
+    db.close()
+
+    return jsonify(
+        {
+            "query": query,
+            "results": results,
+            "has_more": has_more,
+            "next_offset": offset + len(results) if has_more else None,
+        }
+    )
+
+
+def post_chat_attachment(db, chat_id, original_filename, blob_id, file_size, message_text):
+    """
+    Сообщение с вложением из хранилища: запись, уведомления и new_message в чат.
+    Общее для upload_chat_file и завершения загрузки частями.
+    """
+    filename = secure_filename(original_filename)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_filename = f"{timestamp}_{chat_id}_{session['user_id']}_{filename}"
+
+    file_type = get_file_type(filename)
+    if file_type == "image" and can_thumbnail(filename):
+        schedule_thumbnails(
+            stored_file_path(db, "chat_attachments", unique_filename, blob_id)
+        )
+
+    message = submit_message(
+        db,
+        chat_id,
+        session["user_id"],
+        session.get("role"),
+        message_text or "",
+        attachment=(file_type, unique_filename, file_size, blob_id),
+    )
+    message_id = message["id"]
+
+    notify_reply(
+        db, chat_id, session.get("role"), message_text or unique_filename, message
+    )
+
+    socketio.emit(
         "new_message",
         {
             "id": message_id,
+            "text": message_text or "",
+            "sender_id": session["user_id"],
+            "created_at": message["created_at"],
+            "attachment_type": file_type,
+            "attachment_filename": unique_filename,
+            "attachment_size": file_size,
+            "formatted_size": format_file_size(file_size),
+            "thumbnail_url": (
+                thumbnail_url(unique_filename) if file_type == "image" else None
+            ),
+        },
+        room=f"chat_{chat_id}",
+    )
+    notify_admins(
+        "new_message",
+        chat_id,
+        text=message_text or unique_filename,
+        created_at=message["created_at"],
+        status_changed=message["status_changed"],
+    )
+
+    return {
+        "success": True,
+        "message_id": message_id,
+        "filename": unique_filename,
+        "file_type": file_type,
+    }
+
+
+@app.route("/chat/<int:chat_id>/upload", methods=["POST"])
+def upload_chat_file(chat_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+
+
+    chat_info = db.execute("SELECT * FROM chats WHERE id=?", (chat_id,)).fetchone()
+
+    if not chat_info:
+        db.close()
+        return jsonify({"error": "Chat not found"}), 404
+
+    if session["role"] == "client" and chat_info["client_id"] != session["user_id"]:
+        db.close()
+        return jsonify({"error": "Access denied"}), 403
+
+
+    if "file" not in request.files:
+        db.close()
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files["file"]
+    message_text = request.form.get("text", "").strip()
+
+    if file.filename == "":
+        db.close()
+        return jsonify({"error": "No file selected"}), 400
+
+    if not allowed_file(file.filename):
+        db.close()
+        return jsonify({"error": "File type not allowed"}), 400
+
+    try:
+        blob_id, file_size = store_blob(db, file.stream)
+        result = post_chat_attachment(
+            db, chat_id, file.filename, blob_id, file_size, message_text
+        )
+        db.close()
+        return jsonify(result)
+
+    except Exception as e:
+        db.close()
+        return jsonify({"error": str(e)}), 500
+
+
+
+@app.route("/chat/attachment/<filename>")
+def download_chat_attachment(filename):
+    if "user_id" not in session:
+        return "Доступ запрещён", 403
+
+    try:
+        return send_stored_file("chat_attachments", filename, as_attachment=True)
+    except Exception as e:
+        return f"Файл не найден: {str(e)}", 404
+
+
+
+@app.route("/chat/attachment/thumb/<filename>")
+def chat_attachment_thumbnail(filename):
+    """Миниатюра изображения-вложения; пока она строится, отдаётся оригинал"""
+    if "user_id" not in session:
+        return "Доступ запрещён", 403
+
+    widths = app.config["THUMBNAIL_WIDTHS"]
+    requested = request.args.get("w", app.config["THUMBNAIL_DEFAULT_WIDTH"], type=int)
+    width = next((w for w in widths if w >= (requested or 0)), widths[-1])
+
+    db = get_db()
+    sha256 = find_blob(db, "chat_attachments", filename)
+    db.close()
+
+    source = (
+        blob_path(sha256)
+        if sha256
+        else safe_join(CHAT_ATTACHMENTS_FOLDER, filename)
+    )
+    if source and can_thumbnail(filename):
+        thumb = thumbnail_path(source, width)
+        if os.path.isfile(thumb):
+            # имя вложения уникально, содержимое по нему не меняется
+            return serve_file(
+                thumb,
+                "thumbnails",
+                mimetype=thumbnails.THUMBNAIL_MIMETYPE,
+                etag=f"{sha256}.w{width}" if sha256 else None,
+            )
+        schedule_thumbnails(source)
+
+    # оригинал здесь — временная замена: браузер не должен сохранить его под
+    # адресом миниатюры, иначе готовая миниатюра так и не будет запрошена
+    try:
+        return send_stored_file(
+            "chat_attachments", filename, as_attachment=False, policy="transient"
+        )
+    except Exception as e:
+        return f"Файл не найден: {str(e)}", 404
+
+
+@app.route("/chat/attachment/view/<filename>")
+def view_chat_attachment(filename):
+    if "user_id" not in session:
+        return "Доступ запрещён", 403
+
+    try:
+        return send_stored_file("chat_attachments", filename, as_attachment=False)
+    except Exception as e:
+        return f"Файл не найден: {str(e)}", 404
+
+
+
+@socketio.on("send_message")
+def send_message(data):
+    if "user_id" not in session:
+        return
+
+    chat_id = data["chat_id"]
+    text = data["text"]
+    sender_id = session["user_id"]
+    sender_role = session.get("role")
+
+    db = get_db()
+    message = submit_message(db, chat_id, sender_id, sender_role, text)
+    notify_reply(db, chat_id, sender_role, text, message)
+    db.close()
+
+    emit(
+        "new_message",
+        {
+            "id": message["id"],
             "text": text,
             "sender_id": sender_id,
-            "created_at": message_time["created_at"]
-            if message_time
-            else datetime.now().isoformat(),
+            "created_at": message["created_at"],
         },
         room=f"chat_{chat_id}",
         include_self=True,
     )
+    notify_admins(
+        "new_message",
+        chat_id,
+        text=text,
+        created_at=message["created_at"],
+        status_changed=message["status_changed"],
+    )
 
 
 
@@ -1932,6 +3380,74 @@ def staff_profile():
 
 
 
+STAFF_STATUS_POLL_INTERVAL = 1
+STAFF_STATUS_MAX_WAIT = 30
+
+
+@app.route("/api/staff/status")
+def staff_status():
+    """
+    Статус сотрудника для staff_profile.html.
+    ETag — версия профиля: при совпадении If-None-Match отвечаем 304.
+    ?wait=N — long-poll: держим запрос до N секунд, пока версия не изменится.
+    """
+    if "staff_member_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    member_id = session["staff_member_id"]
+    wait = max(0, min(request.args.get("wait", 0, type=int), STAFF_STATUS_MAX_WAIT))
+    deadline = time.monotonic() + wait
+
+    db = get_db()
+
+    while True:
+        member = db.execute(
+            "SELECT status, total_earned, version FROM team_members WHERE id=?",
+            (member_id,),
+        ).fetchone()
+
+        if not member:
+            db.close()
+            return jsonify({"error": "Staff member not found"}), 404
+
+        etag = f"staff-{member_id}-v{member['version']}"
+        if not request.if_none_match.contains(etag):
+            break
+
+        if time.monotonic() >= deadline:
+            db.close()
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        socketio.sleep(STAFF_STATUS_POLL_INTERVAL)
+
+    payment_count = db.execute(
+        "SELECT COUNT(*) as count FROM staff_payments WHERE member_id=?", (member_id,)
+    ).fetchone()["count"]
+
+    document_count = db.execute(
+        "SELECT COUNT(*) as count FROM staff_documents WHERE member_id=?", (member_id,)
+    ).fetchone()["count"]
+
+    db.close()
+
+    response = jsonify(
+        {
+            "status": member["status"],
+            "total_earned": member["total_earned"] or 0,
+            "payment_count": payment_count,
+            # договор при регистрации + дополнительные документы
+            "document_count": document_count + 1,
+            "version": member["version"],
+        }
+    )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @app.route("/staff/payments")
 def staff_payments():
     if "staff_member_id" not in session:
@@ -1992,10 +3508,18 @@ def admin_staff_payments_history():
         flash("Доступ запрещён. Требуются права администратора.")
         return redirect("/login")
 
+    args = ledger_args()
+    where, params = date_filters("sp.created_at", args)
+    member_id = request.args.get("member_id", type=int)
+    if member_id:
+        where.append("sp.member_id = ?")
+        params.append(member_id)
+
     db = get_db()
 
 
-    payments = db.execute(
+    page = keyset_page(
+        db,
         """
         SELECT 
             sp.id,
@@ -2010,20 +3534,22 @@ def admin_staff_payments_history():
         FROM staff_payments sp
         JOIN team_members tm ON tm.id = sp.member_id
         JOIN users u ON u.id = sp.paid_by
-        ORDER BY sp.created_at DESC
-        """
-    ).fetchall()
+        """,
+        "sp.created_at",
+        "sp.id",
+        where,
+        params,
+        args,
+    )
 
 
-    stats = db.execute(
-        """
-        SELECT 
-            COUNT(*) as total_payments,
-            SUM(amount) as total_amount,
-            AVG(amount) as average_amount
-        FROM staff_payments
-        """
-    ).fetchone()
+    totals = get_ledger_stats(db, "staff_payments").get("", {})
+    count = totals.get("count", 0)
+    stats = {
+        "total_payments": count,
+        "total_amount": totals.get("amount", 0),
+        "average_amount": totals["amount"] / count if count else 0,
+    }
 
     
     top_earners = db.execute(
@@ -2068,10 +3594,11 @@ def admin_staff_payments_history():
 
     db.close()
 
-    return render_template(
+    return ledger_response(
         "admin_staff_payments.html",
-        payments=payments,
-        stats=dict(stats) if stats else {},
+        page,
+        payments=page["items"],
+        stats=stats,
         top_earners=top_earners,
         staff_members=staff_members,
     )
@@ -2251,108 +3778,192 @@ def admin_team():
         flash("Доступ запрещён. Требуются права администратора.")
         return redirect("/login")
 
+    args = ledger_args()
+    where, params = date_filters("created_at", args)
+    if args["status"] in ("pending", "approved", "rejected"):
+        where.append("status = ?")
+        params.append(args["status"])
+
     db = get_db()
-    team_members = db.execute(
+    page = keyset_page(
+        db,
         """
         SELECT id, first_name, last_name, position, username, email, status, 
                contract_filename, created_at, total_earned
         FROM team_members
-        ORDER BY 
-            CASE status
-                WHEN 'pending' THEN 1
-                WHEN 'approved' THEN 2
-                WHEN 'rejected' THEN 3
-            END,
-            created_at DESC
-    """
-    ).fetchall()
+        """,
+        "created_at",
+        "id",
+        where,
+        params,
+        args,
+    )
+
+    stats = {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
+    for row in db.execute(
+        "SELECT status, COUNT(*) AS count FROM team_members GROUP BY status"
+    ).fetchall():
+        stats[row["status"]] = row["count"]
+        stats["total"] += row["count"]
     db.close()
 
-    return render_template("admin_team.html", team_members=team_members)
+    return ledger_response(
+        "admin_team.html",
+        page,
+        team_members=page["items"],
+        stats=stats,
+        status_filter=args["status"],
+    )
 
 
 
 
-@app.route("/admin/all_documents")
-def admin_all_documents():
-    if "user_id" not in session or session.get("role") != "admin":
-        flash("Доступ запрещён. Требуются права администратора.")
-        return redirect("/login")
+DOCUMENTS_PAGE_SIZE = 20
+DOCUMENT_STATUSES = ("pending", "approved", "rejected")
+DOCUMENT_TYPES = ("contract", "passport", "certificate", "diploma", "other")
 
-    db = get_db()
 
+def load_members_documents(db, status=None, document_type=None, page=1,
+                           per_page=DOCUMENTS_PAGE_SIZE):
+    """
+    Участники и их документы для /admin/all_documents: страница участников
+    и документы всей страницы одним запросом, склейка за один проход.
+    """
+    where = []
+    params = []
+    if status:
+        where.append("tm.status = ?")
+        params.append(status)
+    if document_type and document_type != "contract":
+        where.append(
+            "EXISTS (SELECT 1 FROM staff_documents sd "
+            "WHERE sd.member_id = tm.id AND sd.document_type = ?)"
+        )
+        params.append(document_type)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    doc_type_sql = ""
+    doc_params = []
+    if document_type and document_type != "contract":
+        doc_type_sql = "AND sd.document_type = ?"
+        doc_params.append(document_type)
+
+    totals = db.execute(
+        f"""
+        SELECT
+            COUNT(*) AS members,
+            COALESCE(SUM((
+                SELECT COUNT(*) FROM staff_documents sd
+                WHERE sd.member_id = tm.id {doc_type_sql}
+            )), 0) AS additional
+        FROM team_members tm
+        {where_sql}
+        """,
+        doc_params + params,
+    ).fetchone()
 
+    total_members = totals["members"]
+    total_contracts = total_members if document_type in (None, "contract") else 0
+    total_additional = totals["additional"] if document_type != "contract" else 0
+    pages = max(1, -(-total_members // per_page))
+    page = min(max(1, page), pages)
 
-    members = db.execute(
-        """
-        SELECT * FROM team_members 
-        ORDER BY 
-            CASE status
+    # CASE совпадает с idx_team_members_review_order; при фильтре по статусу
+    # он постоянен, и порядок даёт idx_team_members_status_created
+    status_order_sql = "" if status else """
+            CASE tm.status
                 WHEN 'pending' THEN 1
                 WHEN 'approved' THEN 2
                 WHEN 'rejected' THEN 3
-            END,
-            created_at DESC
-    """
+            END,"""
+    members = db.execute(
+        f"""
+        SELECT tm.* FROM team_members tm
+        {where_sql}
+        ORDER BY{status_order_sql}
+            tm.created_at DESC,
+            tm.id DESC
+        LIMIT ? OFFSET ?
+        """,
+        params + [per_page, (page - 1) * per_page],
     ).fetchall()
 
-    members_with_docs = []
-    total_documents = 0
-    total_contracts = 0
-    total_additional = 0
-
-    for member in members:
-        member_dict = dict(member)
-        documents = []
-
-
-
-        documents.append(
-            {
-                "id": f"contract_{member['id']}",
-                "type": "contract",
-                "name": "Договор о участии в команде",
-                "filename": member["contract_filename"],
-                "description": "Основной договор",
-                "uploaded_at": member["created_at"],
-            }
-        )
-        total_contracts += 1
-
-
+    documents_by_member = {member["id"]: [] for member in members}
 
-        additional_docs = db.execute(
-            "SELECT * FROM staff_documents WHERE member_id=? ORDER BY uploaded_at DESC",
-            (member["id"],),
+    if members and document_type != "contract":
+        placeholders = ",".join("?" * len(members))
+        rows = db.execute(
+            f"""
+            SELECT * FROM staff_documents sd
+            WHERE sd.member_id IN ({placeholders}) {doc_type_sql}
+            ORDER BY sd.member_id, sd.uploaded_at DESC
+            """,
+            list(documents_by_member) + doc_params,
         ).fetchall()
 
-        for doc in additional_docs:
-            doc_dict = dict(doc)
+        for doc in rows:
+            documents_by_member[doc["member_id"]].append(
+                {
+                    "id": doc["id"],
+                    "type": doc["document_type"],
+                    "name": doc["document_name"],
+                    "filename": doc["filename"],
+                    "description": doc["description"] or "",
+                    "uploaded_at": doc["uploaded_at"],
+                }
+            )
+
+    members_with_docs = []
+    for member in members:
+        documents = []
+        if document_type in (None, "contract"):
             documents.append(
                 {
-                    "id": doc_dict["id"],
-                    "type": doc_dict["document_type"],
-                    "name": doc_dict["document_name"],
-                    "filename": doc_dict["filename"],
-                    "description": doc_dict.get("description", ""),
-                    "uploaded_at": doc_dict["uploaded_at"],
+                    "id": f"contract_{member['id']}",
+                    "type": "contract",
+                    "name": "Договор о участии в команде",
+                    "filename": member["contract_filename"],
+                    "description": "Основной договор",
+                    "uploaded_at": member["created_at"],
                 }
             )
-            total_additional += 1
+        documents.extend(documents_by_member[member["id"]])
+        members_with_docs.append({"member": dict(member), "documents": documents})
+
+    return {
+        "members_with_docs": members_with_docs,
+        "total_members": total_members,
+        "total_documents": total_contracts + total_additional,
+        "total_contracts": total_contracts,
+        "total_additional": total_additional,
+        "page": page,
+        "pages": pages,
+    }
 
-        total_documents += len(documents)
 
-        members_with_docs.append({"member": member_dict, "documents": documents})
+@app.route("/admin/all_documents")
+def admin_all_documents():
+    if "user_id" not in session or session.get("role") != "admin":
+        flash("Доступ запрещён. Требуются права администратора.")
+        return redirect("/login")
 
+    status = request.args.get("status")
+    if status not in DOCUMENT_STATUSES:
+        status = None
+    document_type = request.args.get("type")
+    if document_type not in DOCUMENT_TYPES:
+        document_type = None
+    page = request.args.get("page", 1, type=int)
+
+    db = get_db()
+    context = load_members_documents(db, status, document_type, page)
     db.close()
 
     return render_template(
         "admin_all_documents.html",
-        members_with_docs=members_with_docs,
-        total_members=len(members),
-        total_documents=total_documents,
-        total_contracts=total_contracts,
-        total_additional=total_additional,
+        status_filter=status or "all",
+        type_filter=document_type or "all",
+        **context,
     )
 
 
@@ -2405,12 +4016,6 @@ def admin_delete_payment(payment_id):
 
 
 
-# Добавить в app.py после инициализации других UPLOAD_FOLDER'ов:
-
-COMPANY_ARCHIVE_FOLDER = "uploads/company_archive"
-app.config["COMPANY_ARCHIVE_FOLDER"] = COMPANY_ARCHIVE_FOLDER
-os.makedirs(COMPANY_ARCHIVE_FOLDER, exist_ok=True)
-
 # Категории документов архива
 ARCHIVE_CATEGORIES = [
     "Устав и правила",
@@ -2432,53 +4037,76 @@ def admin_archive():
         flash("Доступ запрещён")
         return redirect("/login")
 
-    db = get_db()
-
-    category_filter = request.args.get("category", "")
+    args = ledger_args()
+    category_filter = args["category"]
 
+    where, params = date_filters("ca.created_at", args)
+    where.insert(0, "ca.is_public = 1")
     if category_filter:
-        documents = db.execute(
-            """
-            SELECT 
-                ca.*,
-                users.username as uploader_name
-            FROM company_archive ca
-            JOIN users ON users.id = ca.uploaded_by
-            WHERE ca.category = ? AND ca.is_public = 1
-            ORDER BY ca.created_at DESC
-        """,
-            (category_filter,),
-        ).fetchall()
-    else:
-        documents = db.execute("""
-            SELECT 
-                ca.*,
-                users.username as uploader_name
-            FROM company_archive ca
-            JOIN users ON users.id = ca.uploaded_by
-            WHERE ca.is_public = 1
-            ORDER BY ca.created_at DESC
-        """).fetchall()
+        where.insert(0, "ca.category = ?")
+        params.insert(0, category_filter)
+
+    db = get_db()
 
-    # Статистика
-    stats = db.execute("""
+    page = keyset_page(
+        db,
+        """
         SELECT 
-            COUNT(*) as total_docs,
-            COUNT(DISTINCT category) as total_categories,
-            SUM(file_size) as total_size
-        FROM company_archive
-        WHERE is_public = 1
-    """).fetchone()
+            ca.*,
+            users.username as uploader_name
+        FROM company_archive ca
+        JOIN users ON users.id = ca.uploaded_by
+        """,
+        "ca.created_at",
+        "ca.id",
+        where,
+        params,
+        args,
+    )
 
+    stats = get_archive_stats(db)
     db.close()
 
-    return render_template(
+    return ledger_response(
         "admin_archive.html",
-        documents=documents,
+        page,
+        documents=page["items"],
         categories=ARCHIVE_CATEGORIES,
         selected_category=category_filter,
-        stats=dict(stats) if stats else {},
+        stats={
+            "total_docs": stats["total_documents"],
+            "total_categories": stats["total_categories"],
+            "total_size": stats["total_size"],
+        },
+    )
+
+
+def save_archive_document(db, title, description, category, original_filename, blob_id, file_size):
+    """Запись company_archive для файла из хранилища (обычная загрузка и загрузка частями)"""
+    filename = secure_filename(original_filename)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_filename = f"{timestamp}_{session['user_id']}_{filename}"
+    file_ext = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+
+    db.execute(
+        """
+        INSERT INTO company_archive 
+        (title, description, category, filename, file_type, file_size, uploaded_by, is_public, blob_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+    """,
+        (
+            title,
+            description,
+            category,
+            unique_filename,
+            file_ext,
+            file_size,
+            session["user_id"],
+            blob_id,
+        ),
     )
+    db.commit()
+    return unique_filename
 
 
 @app.route("/admin/archive/upload", methods=["POST"])
@@ -2514,34 +4142,11 @@ def archive_upload_document():
         return redirect("/admin/archive")
 
     try:
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{session['user_id']}_{filename}"
-        filepath = os.path.join(app.config["COMPANY_ARCHIVE_FOLDER"], unique_filename)
-
-        file.save(filepath)
-        file_size = os.path.getsize(filepath)
-        file_ext = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
-
         db = get_db()
-        db.execute(
-            """
-            INSERT INTO company_archive 
-            (title, description, category, filename, file_type, file_size, uploaded_by, is_public)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 1)
-        """,
-            (
-                title,
-                description,
-                category,
-                unique_filename,
-                file_ext,
-                file_size,
-                session["user_id"],
-            ),
+        blob_id, file_size = store_blob(db, file.stream)
+        save_archive_document(
+            db, title, description, category, file.filename, blob_id, file_size
         )
-
-        db.commit()
         db.close()
 
         flash("✅ Документ успешно добавлен в архив!")
@@ -2552,6 +4157,307 @@ def archive_upload_document():
         return redirect("/admin/archive")
 
 
+# ==================== ЗАГРУЗКА ЧАСТЯМИ ====================
+# POST /api/uploads — начать, PUT /api/uploads/<id>?offset=N — часть файла,
+# GET /api/uploads/<id> — сколько принято, POST /api/uploads/<id>/finalize — завершить.
+
+
+def partial_upload_path(upload_id):
+    return os.path.join(app.config["PARTIAL_UPLOADS_FOLDER"], upload_id)
+
+
+def check_upload_target(db, target, params):
+    """Параметры загрузки в чат или архив после проверки прав; (params, ошибка)"""
+    if target == "chat":
+        chat_id = params.get("chat_id")
+        chat_info = (
+            db.execute("SELECT client_id FROM chats WHERE id=?", (chat_id,)).fetchone()
+            if isinstance(chat_id, int)
+            else None
+        )
+        if not chat_info:
+            return None, ("Chat not found", 404)
+        if session["role"] == "client" and chat_info["client_id"] != session["user_id"]:
+            return None, ("Access denied", 403)
+        return {"chat_id": chat_id, "text": str(params.get("text") or "").strip()}, None
+
+    if target == "archive":
+        if session.get("role") != "admin":
+            return None, ("Access denied", 403)
+        title = str(params.get("title") or "").strip()
+        category = str(params.get("category") or "").strip()
+        if not title or category not in ARCHIVE_CATEGORIES:
+            return None, ("Title and valid category required", 400)
+        return {
+            "title": title,
+            "category": category,
+            "description": str(params.get("description") or "").strip(),
+        }, None
+
+    return None, ("Unknown upload target", 400)
+
+
+def load_upload_session(db, upload_id):
+    """Сессия загрузки текущего пользователя или None"""
+    return db.execute(
+        "SELECT * FROM upload_sessions WHERE id = ? AND user_id = ?",
+        (upload_id, session["user_id"]),
+    ).fetchone()
+
+
+def collect_upload_sessions(db, ttl=None):
+    """Удалить брошенные загрузки (без новых частей дольше ttl секунд)"""
+    if ttl is None:
+        ttl = app.config["UPLOAD_SESSION_TTL"]
+
+    expired = db.execute(
+        "DELETE FROM upload_sessions WHERE updated_at <= datetime('now', ?) RETURNING id",
+        (f"-{int(ttl)} seconds",),
+    ).fetchall()
+    db.commit()
+
+    for upload in expired:
+        try:
+            os.remove(partial_upload_path(upload["id"]))
+        except FileNotFoundError:
+            pass
+    return len(expired)
+
+
+@app.route("/api/uploads", methods=["POST"])
+def create_upload():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get("filename") or "")
+    size = data.get("size")
+
+    if not filename or not allowed_file(filename):
+        return jsonify({"error": "File type not allowed"}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({"error": "File size required"}), 400
+    if size > app.config["UPLOAD_MAX_SIZE"]:
+        return jsonify({"error": "File too large", "max_size": app.config["UPLOAD_MAX_SIZE"]}), 413
+
+    db = get_db()
+    params, error = check_upload_target(db, data.get("target"), data)
+    if error:
+        db.close()
+        return jsonify({"error": error[0]}), error[1]
+
+    upload_id = secrets.token_hex(16)
+    open(partial_upload_path(upload_id), "wb").close()
+    db.execute(
+        """
+        INSERT INTO upload_sessions (id, user_id, target, params, filename, size)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (upload_id, session["user_id"], data["target"], json.dumps(params), filename, size),
+    )
+    db.commit()
+    db.close()
+
+    return (
+        jsonify(
+            {
+                "upload_id": upload_id,
+                "offset": 0,
+                "size": size,
+                "chunk_size": app.config["UPLOAD_CHUNK_SIZE"],
+            }
+        ),
+        201,
+    )
+
+
+@app.route("/api/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    upload = load_upload_session(db, upload_id)
+    db.close()
+
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+
+    return jsonify(
+        {
+            "upload_id": upload_id,
+            "offset": upload["received"],
+            "size": upload["size"],
+            "complete": upload["received"] == upload["size"],
+        }
+    )
+
+
+@app.route("/api/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    """Часть файла с позиции offset; тело пишется в файл потоком, без буфера в памяти"""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    offset = request.args.get("offset", type=int)
+    length = request.content_length
+
+    db = get_db()
+    upload = load_upload_session(db, upload_id)
+
+    if not upload:
+        db.close()
+        return jsonify({"error": "Upload not found"}), 404
+
+    if offset != upload["received"]:
+        db.close()
+        return jsonify({"error": "Offset mismatch", "offset": upload["received"]}), 409
+
+    if length is None:
+        db.close()
+        return jsonify({"error": "Content-Length required"}), 411
+
+    if offset + length > upload["size"]:
+        db.close()
+        return jsonify({"error": "Chunk exceeds declared size"}), 400
+
+    # оборванная часть тоже засчитывается: клиент продолжит с принятого байта
+    written = 0
+    with open(partial_upload_path(upload_id), "r+b") as f:
+        f.seek(offset)
+        try:
+            while written < length:
+                chunk = request.stream.read(min(BLOB_CHUNK_SIZE, length - written))
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+        except ClientDisconnected:
+            pass
+
+    cursor = db.execute(
+        """
+        UPDATE upload_sessions SET received = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND received = ?
+        """,
+        (offset + written, upload_id, offset),
+    )
+    db.commit()
+    received = db.execute(
+        "SELECT received FROM upload_sessions WHERE id = ?", (upload_id,)
+    ).fetchone()
+    db.close()
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Offset mismatch", "offset": received["received"]}), 409
+
+    return jsonify({"upload_id": upload_id, "offset": offset + written, "size": upload["size"]})
+
+
+@app.route("/api/uploads/<upload_id>", methods=["DELETE"])
+def cancel_upload(upload_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    deleted = db.execute(
+        "DELETE FROM upload_sessions WHERE id = ? AND user_id = ? RETURNING id",
+        (upload_id, session["user_id"]),
+    ).fetchone()
+    db.commit()
+    db.close()
+
+    if not deleted:
+        return jsonify({"error": "Upload not found"}), 404
+
+    os.remove(partial_upload_path(upload_id))
+    return jsonify({"success": True})
+
+
+@app.route("/api/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id):
+    """Собранный файл -> хранилище и та же запись, что при обычной загрузке"""
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    upload = load_upload_session(db, upload_id)
+
+    if not upload:
+        db.close()
+        return jsonify({"error": "Upload not found"}), 404
+
+    if upload["received"] != upload["size"]:
+        db.close()
+        return jsonify({"error": "Upload incomplete", "offset": upload["received"]}), 409
+
+    # права могли измениться за время загрузки
+    params, error = check_upload_target(db, upload["target"], json.loads(upload["params"]))
+    if error:
+        db.close()
+        return jsonify({"error": error[0]}), error[1]
+
+    # повторный finalize (двойной клик, повтор после обрыва) не создаст второе сообщение
+    if not db.execute(
+        "DELETE FROM upload_sessions WHERE id = ? AND received = size RETURNING id",
+        (upload_id,),
+    ).fetchone():
+        db.close()
+        return jsonify({"error": "Upload not found"}), 404
+    db.commit()
+
+    try:
+        path = partial_upload_path(upload_id)
+        os.truncate(path, upload["size"])
+        blob_id, file_size = store_blob_file(db, path)
+
+        if upload["target"] == "chat":
+            result = post_chat_attachment(
+                db, params["chat_id"], upload["filename"], blob_id, file_size, params["text"]
+            )
+        else:
+            result = {
+                "success": True,
+                "filename": save_archive_document(
+                    db,
+                    params["title"],
+                    params["description"],
+                    params["category"],
+                    upload["filename"],
+                    blob_id,
+                    file_size,
+                ),
+            }
+    except Exception as e:
+        db.rollback()
+        if os.path.exists(partial_upload_path(upload_id)):
+            # файл ещё не в хранилище — возвращаем сессию: клиент повторит
+            # finalize, а брошенную загрузку удалит collect_upload_sessions
+            db.execute(
+                """
+                INSERT OR IGNORE INTO upload_sessions
+                    (id, user_id, target, params, filename, size, received, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    upload["id"],
+                    upload["user_id"],
+                    upload["target"],
+                    upload["params"],
+                    upload["filename"],
+                    upload["size"],
+                    upload["received"],
+                    upload["created_at"],
+                ),
+            )
+            db.commit()
+        db.close()
+        return jsonify({"error": str(e)}), 500
+
+    db.close()
+    return jsonify(result)
+
+
 @app.route("/admin/archive/download/<int:doc_id>")
 def archive_download_document(doc_id):
     if "user_id" not in session or session.get("role") != "admin":
@@ -2568,10 +4474,11 @@ def archive_download_document(doc_id):
         return redirect("/admin/archive")
 
     try:
-        return send_from_directory(
-            os.path.abspath(app.config["COMPANY_ARCHIVE_FOLDER"]),
+        return send_stored_file(
+            "company_archive",
             document["filename"],
             as_attachment=True,
+            blob_id=document["blob_id"],
         )
     except Exception as e:
         flash(f"Ошибка при скачивании: {str(e)}")
@@ -2594,10 +4501,11 @@ def archive_view_document(doc_id):
         return redirect("/admin/archive")
 
     try:
-        return send_from_directory(
-            os.path.abspath(app.config["COMPANY_ARCHIVE_FOLDER"]),
+        return send_stored_file(
+            "company_archive",
             document["filename"],
             as_attachment=False,
+            blob_id=document["blob_id"],
         )
     except Exception as e:
         flash(f"Ошибка при открытии: {str(e)}")
@@ -2621,16 +4529,18 @@ def archive_delete_document(doc_id):
         return redirect("/admin/archive")
 
     try:
-        # Удаляем файл
-        filepath = os.path.join(
-            app.config["COMPANY_ARCHIVE_FOLDER"], document["filename"]
-        )
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # Файл из хранилища освобождает триггер, старый файл удаляем сами
+        if document["blob_id"] is None:
+            filepath = os.path.join(
+                app.config["COMPANY_ARCHIVE_FOLDER"], document["filename"]
+            )
+            if os.path.exists(filepath):
+                os.remove(filepath)
 
         # Удаляем из БД
         db.execute("DELETE FROM company_archive WHERE id = ?", (doc_id,))
         db.commit()
+        collect_blobs(db)
         db.close()
 
         flash("✅ Документ удален из архива")
@@ -2689,30 +4599,7 @@ def archive_stats():
         return jsonify({"error": "Forbidden"}), 403
 
     db = get_db()
-
-    total_size = (
-        db.execute(
-            "SELECT SUM(file_size) as size FROM company_archive WHERE is_public = 1"
-        ).fetchone()["size"]
-        or 0
-    )
-
-    by_category = db.execute("""
-        SELECT category, COUNT(*) as count
-        FROM company_archive
-        WHERE is_public = 1
-        GROUP BY category
-        ORDER BY count DESC
-    """).fetchall()
-
-    stats = {
-        "total_documents": db.execute(
-            "SELECT COUNT(*) as count FROM company_archive WHERE is_public = 1"
-        ).fetchone()["count"],
-        "total_size": total_size,
-        "by_category": [dict(cat) for cat in by_category],
-    }
-
+    stats = get_archive_stats(db)
     db.close()
     return jsonify(stats)
 
@@ -2754,10 +4641,8 @@ def staff_preview_document(doc_id):
         if not member:
             return "Файл не найден", 404
 
-        return send_from_directory(
-            os.path.abspath(UPLOAD_FOLDER),
-            member["contract_filename"],
-            as_attachment=False,
+        return send_stored_file(
+            "contracts", member["contract_filename"], as_attachment=False
         )
 
     db = get_db()
@@ -2770,10 +4655,11 @@ def staff_preview_document(doc_id):
     if not document:
         return "Файл не найден", 404
 
-    return send_from_directory(
-        os.path.abspath(STAFF_DOCUMENTS_FOLDER),
+    return send_stored_file(
+        "staff_documents",
         document["filename"],
         as_attachment=False,
+        blob_id=document["blob_id"],
     )
 
 
@@ -2795,10 +4681,11 @@ def archive_preview_document(doc_id):
     if not document:
         return "Файл не найден", 404
 
-    return send_from_directory(
-        os.path.abspath(app.config["COMPANY_ARCHIVE_FOLDER"]),
+    return send_stored_file(
+        "company_archive",
         document["filename"],
         as_attachment=False,
+        blob_id=document["blob_id"],
     )
 
 
@@ -2812,11 +4699,7 @@ def preview_chat_attachment(filename):
         return "Доступ запрещён", 403
 
     try:
-        return send_from_directory(
-            os.path.abspath(app.config["CHAT_ATTACHMENTS_FOLDER"]),
-            filename,
-            as_attachment=False,
-        )
+        return send_stored_file("chat_attachments", filename, as_attachment=False)
     except Exception as e:
         return f"Файл не найден: {str(e)}", 404
 
@@ -2835,330 +4718,403 @@ def preview_file(filename):
 
     folder = request.args.get("folder", "chat_attachments")
 
-    valid_folders = {
-        "chat_attachments": CHAT_ATTACHMENTS_FOLDER,
-        "staff_documents": STAFF_DOCUMENTS_FOLDER,
-        "contracts": UPLOAD_FOLDER,
-        "company_archive": COMPANY_ARCHIVE_FOLDER,
-    }
-
-    if folder not in valid_folders:
+    if folder not in UPLOAD_FOLDERS:
         return "Невалидная папка", 403
 
-    folder_path = valid_folders[folder]
-
     try:
-        return send_from_directory(
-            os.path.abspath(folder_path),
-            filename,
-            as_attachment=False,
-        )
+        return send_stored_file(folder, filename, as_attachment=False)
     except Exception as e:
         return f"Файл не найден: {str(e)}", 404
 
 
 
 
-TRANSLATIONS = {
-    "uk": {  # Украинский (по умолчанию)
-        "welcome_title": "ARKONIX — створюємо цифрові рішення, які приносять результат",
-        "welcome_subtitle": "Ми розробляємо ботів, AI-системи, веб-додатки та сайти, які автоматизують бізнес, скорочують витрати та прискорюють зростання.",
-        "welcome_tagline": "Не просто код — продумані технології під реальні завдання.",
-        "about_title": "Про нас",
-        "services": "Послуги",
-        "team": "Команда",
-        "discussions": "Обговорення",
-        "login": "Вхід",
-        "register": "Реєстрація",
-        "logout": "Вихід",
-        "profile": "Особистий кабінет",
-        "admin_panel": "Адмін-панель",
-        "reviews_title": "Відгуки клієнтів",
-        "leave_review": "Залишити відгук",
-        "achievements_title": "Наші досягнення",
-        "telegram_bots": "Telegram-ботів",
-        "ai_solutions": "AI-рішень",
-        "applications": "Додатків",
-        "websites": "Сайтів",
-        "contacts": "Контакти",
-        "social_networks": "Соцмережі",
-        "terms": "Умови використання",
-        "privacy": "Політика та правила",
-        "rights_reserved": "Всі права захищені",
-        "main": "Головна",
-        "no_reviews": "Поки відгуків немає.",
-        "name": "Ім'я",
-        "rating": "Оцінка",
-        "select_rating": "⭐ Оберіть оцінку",
-        "excellent": "⭐⭐⭐⭐⭐ Відмінно!",
-        "good": "⭐⭐⭐⭐ Добре",
-        "normal": "⭐⭐⭐ Нормально",
-        "bad": "⭐⭐ Погано",
-        "terrible": "⭐ Жахливо",
-        "your_review": "Ваш відгук",
-        "submit": "Відправити",
-    },
-    "ru": {  # Русский
-        "welcome_title": "ARKONIX — создаём цифровые решения, которые приносят результат",
-        "welcome_subtitle": "Мы разрабатываем ботов, AI-системы, веб-приложения и сайты, которые автоматизируют бизнес, сокращают издержки и ускоряют рост.",
-        "welcome_tagline": "Не просто код — продуманные технологии под реальные задачи.",
-        "about_title": "О нас",
-        "services": "Услуги",
-        "team": "Команда",
-        "discussions": "Обсуждения",
-        "login": "Вход",
-        "register": "Регистрация",
-        "logout": "Выход",
-        "profile": "Личный кабинет",
-        "admin_panel": "Админ-панель",
-        "reviews_title": "Отзывы клиентов",
-        "leave_review": "Оставить отзыв",
-        "achievements_title": "Наши достижения",
-        "telegram_bots": "Telegram-ботов",
-        "ai_solutions": "AI-решений",
-        "applications": "Приложений",
-        "websites": "Сайтов",
-        "contacts": "Контакты",
-        "social_networks": "Соцсети",
-        "terms": "Условия использования",
-        "privacy": "Политика и правила",
-        "rights_reserved": "Все права защищены",
-        "main": "Главная",
-        "no_reviews": "Пока отзывов нет.",
-        "name": "Имя",
-        "rating": "Оценка",
-        "select_rating": "⭐ Выберите оценку",
-        "excellent": "⭐⭐⭐⭐⭐ Отлично!",
-        "good": "⭐⭐⭐⭐ Хорошо",
-        "normal": "⭐⭐⭐ Нормально",
-        "bad": "⭐⭐ Плохо",
-        "terrible": "⭐ Ужасно",
-        "your_review": "Ваш отзыв",
-        "submit": "Отправить",
-    },
-    "en": {  # English
-        "welcome_title": "ARKONIX — creating digital solutions that deliver results",
-        "welcome_subtitle": "We develop bots, AI systems, web applications and websites that automate business, reduce costs and accelerate growth.",
-        "welcome_tagline": "Not just code — thoughtful technologies for real tasks.",
-        "about_title": "About us",
-        "services": "Services",
-        "team": "Team",
-        "discussions": "Discussions",
-        "login": "Login",
-        "register": "Register",
-        "logout": "Logout",
-        "profile": "Profile",
-        "admin_panel": "Admin Panel",
-        "reviews_title": "Client Reviews",
-        "leave_review": "Leave a Review",
-        "achievements_title": "Our Achievements",
-        "telegram_bots": "Telegram Bots",
-        "ai_solutions": "AI Solutions",
-        "applications": "Applications",
-        "websites": "Websites",
-        "contacts": "Contacts",
-        "social_networks": "Social Networks",
-        "terms": "Terms of Use",
-        "privacy": "Privacy Policy",
-        "rights_reserved": "All rights reserved",
-        "main": "Home",
-        "no_reviews": "No reviews yet.",
-        "name": "Name",
-        "rating": "Rating",
-        "select_rating": "⭐ Select rating",
-        "excellent": "⭐⭐⭐⭐⭐ Excellent!",
-        "good": "⭐⭐⭐⭐ Good",
-        "normal": "⭐⭐⭐ Normal",
-        "bad": "⭐⭐ Bad",
-        "terrible": "⭐ Terrible",
-        "your_review": "Your review",
-        "submit": "Submit",
-    },
-    "de": {  # Deutsch (Немецкий)
-        "welcome_title": "ARKONIX — wir schaffen digitale Lösungen, die Ergebnisse liefern",
-        "welcome_subtitle": "Wir entwickeln Bots, KI-Systeme, Webanwendungen und Websites, die Geschäftsprozesse automatisieren, Kosten senken und Wachstum beschleunigen.",
-        "welcome_tagline": "Nicht nur Code — durchdachte Technologien für echte Aufgaben.",
-        "about_title": "Über uns",
-        "services": "Dienstleistungen",
-        "team": "Team",
-        "discussions": "Diskussionen",
-        "login": "Anmelden",
-        "register": "Registrieren",
-        "logout": "Abmelden",
-        "profile": "Profil",
-        "admin_panel": "Admin-Panel",
-        "reviews_title": "Kundenbewertungen",
-        "leave_review": "Bewertung hinterlassen",
-        "achievements_title": "Unsere Erfolge",
-        "telegram_bots": "Telegram-Bots",
-        "ai_solutions": "KI-Lösungen",
-        "applications": "Anwendungen",
-        "websites": "Websites",
-        "contacts": "Kontakte",
-        "social_networks": "Soziale Netzwerke",
-        "terms": "Nutzungsbedingungen",
-        "privacy": "Datenschutzrichtlinie",
-        "rights_reserved": "Alle Rechte vorbehalten",
-        "main": "Startseite",
-        "no_reviews": "Noch keine Bewertungen.",
-        "name": "Name",
-        "rating": "Bewertung",
-        "select_rating": "⭐ Bewertung wählen",
-        "excellent": "⭐⭐⭐⭐⭐ Ausgezeichnet!",
-        "good": "⭐⭐⭐⭐ Gut",
-        "normal": "⭐⭐⭐ Normal",
-        "bad": "⭐⭐ Schlecht",
-        "terrible": "⭐ Schrecklich",
-        "your_review": "Ihre Bewertung",
-        "submit": "Senden",
-    },
-    "it": {  # Italiano
-        "welcome_title": "ARKONIX — creiamo soluzioni digitali che portano risultati",
-        "welcome_subtitle": "Sviluppiamo bot, sistemi AI, applicazioni web e siti che automatizzano il business, riducono i costi e accelerano la crescita.",
-        "welcome_tagline": "Non solo codice — tecnologie pensate per compiti reali.",
-        "about_title": "Chi siamo",
-        "services": "Servizi",
-        "team": "Team",
-        "discussions": "Discussioni",
-        "login": "Accedi",
-        "register": "Registrati",
-        "logout": "Esci",
-        "profile": "Profilo",
-        "admin_panel": "Pannello Admin",
-        "reviews_title": "Recensioni dei clienti",
-        "leave_review": "Lascia una recensione",
-        "achievements_title": "I nostri risultati",
-        "telegram_bots": "Bot Telegram",
-        "ai_solutions": "Soluzioni AI",
-        "applications": "Applicazioni",
-        "websites": "Siti web",
-        "contacts": "Contatti",
-        "social_networks": "Social Network",
-        "terms": "Termini di utilizzo",
-        "privacy": "Privacy Policy",
-        "rights_reserved": "Tutti i diritti riservati",
-        "main": "Home",
-        "no_reviews": "Nessuna recensione ancora.",
-        "name": "Nome",
-        "rating": "Valutazione",
-        "select_rating": "⭐ Seleziona valutazione",
-        "excellent": "⭐⭐⭐⭐⭐ Eccellente!",
-        "good": "⭐⭐⭐⭐ Buono",
-        "normal": "⭐⭐⭐ Normale",
-        "bad": "⭐⭐ Cattivo",
-        "terrible": "⭐ Terribile",
-        "your_review": "La tua recensione",
-        "submit": "Invia",
-    },
-    "fr": {  # Français
-        "welcome_title": "ARKONIX — créons des solutions numériques qui donnent des résultats",
-        "welcome_subtitle": "Nous développons des bots, des systèmes IA, des applications web et des sites qui automatisent les affaires, réduisent les coûts et accélèrent la croissance.",
-        "welcome_tagline": "Pas seulement du code — des technologies réfléchies pour des tâches réelles.",
-        "about_title": "À propos de nous",
-        "services": "Services",
-        "team": "Équipe",
-        "discussions": "Discussions",
-        "login": "Connexion",
-        "register": "Inscription",
-        "logout": "Déconnexion",
-        "profile": "Profil",
-        "admin_panel": "Panneau Admin",
-        "reviews_title": "Avis des clients",
-        "leave_review": "Laisser un avis",
-        "achievements_title": "Nos réalisations",
-        "telegram_bots": "Bots Telegram",
-        "ai_solutions": "Solutions IA",
-        "applications": "Applications",
-        "websites": "Sites web",
-        "contacts": "Contacts",
-        "social_networks": "Réseaux sociaux",
-        "terms": "Conditions d'utilisation",
-        "privacy": "Politique de confidentialité",
-        "rights_reserved": "Tous droits réservés",
-        "main": "Accueil",
-        "no_reviews": "Pas encore d'avis.",
-        "name": "Nom",
-        "rating": "Évaluation",
-        "select_rating": "⭐ Sélectionner l'évaluation",
-        "excellent": "⭐⭐⭐⭐⭐ Excellent!",
-        "good": "⭐⭐⭐⭐ Bien",
-        "normal": "⭐⭐⭐ Normal",
-        "bad": "⭐⭐ Mauvais",
-        "terrible": "⭐ Terrible",
-        "your_review": "Votre avis",
-        "submit": "Envoyer",
-    },
-    "zh": {  # 中文
-        "welcome_title": "ARKONIX — 创造带来成果的数字解决方案",
-        "welcome_subtitle": "我们开发机器人、AI系统、网络应用程序和网站，自动化业务、降低成本并加速增长。",
-        "welcome_tagline": "不仅仅是代码 — 针对实际任务的周到技术。",
-        "about_title": "关于我们",
-        "services": "服务",
-        "team": "团队",
-        "discussions": "讨论",
-        "login": "登录",
-        "register": "注册",
-        "logout": "退出",
-        "profile": "个人资料",
-        "admin_panel": "管理面板",
-        "reviews_title": "客户评价",
-        "leave_review": "留下评价",
-        "achievements_title": "我们的成就",
-        "telegram_bots": "Telegram机器人",
-        "ai_solutions": "AI解决方案",
-        "applications": "应用程序",
-        "websites": "网站",
-        "contacts": "联系方式",
-        "social_networks": "社交网络",
-        "terms": "使用条款",
-        "privacy": "隐私政策",
-        "rights_reserved": "版权所有",
-        "main": "主页",
-        "no_reviews": "暂无评价。",
-        "name": "姓名",
-        "rating": "评分",
-        "select_rating": "⭐ 选择评分",
-        "excellent": "⭐⭐⭐⭐⭐ 优秀！",
-        "good": "⭐⭐⭐⭐ 好",
-        "normal": "⭐⭐⭐ 一般",
-        "bad": "⭐⭐ 差",
-        "terrible": "⭐ 很差",
-        "your_review": "您的评价",
-        "submit": "提交",
-    },
-}
+# ==================== СТАТИКА ====================
+# static_url() отдаёт адрес /assets/... с отпечатком из манифеста сборки; такой
+# файл не меняется, и браузер не перепроверяет его год. Без сборки — обычный
+# /static/.... Манифест читается один раз на процесс (при auto_reload шаблонов
+# — заново после каждой сборки).
+_static_manifest = {"mtime": None, "data": {"files": {}, "images": {}}}
+_static_manifest_lock = threading.Lock()
 
+IMAGE_MIMETYPES = {"avif": "image/avif", "webp": "image/webp"}
 
-# Функция для получения переводов
-def get_translation(key, lang=None):
-    """Получить перевод по ключу"""
+
+def load_static_manifest():
+    if _static_manifest["mtime"] is not None and not app.jinja_env.auto_reload:
+        return _static_manifest["data"]
+
+    path = os.path.join(app.config["STATIC_BUILD_FOLDER"], static_assets.MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = 0
+    if mtime != _static_manifest["mtime"]:
+        with _static_manifest_lock:
+            rebuilt = _static_manifest["mtime"] is not None
+            _static_manifest["data"] = static_assets.load_manifest(
+                app.config["STATIC_BUILD_FOLDER"]
+            )
+            _static_manifest["mtime"] = mtime
+        if rebuilt:
+            # в кэше страниц остались адреса прежней сборки
+            invalidate_page_cache()
+    return _static_manifest["data"]
+
+
+def static_url(filename):
+    """Адрес статического файла: собранный с отпечатком, иначе из static/"""
+    built = load_static_manifest()["files"].get(filename)
+    if built:
+        return url_for("static_asset", filename=built)
+    if filename in VENDOR_ASSETS and not os.path.exists(
+        os.path.join(app.static_folder, filename)
+    ):
+        return VENDOR_ASSETS[filename]
+    return url_for("static", filename=filename)
+
+
+def static_sources(filename):
+    """[(mimetype, srcset)] уменьшенных копий изображения для <source> в <picture>"""
+    image = load_static_manifest()["images"].get(filename)
+    if not image:
+        return []
+    return [
+        (
+            IMAGE_MIMETYPES[ext],
+            ", ".join(
+                f"{url_for('static_asset', filename=path)} {width}w"
+                for width, path in entries
+            ),
+        )
+        for ext, entries in sorted(
+            image["variants"].items(),
+            key=lambda item: list(IMAGE_MIMETYPES).index(item[0]),
+        )
+    ]
+
+
+def preload(url, kind):
+    """Запомнить файл для заголовка Link: preload ответа (только свои адреса)"""
+    if not url.startswith("/"):
+        return
+    link = f"<{url}>; rel=preload; as={kind}"
+    links = g.setdefault("preload_links", [])
+    if link not in links:
+        links.append(link)
+
+
+def stylesheet(filename):
+    """<link rel="stylesheet"> на статический файл с preload в заголовках"""
+    url = static_url(filename)
+    preload(url, "style")
+    return Markup(f'<link rel="stylesheet" href="{escape(url)}">')
+
+
+def script(filename):
+    """<script src> на статический файл с preload в заголовках"""
+    url = static_url(filename)
+    preload(url, "script")
+    return Markup(f'<script src="{escape(url)}"></script>')
+
+
+def take_preload_links():
+    """Заголовок Link для отрисованных в запросе стилей и скриптов (и сброс списка)"""
+    return ", ".join(g.pop("preload_links", ()))
+
+
+@app.after_request
+def add_preload_links(response):
+    links = take_preload_links()
+    if links and response.mimetype == "text/html" and "Link" not in response.headers:
+        response.headers["Link"] = links
+    return response
+
+
+@app.route("/assets/<path:filename>")
+def static_asset(filename):
+    """Собранная статика; сжатая копия (.br/.gz) — если клиент её принимает"""
+    path = safe_join(app.config["STATIC_BUILD_FOLDER"], filename)
+    if path is None:
+        abort(404)
+
+    encoding, suffix = next(
+        (
+            (encoding, suffix)
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz"))
+            if request.accept_encodings[encoding] and os.path.isfile(path + suffix)
+        ),
+        (None, ""),
+    )
+    response = serve_file(
+        path + suffix,
+        "static_assets",
+        download_name=os.path.basename(path),
+        mimetype=mimetypes.guess_type(path)[0],
+    )
+    # статика одинакова для всех — её можно хранить и общим кэшам
+    response.cache_control.private = None
+    response.cache_control.public = True
+    if os.path.isfile(path + ".gz"):
+        response.vary.add("Accept-Encoding")
+        if encoding and response.status_code in (200, 206):
+            response.headers["Content-Encoding"] = encoding
+    return response
+
+
+@app.cli.command("build-static")
+@click.option("--clean", is_flag=True, help="Удалить файлы прежних сборок")
+def build_static_command(clean):
+    """Собрать статику с отпечатками, сжатыми копиями и вариантами изображений"""
+    for relpath, error in static_assets.fetch_vendor_assets(
+        app.static_folder, VENDOR_ASSETS
+    ):
+        print(f"⚠️ {relpath} не скачан ({error}) — страницы берут его с CDN")
+
+    manifest = static_assets.build_assets(
+        app.static_folder,
+        app.config["STATIC_BUILD_FOLDER"],
+        app.config["STATIC_IMAGE_WIDTHS"],
+    )
+    print(
+        f"✅ Собрано файлов: {len(manifest['files'])}, "
+        f"изображений с вариантами: {len(manifest['images'])}"
+    )
+    if static_assets.brotli is None:
+        print("⚠️ brotli не установлен — .br-копии не созданы")
+    if static_assets.Image is None:
+        print("⚠️ Pillow не установлен — варианты изображений не созданы")
+
+    if clean:
+        removed = static_assets.clean_assets(app.config["STATIC_BUILD_FOLDER"], manifest)
+        print(f"✅ Удалено файлов прежних сборок: {removed}")
+
+
+# ==================== ПЕРЕВОДЫ ====================
+# Каталоги лежат в translations/<язык>.json и загружаются при первом обращении.
+# Собранный каталог уже содержит украинские строки вместо отсутствующих,
+# поэтому t() — один поиск в словаре.
+TRANSLATIONS_FOLDER = os.path.join(app.root_path, "translations")
+LANGUAGES = ("uk", "ru", "en", "de", "it", "fr", "zh")
+DEFAULT_LANGUAGE = "uk"
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def _compile_catalog(lang):
+    with open(os.path.join(TRANSLATIONS_FOLDER, f"{lang}.json"), encoding="utf-8") as f:
+        strings = json.load(f)
+    if lang != DEFAULT_LANGUAGE:
+        strings = {**_compile_catalog(DEFAULT_LANGUAGE)["strings"], **strings}
+
+    # JSON для клиентских скриптов и его отпечаток для адреса /i18n/<язык>.<отпечаток>.json
+    bundle = json.dumps(
+        strings, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    ).encode("utf-8")
+    return {
+        "strings": strings,
+        "bundle": bundle,
+        "fingerprint": hashlib.sha256(bundle).hexdigest()[:12],
+    }
+
+
+def load_catalog(lang):
+    """Собранный каталог языка (строки, JSON-бандл, отпечаток); кэшируется в процессе"""
+    if lang not in LANGUAGES:
+        lang = DEFAULT_LANGUAGE
+
+    catalog = _catalogs.get(lang)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(lang)
+            if catalog is None:
+                catalog = _catalogs[lang] = _compile_catalog(lang)
+    return catalog
+
+
+def get_language():
+    """
+    Язык текущего запроса: выбранный в сессии, иначе из Accept-Language,
+    иначе украинский. Определяется один раз на запрос; сессия не меняется.
+    """
+    if not has_request_context():
+        return DEFAULT_LANGUAGE
+
+    lang = g.get("language")
     if lang is None:
-        lang = session.get("language", "uk")
+        lang = session.get("language")
+        if lang not in LANGUAGES:
+            lang = request.accept_languages.best_match(
+                LANGUAGES, default=DEFAULT_LANGUAGE
+            )
+        g.language = lang
+    return lang
 
-    if lang not in TRANSLATIONS:
-        lang = "uk"
 
-    return TRANSLATIONS[lang].get(key, TRANSLATIONS["uk"].get(key, key))
+# Функция для получения переводов
+def get_translation(key, lang=None):
+    """Получить перевод по ключу"""
+    return load_catalog(lang or get_language())["strings"].get(key, key)
 
 
 # Функция для получения всех переводов для текущего языка
 def get_all_translations():
     """Получить все переводы для текущего языка"""
-    lang = session.get("language", "uk")
-    if lang not in TRANSLATIONS:
-        lang = "uk"
-    return TRANSLATIONS[lang]
+    return load_catalog(get_language())["strings"]
+
+
+def translations_url(lang=None):
+    """Адрес JSON-бандла переводов с отпечатком содержимого"""
+    lang = lang or get_language()
+    return url_for(
+        "translations_bundle", lang=lang, fingerprint=load_catalog(lang)["fingerprint"]
+    )
 
 
 # Регистрируем функцию в Jinja2
-app.jinja_env.globals.update(t=get_translation, translations=get_all_translations)
+app.jinja_env.globals.update(
+    t=get_translation,
+    translations=get_all_translations,
+    current_language=get_language,
+    translations_url=translations_url,
+    static_url=static_url,
+    static_sources=static_sources,
+    stylesheet=stylesheet,
+    script=script,
+)
+
+
+@app.route("/i18n/<lang>.<fingerprint>.json")
+def translations_bundle(lang, fingerprint):
+    """Переводы для клиентских скриптов; адрес меняется вместе с содержимым"""
+    if lang not in LANGUAGES:
+        abort(404)
+
+    catalog = load_catalog(lang)
+    if fingerprint != catalog["fingerprint"]:
+        return redirect(translations_url(lang))
+
+    response = app.response_class(catalog["bundle"], mimetype="application/json")
+    response.set_etag(catalog["fingerprint"])
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 24 * 3600
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+# ==================== КЭШ СТРАНИЦ ====================
+# Информационные страницы зависят только от языка и от того, кто смотрит
+# (гость, клиент, админ, сотрудник — меняется меню). Готовые ответы хранятся
+# в памяти процесса сразу сжатыми; Jinja вызывается только при промахе.
+# Кэш живёт до перезапуска (деплоя); при auto_reload шаблонов (debug)
+# изменённый шаблон отрисовывается заново.
+app.config["PAGE_CACHE_WARMUP"] = os.environ.get("ARKONIX_PAGE_CACHE_WARMUP", "1") != "0"
+CACHED_PAGE_TEMPLATES = (
+    "services.html",
+    "team.html",
+    "terms.html",
+    "privacy.html",
+    "offer.html",
+)
+PAGE_ENCODINGS = ("br", "gzip")
+
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+
+def page_audience():
+    """Кто смотрит страницу: от этого в шаблонах зависят меню и кнопки"""
+    if not session.get("user_id"):
+        return "guest"
+    return session.get("role") or "user"
+
+
+def _render_page_variants(template_name):
+    """
+    Тело страницы во всех кодировках: {кодировка: (тело, ETag, заголовки)}.
+    Заголовки собраны заранее — при попадании в кэш остаётся только отдать их.
+    """
+    template = app.jinja_env.get_template(template_name)
+    body = render_template(template).encode("utf-8")
+    links = take_preload_links()
+    digest = hashlib.sha256(body).hexdigest()[:20]
+
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+
+    variants = {}
+    for encoding, data in bodies.items():
+        # у каждой кодировки свой сильный ETag
+        etag = digest if encoding == "identity" else f"{digest}-{encoding}"
+        headers = [
+            ("ETag", f'"{etag}"'),
+            ("Vary", "Accept-Encoding, Accept-Language, Cookie"),
+            # страница зависит от сессии — общим кэшам её хранить нельзя
+            ("Cache-Control", "private, no-cache"),
+        ]
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        if links:
+            headers.append(("Link", links))
+        variants[encoding] = (data, etag, headers)
+    return {"template": template, "variants": variants}
+
+
+def cached_page(template_name):
+    """Запись кэша для текущего языка и зрителя; отрисовывается при промахе"""
+    key = (template_name, get_language(), page_audience())
+    entry = _page_cache.get(key)
+    if entry is None or (
+        app.jinja_env.auto_reload and not entry["template"].is_up_to_date
+    ):
+        entry = _render_page_variants(template_name)
+        with _page_cache_lock:
+            _page_cache[key] = entry
+    return entry
+
+
+def render_cached_page(template_name):
+    """Ответ информационной страницы из кэша; 304 по If-None-Match"""
+    variants = cached_page(template_name)["variants"]
+    encoding = next(
+        (e for e in PAGE_ENCODINGS if e in variants and request.accept_encodings[e]),
+        "identity",
+    )
+    body, etag, headers = variants[encoding]
+
+    if request.if_none_match.contains(etag):
+        return app.response_class(status=304, headers=headers[:3])
+    return app.response_class(body, headers=headers, mimetype="text/html")
+
+
+def invalidate_page_cache():
+    with _page_cache_lock:
+        _page_cache.clear()
+
+
+def warm_page_cache():
+    """Отрисовать страницы для гостей на всех языках; вернуть число ошибок"""
+    failed = 0
+    for template_name in CACHED_PAGE_TEMPLATES:
+        for lang in LANGUAGES:
+            with app.test_request_context():
+                session["language"] = lang
+                try:
+                    cached_page(template_name)
+                except Exception as e:
+                    print(f"⚠️ Кэш страниц: {template_name} не отрисован: {e}")
+                    failed += 1
+                    break
+    return failed
 
 
 # Роут для смены языка
 @app.route("/set_language/<lang>")
 def set_language(lang):
     """Установить язык интерфейса"""
-    if lang in TRANSLATIONS:
+    if lang in LANGUAGES:
         session["language"] = lang
         flash(f"✅ Язык изменён на {lang.upper()}")
     else:
@@ -3171,16 +5127,11 @@ def set_language(lang):
     return redirect("/")
 
 
-@app.before_request
-def set_default_language():
-    """Установить украинский язык по умолчанию, если не выбран"""
-    if "language" not in session:
-        session["language"] = "uk"
-
-
 @app.route("/offer")
 def offer():
-    return render_template("offer.html")
+    return render_cached_page("offer.html")
+
+
 
 
 
@@ -3201,6 +5152,8 @@ def offer():
 
 
 
+if app.config["PAGE_CACHE_WARMUP"]:
+    warm_page_cache()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""
+Бенчмарк страницы /admin/all_documents на синтетических данных: число запросов
+и время сборки для прежнего цикла (запрос на участника) и load_members_documents().
+
+Запуск: python benchmarks/all_documents.py [участников] [документов_на_участника]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="arkonix_bench_")
+os.environ["ARKONIX_DATABASE"] = os.path.join(TMP_DIR, "bench.db")
+os.chdir(TMP_DIR)
+
+import app as arkonix  # noqa: E402
+
+STATUSES = ("pending", "approved", "rejected")
+DOC_TYPES = ("passport", "certificate", "diploma", "other")
+
+
+def legacy_all_documents(db):
+    """Прежняя сборка: все участники, затем документы каждого отдельным запросом"""
+    members = db.execute(
+        """
+        SELECT * FROM team_members
+        ORDER BY
+            CASE status
+                WHEN 'pending' THEN 1
+                WHEN 'approved' THEN 2
+                WHEN 'rejected' THEN 3
+            END,
+            created_at DESC
+        """
+    ).fetchall()
+
+    members_with_docs = []
+    for member in members:
+        documents = [{"id": f"contract_{member['id']}", "type": "contract"}]
+        for doc in db.execute(
+            "SELECT * FROM staff_documents WHERE member_id=? ORDER BY uploaded_at DESC",
+            (member["id"],),
+        ).fetchall():
+            documents.append(dict(doc))
+        members_with_docs.append({"member": dict(member), "documents": documents})
+    return members_with_docs
+
+
+def seed(db, members, docs_per_member):
+    rnd = random.Random(42)
+    for i in range(members):
+        cursor = db.execute(
+            """
+            INSERT INTO team_members
+                (first_name, last_name, position, contract_filename,
+                 username, password, email, status)
+            VALUES (?, ?, 'dev', ?, ?, '', ?, ?)
+            """,
+            ("Member", str(i), f"c{i}.pdf", f"member{i}", f"m{i}@example.com",
+             rnd.choice(STATUSES)),
+        )
+        member_id = cursor.lastrowid
+        db.executemany(
+            """
+            INSERT INTO staff_documents
+                (member_id, document_name, document_type, filename)
+            VALUES (?, ?, ?, ?)
+            """,
+            [
+                (member_id, f"doc {j}", rnd.choice(DOC_TYPES), f"d{member_id}_{j}.pdf")
+                for j in range(rnd.randint(0, docs_per_member * 2))
+            ],
+        )
+    db.commit()
+
+
+def run(name, build, db, repeat=5):
+    statements = []
+    db.set_trace_callback(statements.append)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        build(db)
+    elapsed = (time.perf_counter() - started) / repeat
+    db.set_trace_callback(None)
+
+    print(
+        f"{name:<34} {len(statements) / repeat:>7.0f} запросов"
+        f"   {elapsed * 1000:>8.2f} мс/страница"
+    )
+
+
+if __name__ == "__main__":
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    docs_per_member = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        seed(db, members, docs_per_member)
+        print(f"Участников: {members}, база: {arkonix.app.config['DATABASE']}")
+
+        run("цикл по участникам (все)", legacy_all_documents, db)
+        run(
+            "load_members_documents (все)",
+            lambda conn: arkonix.load_members_documents(conn, per_page=members),
+            db,
+        )
+        run("load_members_documents (страница)", arkonix.load_members_documents, db)
+        run(
+            "load_members_documents (фильтры)",
+            lambda conn: arkonix.load_members_documents(conn, "approved", "diploma"),
+            db,
+        )
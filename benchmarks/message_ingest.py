@@ -0,0 +1,102 @@
+"""
+Микро-бенчмарк записи сообщений чата: обращения Python к SQLite (вызовы
+execute/executemany/commit/rollback соединения) и время на сообщение для
+старой последовательности send_message и для ingest_message(). Запросы,
+которые SQLite выполняет внутри триггеров, обращениями не считаются.
+
+Запуск: python benchmarks/message_ingest.py [количество_сообщений]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="arkonix_bench_")
+os.environ["ARKONIX_DATABASE"] = os.path.join(TMP_DIR, "bench.db")
+os.chdir(TMP_DIR)
+
+import app as arkonix  # noqa: E402
+
+
+def legacy_ingest(db, chat_id, sender_id, sender_role, text):
+    """Прежняя запись из send_message: INSERT, SELECT, UPDATE, COMMIT, SELECT"""
+    cursor = db.execute(
+        "INSERT INTO messages (chat_id, sender_id, text) VALUES (?,?,?)",
+        (chat_id, sender_id, text),
+    )
+    message_id = cursor.lastrowid
+
+    chat_info = db.execute(
+        "SELECT status, client_id FROM chats WHERE id=?", (chat_id,)
+    ).fetchone()
+
+    if (
+        sender_role in ["admin", "staff"]
+        and chat_info
+        and chat_info["status"] == "waiting"
+    ):
+        db.execute("UPDATE chats SET status=? WHERE id=?", ("in_progress", chat_id))
+
+    db.commit()
+
+    return db.execute(
+        "SELECT created_at FROM messages WHERE id=?", (message_id,)
+    ).fetchone()
+
+
+class CountingConnection:
+    """Обёртка соединения, считающая обращения к SQLite из Python"""
+
+    CALLS = ("execute", "executemany", "commit", "rollback")
+
+    def __init__(self, db):
+        self.db = db
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if name not in self.CALLS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+def new_chat(db):
+    cursor = db.execute(
+        "INSERT INTO chats (client_id, service_name, status) VALUES (1, 'bench', 'waiting')"
+    )
+    db.commit()
+    return cursor.lastrowid
+
+
+def run(name, ingest, count):
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        chat_id = new_chat(db)
+
+        counting = CountingConnection(db)
+        started = time.perf_counter()
+        for i in range(count):
+            role = "admin" if i % 2 else "client"
+            ingest(counting, chat_id, 1, role, f"message {i}")
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<16} {counting.calls / count:>6.2f} обращений/сообщение"
+        f"   {elapsed / count * 1e6:>8.1f} мкс/сообщение"
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Сообщений: {count}, база: {arkonix.app.config['DATABASE']}")
+    run("send_message", legacy_ingest, count)
+    run("ingest_message", arkonix.ingest_message, count)
@@ -0,0 +1,94 @@
+"""
+Бенчмарк /api/search/messages: задержка search_messages() на синтетической
+истории чатов (индекс messages_fts поддерживается триггерами при вставке).
+
+Запуск: python benchmarks/message_search.py [сообщений] [чатов]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="arkonix_bench_")
+os.environ["ARKONIX_DATABASE"] = os.path.join(TMP_DIR, "bench.db")
+os.chdir(TMP_DIR)
+
+import app as arkonix  # noqa: E402
+
+WORDS = (
+    "сайт бот дизайн макет оплата счёт договор правки срок логотип сервер "
+    "домен хостинг тест релиз баг отчёт таблица форма кнопка страница "
+    "website invoice payment deploy review feedback draft mockup"
+).split()
+
+QUERIES = ["оплата", "invoice", "договор правки", "INV-777", "стран*", "mockup deploy"]
+
+
+def seed(db, messages, chats, rnd):
+    db.executemany(
+        "INSERT INTO users (id, username, password, role) VALUES (?, ?, '', 'client')",
+        [(1000 + i, f"client{i}") for i in range(chats // 10 + 1)],
+    )
+    db.executemany(
+        "INSERT INTO chats (id, client_id, service_name) VALUES (?, ?, 'bench')",
+        [(i + 1, 1000 + i // 10) for i in range(chats)],
+    )
+
+    batch = []
+    for i in range(messages):
+        text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 16)))
+        if i % 50_000 == 0:
+            text += " INV-777"
+        attachment = f"20250101_{i}_invoice_{i}.pdf" if i % 100 == 0 else None
+        batch.append((rnd.randint(1, chats), 1000, text, attachment))
+        if len(batch) == 50_000:
+            db.executemany(
+                "INSERT INTO messages (chat_id, sender_id, text, attachment_filename) "
+                "VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            batch.clear()
+    if batch:
+        db.executemany(
+            "INSERT INTO messages (chat_id, sender_id, text, attachment_filename) "
+            "VALUES (?, ?, ?, ?)",
+            batch,
+        )
+    db.commit()
+    db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+    db.commit()
+
+
+def measure(db, query, repeat=20, **kwargs):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results, _ = arkonix.search_messages(db, query, **kwargs)
+    return (time.perf_counter() - started) / repeat * 1000, len(results)
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    rnd = random.Random(42)
+
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        started = time.perf_counter()
+        seed(db, messages, chats, rnd)
+        print(
+            f"Сообщений: {messages}, чатов: {chats}, вставка "
+            f"{time.perf_counter() - started:.1f} с, база: {arkonix.app.config['DATABASE']}"
+        )
+
+        for query in QUERIES:
+            admin_ms, found = measure(db, query)
+            client_ms, _ = measure(db, query, client_id=1000)
+            print(
+                f"{query!r:<18} админ {admin_ms:>8.2f} мс ({found} шт.)"
+                f"   клиент {client_ms:>8.2f} мс"
+            )
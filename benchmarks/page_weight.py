@@ -0,0 +1,117 @@
+"""
+Вес HTML основных страниц: байты ответа (как есть и в gzip), сколько из них
+занимают встроенные <style> и <script>, и какие CSS/JS подключены отдельными
+файлами (они кэшируются браузером и при повторных заходах не скачиваются).
+
+Запуск: python benchmarks/page_weight.py
+"""
+
+import gzip
+import os
+import re
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="arkonix_bench_")
+os.environ["ARKONIX_DATABASE"] = os.path.join(TMP_DIR, "bench.db")
+os.environ["ARKONIX_PAGE_CACHE_WARMUP"] = "0"
+os.chdir(TMP_DIR)
+
+import app as arkonix  # noqa: E402
+
+ADMIN = {"user_id": 1, "username": "admin", "role": "admin"}
+CLIENT = {"user_id": 2, "username": "client", "role": "client"}
+STAFF = {"staff_member_id": 1, "username": "member1", "role": "staff"}
+
+# (сессия, адрес)
+MAIN_PAGES = [
+    (None, "/"),
+    (None, "/services"),
+    (None, "/team"),
+    (CLIENT, "/discussions"),
+    (None, "/terms"),
+    (None, "/privacy"),
+    (None, "/offer"),
+    (None, "/login"),
+    (None, "/register"),
+    (None, "/staff/login"),
+    (None, "/staff/register"),
+    (CLIENT, "/profile"),
+    (CLIENT, "/chat/1"),
+    (ADMIN, "/profile"),
+    (ADMIN, "/admin/payments"),
+    (ADMIN, "/admin/payments/staff"),
+    (ADMIN, "/admin/team"),
+    (ADMIN, "/admin/archive"),
+    (ADMIN, "/admin/all_documents"),
+    (ADMIN, "/admin/reviews"),
+    (ADMIN, "/admin/payment_settings"),
+    (STAFF, "/staff/profile"),
+    (STAFF, "/staff/payments"),
+]
+
+INLINE_STYLE = re.compile(r"<style[^>]*>.*?</style>", re.S)
+INLINE_SCRIPT = re.compile(r"<script(?![^>]*\bsrc=)[^>]*>.*?</script>", re.S)
+LINKED = re.compile(r'<link rel="stylesheet" href="(/[^"]+)"|<script src="(/[^"]+)"')
+
+
+def seed(db):
+    db.execute("INSERT INTO chats (client_id, service_name, status) VALUES (2, 'bench', 'active')")
+    db.execute("INSERT INTO messages (chat_id, sender_id, text) VALUES (1, 2, 'текст')")
+    db.execute(
+        """
+        INSERT INTO team_members
+            (first_name, last_name, position, contract_filename, username, password, status)
+        VALUES ('Member', '1', 'dev', 'c1.pdf', 'member1', 'x', 'approved')
+        """
+    )
+    db.commit()
+
+
+def measure(html):
+    return {
+        "html": len(html),
+        "gzip": len(gzip.compress(html, compresslevel=6, mtime=0)),
+        "style": sum(len(m) for m in INLINE_STYLE.findall(html.decode("utf-8"))),
+        "script": sum(len(m) for m in INLINE_SCRIPT.findall(html.decode("utf-8"))),
+        "linked": [a or b for a, b in LINKED.findall(html.decode("utf-8"))],
+    }
+
+
+if __name__ == "__main__":
+    arkonix.app.logger.disabled = True
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        seed(db)
+        db.close()
+
+    client = arkonix.app.test_client()
+    totals = {"html": 0, "gzip": 0, "style": 0, "script": 0}
+
+    print(f"{'страница':34} {'HTML':>8} {'gzip':>7} {'<style>':>8} {'<script>':>9}  файлы")
+    for session_data, url in MAIN_PAGES:
+        with client.session_transaction() as session:
+            session.clear()
+            session.update(session_data or {})
+
+        response = client.get(url)
+        label = f"{(session_data or {}).get('role', 'guest')} {url}"
+        if response.status_code != 200:
+            print(f"{label:34} ❌ {response.status_code}")
+            continue
+
+        weight = measure(response.get_data())
+        for name in totals:
+            totals[name] += weight[name]
+        print(
+            f"{label:34} {weight['html']:8} {weight['gzip']:7} "
+            f"{weight['style']:8} {weight['script']:9}  {len(weight['linked'])}"
+        )
+
+    print(
+        f"{'итого':34} {totals['html']:8} {totals['gzip']:7} "
+        f"{totals['style']:8} {totals['script']:9}"
+    )
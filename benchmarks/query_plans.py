@@ -0,0 +1,275 @@
+"""
+Проверка планов горячих запросов: страницы открываются через test_client на
+синтетических данных, каждый выполненный SELECT прогоняется через
+EXPLAIN QUERY PLAN. Любой просмотр таблицы (SCAN, в том числе по индексу —
+это тоже полный обход) или сортировка во временном B-дереве (USE TEMP B-TREE)
+считаются регрессией — код выхода 1. Исключения перечислены явно в
+ALLOWED_SCANS.
+
+Запуск: python benchmarks/query_plans.py [-v]
+В CI — отдельным шагом после установки зависимостей (из корня репозитория):
+    python benchmarks/query_plans.py
+Ненулевой код выхода роняет сборку; -v печатает планы всех запросов.
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="arkonix_bench_")
+os.environ["ARKONIX_DATABASE"] = os.path.join(TMP_DIR, "bench.db")
+os.chdir(TMP_DIR)
+
+import app as arkonix  # noqa: E402
+
+ADMIN = {"user_id": 1, "username": "admin", "role": "admin"}
+CLIENT = {"user_id": 2, "username": "client", "role": "client"}
+STAFF = {"staff_member_id": 1, "username": "member1", "role": "staff"}
+
+# (сессия, метод, адрес, данные формы)
+HOT_PAGES = [
+    (None, "GET", "/", None),
+    (None, "GET", "/api/reviews?before=500", None),
+    (ADMIN, "GET", "/profile", None),
+    (ADMIN, "GET", "/admin/payments?format=json", None),
+    (ADMIN, "GET", "/admin/payments?format=json&status=pending", None),
+    (ADMIN, "GET", "/admin/payments/staff?format=json", None),
+    (ADMIN, "GET", "/admin/payments/staff?format=json&member_id=1", None),
+    (ADMIN, "GET", "/admin/team?format=json", None),
+    (ADMIN, "GET", "/admin/team?format=json&status=pending", None),
+    (ADMIN, "GET", "/admin/archive?format=json", None),
+    (ADMIN, "GET", "/admin/archive?format=json&category=Договоры", None),
+    (ADMIN, "GET", "/admin/all_documents", None),
+    (ADMIN, "GET", "/admin/all_documents?status=approved", None),
+    (ADMIN, "GET", "/admin/reviews?format=json&rating=5", None),
+    (ADMIN, "GET", "/api/chat/1/messages", None),
+    (ADMIN, "GET", "/api/chat/1/messages?before=1000", None),
+    (CLIENT, "GET", "/profile", None),
+    (STAFF, "GET", "/staff/profile", None),
+    (STAFF, "GET", "/staff/payments", None),
+    (None, "POST", "/staff/login", {"username": "member1", "password": "x"}),
+    (None, "POST", "/login", {"username": "member1", "password": "x"}),
+]
+
+# Таблицы-счётчики: в них по строке на статус или категорию, просмотр дешевле индекса
+SMALL_TABLES = {
+    "ledger_stats",
+    "archive_stats",
+    "review_stats",
+    "chat_counters",
+    "admin_payment_card",
+}
+
+
+# Обходы, которые нужны намеренно: (шаг плана, текст запроса от FROM до конца).
+# Совпадение по тексту целиком — новый WHERE или другой порядок сюда не попадут.
+ALLOWED_SCANS = {
+    # главная: последние отзывы по rowid, обход останавливается на LIMIT
+    ("SCAN reviews", "FROM reviews ORDER BY id DESC LIMIT 7"),
+    # доска админа показывает все чаты; порядок даёт индекс, без сортировки
+    (
+        "SCAN cs USING INDEX idx_chat_summary_board",
+        "FROM chat_summary cs JOIN chats ON chats.id = cs.chat_id "
+        "JOIN users ON users.id = chats.client_id "
+        "ORDER BY cs.status_rank, cs.last_activity_at DESC",
+    ),
+    # первые страницы журналов: обход индекса по дате до LIMIT
+    (
+        "SCAN payments USING INDEX idx_payments_date",
+        "FROM payments JOIN users ON users.id = payments.client_id "
+        "JOIN chats ON chats.id = payments.chat_id "
+        "ORDER BY payments.payment_date DESC, payments.id DESC LIMIT 51",
+    ),
+    (
+        "SCAN sp USING INDEX idx_staff_payments_date",
+        "FROM staff_payments sp JOIN team_members tm ON tm.id = sp.member_id "
+        "JOIN users u ON u.id = sp.paid_by "
+        "ORDER BY sp.created_at DESC, sp.id DESC LIMIT 51",
+    ),
+    (
+        "SCAN team_members USING INDEX idx_team_members_created",
+        "FROM team_members ORDER BY created_at DESC, id DESC LIMIT 51",
+    ),
+    (
+        "SCAN tm USING INDEX idx_team_members_review_order",
+        "FROM team_members tm ORDER BY CASE tm.status WHEN 'pending' THEN 1 "
+        "WHEN 'approved' THEN 2 WHEN 'rejected' THEN 3 END, "
+        "tm.created_at DESC, tm.id DESC LIMIT 20 OFFSET 0",
+    ),
+    # список всех участников для выбора получателя зачисления
+    (
+        "SCAN team_members USING INDEX idx_team_members_roster",
+        "FROM team_members ORDER BY CASE status WHEN 'approved' THEN 1 "
+        "WHEN 'pending' THEN 2 WHEN 'rejected' THEN 3 END, first_name, last_name",
+    ),
+    # счётчики по статусам и итог по всем участникам — по покрывающему индексу
+    (
+        "SCAN team_members USING COVERING INDEX idx_team_members_status_earned",
+        "FROM team_members GROUP BY status",
+    ),
+    (
+        "SCAN tm USING COVERING INDEX idx_team_members_created",
+        "FROM staff_documents sd WHERE sd.member_id = tm.id )), 0) AS additional "
+        "FROM team_members tm",
+    ),
+}
+
+
+def allowed_scan(step, statement):
+    return any(
+        step == allowed_step and statement.endswith(tail)
+        for allowed_step, tail in ALLOWED_SCANS
+    )
+
+
+def seed(db, rnd, clients=200, chats=2000, messages=20000, members=300):
+    db.executemany(
+        "INSERT INTO users (username, password, role) VALUES (?, 'x', 'client')",
+        [(f"client{i}",) for i in range(clients)],
+    )
+    db.executemany(
+        "INSERT INTO chats (client_id, service_name, status) VALUES (?, 'bench', ?)",
+        [(rnd.randint(2, clients), rnd.choice(("waiting", "active"))) for _ in range(chats)],
+    )
+    db.executemany(
+        "INSERT INTO messages (chat_id, sender_id, text) VALUES (?, 1, 'текст')",
+        [(rnd.randint(1, chats),) for _ in range(messages)],
+    )
+    db.executemany(
+        """
+        INSERT INTO payments (chat_id, client_id, amount, card_number, status)
+        VALUES (?, ?, 10, '4111', ?)
+        """,
+        [
+            (rnd.randint(1, chats), rnd.randint(2, clients),
+             rnd.choice(("pending", "completed", "rejected")))
+            for _ in range(chats)
+        ],
+    )
+    db.executemany(
+        """
+        INSERT INTO team_members
+            (first_name, last_name, position, contract_filename,
+             username, password, status, total_earned)
+        VALUES ('Member', ?, 'dev', ?, ?, 'x', ?, ?)
+        """,
+        [
+            (str(i), f"c{i}.pdf", f"member{i + 1}",
+             rnd.choice(("pending", "approved", "rejected")), rnd.randint(0, 1000))
+            for i in range(members)
+        ],
+    )
+    db.executemany(
+        """
+        INSERT INTO staff_payments (member_id, amount, description, paid_by)
+        VALUES (?, 10, 'bench', 1)
+        """,
+        [(rnd.randint(1, members),) for _ in range(members * 5)],
+    )
+    db.executemany(
+        """
+        INSERT INTO staff_documents (member_id, document_name, document_type, filename)
+        VALUES (?, 'doc', 'other', ?)
+        """,
+        [(rnd.randint(1, members), f"d{i}.pdf") for i in range(members * 3)],
+    )
+    db.executemany(
+        """
+        INSERT INTO company_archive (title, category, filename, uploaded_by, is_public)
+        VALUES ('doc', ?, ?, 1, ?)
+        """,
+        [
+            (rnd.choice(arkonix.ARCHIVE_CATEGORIES), f"a{i}.pdf", rnd.choice((0, 1)))
+            for i in range(1000)
+        ],
+    )
+    db.executemany(
+        "INSERT INTO reviews (user_name, rating, text) VALUES ('bench', ?, 'отзыв')",
+        [(rnd.randint(1, 5),) for _ in range(1000)],
+    )
+    db.commit()
+
+
+def capture_statements():
+    """Записывать SQL всех соединений пула (параметры уже подставлены)"""
+    statements = []
+    pool = arkonix.get_db_pool()
+    acquire = pool.acquire
+
+    def traced_acquire():
+        conn = acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    pool.acquire = traced_acquire
+    return statements
+
+
+def plan_problems(db, statement):
+    plan = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    # SCAN/SEARCH <таблица> [AS псевдоним] ...
+    tables = {
+        step.split()[1]
+        for step in plan
+        if step.startswith(("SCAN ", "SEARCH ")) and step != "SCAN CONSTANT ROW"
+    }
+    if tables <= SMALL_TABLES:
+        return plan, []
+
+    sorts = [step for step in plan if step.startswith("USE TEMP B-TREE")]
+    normalized = " ".join(statement.split())
+    scans = [
+        step
+        for step in plan
+        if step.startswith("SCAN ")
+        and step != "SCAN CONSTANT ROW"
+        and step.split()[1] not in SMALL_TABLES
+        and not allowed_scan(step, normalized)
+    ]
+    return plan, sorts + scans
+
+
+if __name__ == "__main__":
+    verbose = "-v" in sys.argv[1:]
+    arkonix.app.logger.disabled = True
+
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        seed(db, random.Random(42))
+
+    statements = capture_statements()
+    client = arkonix.app.test_client()
+    failures = 0
+
+    with arkonix.app.app_context():
+        db = arkonix.get_db()
+        for session_data, method, url, data in HOT_PAGES:
+            with client.session_transaction() as session:
+                session.clear()
+                session.update(session_data or {})
+
+            statements.clear()
+            response = client.open(url, method=method, data=data)
+            selects = list(dict.fromkeys(
+                s for s in statements if s.lstrip().upper().startswith(("SELECT", "WITH"))
+            ))
+
+            print(f"{method} {url} → {response.status_code}, запросов: {len(selects)}")
+            if not selects:
+                print("  ❌ страница не выполнила ни одного запроса (проверьте сессию)")
+                failures += 1
+
+            for statement in selects:
+                plan, problems = plan_problems(db, statement)
+                if problems or verbose:
+                    print("  " + " ".join(statement.split())[:160])
+                    for step in plan:
+                        print(f"    {'❌' if step in problems else '  '} {step}")
+                failures += bool(problems)
+
+    print(f"\n{'✅ Регрессий нет' if not failures else f'❌ Регрессий: {failures}'}")
+    sys.exit(1 if failures else 0)
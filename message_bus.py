@@ -0,0 +1,104 @@
+"""
+Шина сообщений Socket.IO для нескольких воркеров.
+
+ARKONIX_SOCKETIO_QUEUE задаёт бэкенд:
+  ""                       — без шины, один процесс (как раньше)
+  "redis://...", "amqp://" — стандартные менеджеры python-socketio
+  "sqlite:///путь/к/bus.db" — локальный брокер на SQLite, без внешних сервисов
+"""
+
+import sqlite3
+import threading
+import time
+
+from socketio import PubSubManager
+
+
+class SQLiteManager(PubSubManager):
+    """
+    Pub/sub для Socket.IO поверх общей SQLite-базы: воркеры пишут события
+    в таблицу socketio_bus, каждый воркер опрашивает её и раздаёт события
+    своим клиентам. Подходит для нескольких процессов на одной машине.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        url="sqlite:///socketio_bus.db",
+        channel="flask-socketio",
+        write_only=False,
+        logger=None,
+        poll_interval=0.02,
+        retention=60,
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._publish_lock = threading.Lock()
+        self._publish_conn = None
+        self._last_prune = 0
+        self._connect().close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS socketio_bus (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """)
+        conn.commit()
+        return conn
+
+    def _publish(self, data):
+        now = time.time()
+        with self._publish_lock:
+            if self._publish_conn is None:
+                self._publish_conn = self._connect()
+            conn = self._publish_conn
+            conn.execute(
+                "INSERT INTO socketio_bus (channel, payload, created_at) VALUES (?, ?, ?)",
+                (self.channel, self.json.dumps(data), now),
+            )
+            # старые события уже разосланы всем воркерам — чистим раз в retention
+            if now - self._last_prune > self.retention:
+                conn.execute(
+                    "DELETE FROM socketio_bus WHERE created_at < ?",
+                    (now - self.retention,),
+                )
+                self._last_prune = now
+            conn.commit()
+
+    def _listen(self):
+        conn = self._connect()
+        last_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM socketio_bus"
+        ).fetchone()[0]
+
+        while True:
+            rows = conn.execute(
+                "SELECT id, payload FROM socketio_bus WHERE channel = ? AND id > ? ORDER BY id",
+                (self.channel, last_id),
+            ).fetchall()
+
+            for row_id, payload in rows:
+                last_id = row_id
+                yield payload
+
+            if not rows:
+                self.server.sleep(self.poll_interval)
+
+
+def socketio_queue_options(url, write_only=False):
+    """Параметры для SocketIO(...) по адресу шины сообщений"""
+    if not url:
+        return {}
+    if url.startswith("sqlite://"):
+        return {"client_manager": SQLiteManager(url, write_only=write_only)}
+    return {"message_queue": url}
@@ -0,0 +1,1053 @@
+"""
+Схема базы данных и её миграции.
+
+Миграции пронумерованы и применяются по порядку один раз; номер применённой
+записывается в таблицу schema_version. При запуске приложения сравнивается
+только версия (см. init_db в app.py); init_db.py создаёт базу теми же миграциями.
+Новые изменения схемы — только новой миграцией в конце MIGRATIONS.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки
+    fcntl = None
+
+
+CHAT_SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_summary (
+    chat_id INTEGER PRIMARY KEY,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_id INTEGER,
+    last_message_text TEXT,
+    last_activity_at TIMESTAMP,
+    status_rank INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (chat_id) REFERENCES chats(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_summary_board
+    ON chat_summary(status_rank, last_activity_at DESC);
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_summary_chat_insert
+AFTER INSERT ON chats
+BEGIN
+    INSERT OR REPLACE INTO chat_summary (chat_id, message_count, last_activity_at, status_rank)
+    VALUES (NEW.id, 0, NEW.created_at, CASE WHEN NEW.status = 'waiting' THEN 0 ELSE 1 END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_summary_chat_status
+AFTER UPDATE OF status ON chats
+WHEN NEW.status IS NOT OLD.status
+BEGIN
+    UPDATE chat_summary
+    SET status_rank = CASE WHEN NEW.status = 'waiting' THEN 0 ELSE 1 END
+    WHERE chat_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_summary_chat_delete
+AFTER DELETE ON chats
+BEGIN
+    DELETE FROM chat_summary WHERE chat_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_summary_message_insert
+AFTER INSERT ON messages
+BEGIN
+    UPDATE chat_summary
+    SET message_count = message_count + 1,
+        last_message_id = NEW.id,
+        last_message_text = NEW.text,
+        last_activity_at = NEW.created_at
+    WHERE chat_id = NEW.chat_id;
+END;
+"""
+
+
+def rebuild_chat_summary(conn):
+    """Полностью пересчитать chat_summary по таблицам chats и messages"""
+    conn.execute("DELETE FROM chat_summary")
+    conn.execute("""
+        INSERT INTO chat_summary
+            (chat_id, message_count, last_message_id, last_message_text,
+             last_activity_at, status_rank)
+        SELECT
+            chats.id,
+            COALESCE(stats.message_count, 0),
+            last.id,
+            last.text,
+            COALESCE(last.created_at, chats.created_at),
+            CASE WHEN chats.status = 'waiting' THEN 0 ELSE 1 END
+        FROM chats
+        LEFT JOIN (
+            SELECT chat_id, COUNT(*) as message_count, MAX(id) as last_id
+            FROM messages
+            GROUP BY chat_id
+        ) stats ON stats.chat_id = chats.id
+        LEFT JOIN messages last ON last.id = stats.last_id
+    """)
+
+
+CHAT_COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_counters (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL DEFAULT 0,
+    waiting INTEGER NOT NULL DEFAULT 0,
+    in_progress INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    payment_pending INTEGER NOT NULL DEFAULT 0,
+    awaiting_confirmation INTEGER NOT NULL DEFAULT 0,
+    paid INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO chat_counters (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_counters_insert
+AFTER INSERT ON chats
+BEGIN
+    UPDATE chat_counters SET
+        total = total + 1,
+        waiting = waiting + (NEW.status IS 'waiting'),
+        in_progress = in_progress + (NEW.status IS 'in_progress'),
+        completed = completed + (NEW.status IS 'completed'),
+        cancelled = cancelled + (NEW.status IS 'cancelled'),
+        payment_pending = payment_pending + (NEW.payment_status IS 'pending'),
+        awaiting_confirmation = awaiting_confirmation + (NEW.payment_status IS 'awaiting_confirmation'),
+        paid = paid + (NEW.payment_status IS 'paid')
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_counters_update
+AFTER UPDATE OF status, payment_status ON chats
+WHEN NEW.status IS NOT OLD.status OR NEW.payment_status IS NOT OLD.payment_status
+BEGIN
+    UPDATE chat_counters SET
+        waiting = waiting - (OLD.status IS 'waiting') + (NEW.status IS 'waiting'),
+        in_progress = in_progress - (OLD.status IS 'in_progress') + (NEW.status IS 'in_progress'),
+        completed = completed - (OLD.status IS 'completed') + (NEW.status IS 'completed'),
+        cancelled = cancelled - (OLD.status IS 'cancelled') + (NEW.status IS 'cancelled'),
+        payment_pending = payment_pending - (OLD.payment_status IS 'pending') + (NEW.payment_status IS 'pending'),
+        awaiting_confirmation = awaiting_confirmation - (OLD.payment_status IS 'awaiting_confirmation') + (NEW.payment_status IS 'awaiting_confirmation'),
+        paid = paid - (OLD.payment_status IS 'paid') + (NEW.payment_status IS 'paid')
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_counters_delete
+AFTER DELETE ON chats
+BEGIN
+    UPDATE chat_counters SET
+        total = total - 1,
+        waiting = waiting - (OLD.status IS 'waiting'),
+        in_progress = in_progress - (OLD.status IS 'in_progress'),
+        completed = completed - (OLD.status IS 'completed'),
+        cancelled = cancelled - (OLD.status IS 'cancelled'),
+        payment_pending = payment_pending - (OLD.payment_status IS 'pending'),
+        awaiting_confirmation = awaiting_confirmation - (OLD.payment_status IS 'awaiting_confirmation'),
+        paid = paid - (OLD.payment_status IS 'paid')
+    WHERE id = 1;
+END;
+"""
+
+CHAT_COUNTERS_QUERY = """
+    SELECT
+        COUNT(*) as total,
+        COALESCE(SUM(status IS 'waiting'), 0) as waiting,
+        COALESCE(SUM(status IS 'in_progress'), 0) as in_progress,
+        COALESCE(SUM(status IS 'completed'), 0) as completed,
+        COALESCE(SUM(status IS 'cancelled'), 0) as cancelled,
+        COALESCE(SUM(payment_status IS 'pending'), 0) as payment_pending,
+        COALESCE(SUM(payment_status IS 'awaiting_confirmation'), 0) as awaiting_confirmation,
+        COALESCE(SUM(payment_status IS 'paid'), 0) as paid
+    FROM chats
+"""
+
+CHAT_COUNTER_COLUMNS = [
+    "total",
+    "waiting",
+    "in_progress",
+    "completed",
+    "cancelled",
+    "payment_pending",
+    "awaiting_confirmation",
+    "paid",
+]
+
+
+def rebuild_chat_counters(conn):
+    """Пересчитать chat_counters по таблице chats"""
+    conn.execute("DELETE FROM chat_counters")
+    conn.execute(
+        f"INSERT INTO chat_counters (id, {', '.join(CHAT_COUNTER_COLUMNS)}) "
+        f"SELECT 1, * FROM ({CHAT_COUNTERS_QUERY})"
+    )
+
+
+def verify_chat_counters(conn):
+    """Сравнить chat_counters с реальными данными, вернуть расхождения"""
+    actual = conn.execute(CHAT_COUNTERS_QUERY).fetchone()
+    stored = conn.execute(
+        f"SELECT {', '.join(CHAT_COUNTER_COLUMNS)} FROM chat_counters WHERE id = 1"
+    ).fetchone()
+
+    mismatches = {}
+    for index, column in enumerate(CHAT_COUNTER_COLUMNS):
+        stored_value = stored[index] if stored else None
+        if stored_value != actual[index]:
+            mismatches[column] = {"stored": stored_value, "actual": actual[index]}
+    return mismatches
+
+
+STAFF_VERSION_SCHEMA = """
+CREATE TRIGGER IF NOT EXISTS trg_staff_version_member
+AFTER UPDATE OF status, total_earned ON team_members
+BEGIN
+    UPDATE team_members SET version = version + 1 WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_staff_version_payment_insert
+AFTER INSERT ON staff_payments
+BEGIN
+    UPDATE team_members SET version = version + 1 WHERE id = NEW.member_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_staff_version_payment_delete
+AFTER DELETE ON staff_payments
+BEGIN
+    UPDATE team_members SET version = version + 1 WHERE id = OLD.member_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_staff_version_document_insert
+AFTER INSERT ON staff_documents
+BEGIN
+    UPDATE team_members SET version = version + 1 WHERE id = NEW.member_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_staff_version_document_delete
+AFTER DELETE ON staff_documents
+BEGIN
+    UPDATE team_members SET version = version + 1 WHERE id = OLD.member_id;
+END;
+"""
+
+
+# Полнотекстовый поиск по сообщениям: текст и имя вложения (external content)
+MESSAGES_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text,
+    attachment_filename,
+    content='messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert
+AFTER INSERT ON messages
+BEGIN
+    INSERT INTO messages_fts (rowid, text, attachment_filename)
+    VALUES (NEW.id, NEW.text, NEW.attachment_filename);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete
+AFTER DELETE ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text, attachment_filename)
+    VALUES ('delete', OLD.id, OLD.text, OLD.attachment_filename);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update
+AFTER UPDATE OF text, attachment_filename ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text, attachment_filename)
+    VALUES ('delete', OLD.id, OLD.text, OLD.attachment_filename);
+    INSERT INTO messages_fts (rowid, text, attachment_filename)
+    VALUES (NEW.id, NEW.text, NEW.attachment_filename);
+END;
+"""
+
+
+def rebuild_messages_fts(conn):
+    """Пересобрать индекс messages_fts по таблице messages"""
+    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+
+
+# Хранилище файлов по содержимому; refcount ведут триггеры таблиц с blob_id
+BLOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_blobs_unused ON blobs(refcount, last_used_at);
+"""
+
+
+def blob_refcount_schema(table):
+    """Триггеры счётчика ссылок blobs для таблицы со столбцом blob_id"""
+    return f"""
+CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_insert
+AFTER INSERT ON {table}
+WHEN NEW.blob_id IS NOT NULL
+BEGIN
+    UPDATE blobs SET refcount = refcount + 1 WHERE id = NEW.blob_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_update
+AFTER UPDATE OF blob_id ON {table}
+WHEN NEW.blob_id IS NOT OLD.blob_id
+BEGIN
+    UPDATE blobs SET refcount = refcount - 1 WHERE id = OLD.blob_id;
+    UPDATE blobs SET refcount = refcount + 1 WHERE id = NEW.blob_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_delete
+AFTER DELETE ON {table}
+WHEN OLD.blob_id IS NOT NULL
+BEGIN
+    UPDATE blobs SET refcount = refcount - 1 WHERE id = OLD.blob_id;
+END;
+"""
+
+
+# Докачиваемые загрузки: принятые байты лежат в uploads/partial/<id>
+UPLOAD_SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    params TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    received INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_updated ON upload_sessions(updated_at);
+"""
+
+
+# Итоги по платежам для админских списков: COUNT/SUM без прохода по таблицам
+LEDGER_STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_stats (
+    ledger TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    amount REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (ledger, status)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_staff_payments_insert
+AFTER INSERT ON staff_payments
+BEGIN
+    INSERT INTO ledger_stats (ledger, status, count, amount)
+    VALUES ('staff_payments', '', 1, NEW.amount)
+    ON CONFLICT (ledger, status) DO UPDATE SET
+        count = count + 1,
+        amount = amount + excluded.amount;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_staff_payments_update
+AFTER UPDATE OF amount ON staff_payments
+BEGIN
+    UPDATE ledger_stats SET amount = amount - OLD.amount + NEW.amount
+    WHERE ledger = 'staff_payments' AND status = '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_staff_payments_delete
+AFTER DELETE ON staff_payments
+BEGIN
+    UPDATE ledger_stats SET count = count - 1, amount = amount - OLD.amount
+    WHERE ledger = 'staff_payments' AND status = '';
+END;
+"""
+
+LEDGER_PAYMENTS_SCHEMA = """
+CREATE TRIGGER IF NOT EXISTS trg_ledger_payments_insert
+AFTER INSERT ON payments
+BEGIN
+    INSERT INTO ledger_stats (ledger, status, count, amount)
+    VALUES ('payments', COALESCE(NEW.status, ''), 1, NEW.amount)
+    ON CONFLICT (ledger, status) DO UPDATE SET
+        count = count + 1,
+        amount = amount + excluded.amount;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_payments_update
+AFTER UPDATE OF status, amount ON payments
+BEGIN
+    UPDATE ledger_stats SET count = count - 1, amount = amount - OLD.amount
+    WHERE ledger = 'payments' AND status = COALESCE(OLD.status, '');
+
+    INSERT INTO ledger_stats (ledger, status, count, amount)
+    VALUES ('payments', COALESCE(NEW.status, ''), 1, NEW.amount)
+    ON CONFLICT (ledger, status) DO UPDATE SET
+        count = count + 1,
+        amount = amount + excluded.amount;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_payments_delete
+AFTER DELETE ON payments
+BEGIN
+    UPDATE ledger_stats SET count = count - 1, amount = amount - OLD.amount
+    WHERE ledger = 'payments' AND status = COALESCE(OLD.status, '');
+END;
+"""
+
+
+# Счётчики публичных документов архива по категориям: статистика за O(категорий)
+ARCHIVE_STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive_stats (
+    category TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    total_size INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_archive_stats_insert
+AFTER INSERT ON company_archive
+WHEN NEW.is_public = 1
+BEGIN
+    INSERT INTO archive_stats (category, count, total_size)
+    VALUES (NEW.category, 1, COALESCE(NEW.file_size, 0))
+    ON CONFLICT (category) DO UPDATE SET
+        count = count + 1,
+        total_size = total_size + excluded.total_size;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_archive_stats_update
+AFTER UPDATE OF category, file_size, is_public ON company_archive
+WHEN OLD.is_public = 1 OR NEW.is_public = 1
+BEGIN
+    UPDATE archive_stats
+    SET count = count - 1, total_size = total_size - COALESCE(OLD.file_size, 0)
+    WHERE category = OLD.category AND OLD.is_public = 1;
+
+    INSERT INTO archive_stats (category, count, total_size)
+    SELECT NEW.category, 1, COALESCE(NEW.file_size, 0)
+    WHERE NEW.is_public = 1
+    ON CONFLICT (category) DO UPDATE SET
+        count = count + 1,
+        total_size = total_size + excluded.total_size;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_archive_stats_delete
+AFTER DELETE ON company_archive
+WHEN OLD.is_public = 1
+BEGIN
+    UPDATE archive_stats
+    SET count = count - 1, total_size = total_size - COALESCE(OLD.file_size, 0)
+    WHERE category = OLD.category;
+END;
+"""
+
+ARCHIVE_STATS_QUERY = """
+    SELECT category, COUNT(*) as count, COALESCE(SUM(file_size), 0) as total_size
+    FROM company_archive
+    WHERE is_public = 1
+    GROUP BY category
+"""
+
+
+# Гистограмма оценок для главной страницы и /admin/reviews
+REVIEW_STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_stats (
+    rating INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_review_stats_insert
+AFTER INSERT ON reviews
+BEGIN
+    INSERT INTO review_stats (rating, count) VALUES (NEW.rating, 1)
+    ON CONFLICT (rating) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_review_stats_update
+AFTER UPDATE OF rating ON reviews
+BEGIN
+    UPDATE review_stats SET count = count - 1 WHERE rating = OLD.rating;
+    INSERT INTO review_stats (rating, count) VALUES (NEW.rating, 1)
+    ON CONFLICT (rating) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_review_stats_delete
+AFTER DELETE ON reviews
+BEGIN
+    UPDATE review_stats SET count = count - 1 WHERE rating = OLD.rating;
+END;
+"""
+
+
+def rebuild_ledger_stats(conn):
+    """Пересчитать ledger_stats по таблицам платежей"""
+    conn.execute("DELETE FROM ledger_stats")
+    conn.execute(
+        """
+        INSERT INTO ledger_stats (ledger, status, count, amount)
+        SELECT 'staff_payments', '', COUNT(*), COALESCE(SUM(amount), 0)
+        FROM staff_payments
+        """
+    )
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='payments'"
+    ).fetchone():
+        conn.execute(
+            """
+            INSERT INTO ledger_stats (ledger, status, count, amount)
+            SELECT 'payments', COALESCE(status, ''), COUNT(*), COALESCE(SUM(amount), 0)
+            FROM payments
+            GROUP BY COALESCE(status, '')
+            """
+        )
+
+
+def rebuild_archive_stats(conn):
+    """Пересчитать archive_stats по company_archive"""
+    conn.execute("DELETE FROM archive_stats")
+    conn.execute(
+        f"INSERT INTO archive_stats (category, count, total_size) {ARCHIVE_STATS_QUERY}"
+    )
+
+
+def rebuild_review_stats(conn):
+    """Пересчитать review_stats по reviews"""
+    conn.execute("DELETE FROM review_stats")
+    conn.execute(
+        """
+        INSERT INTO review_stats (rating, count)
+        SELECT rating, COUNT(*) FROM reviews GROUP BY rating
+        """
+    )
+
+
+# ==================== БАЗОВАЯ СХЕМА ====================
+# Объединение прежних init_db() из app.py и init_db.py
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    email TEXT,
+    role TEXT DEFAULT 'client',
+    name TEXT,
+    surname TEXT,
+    handle TEXT UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_name TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    service TEXT NOT NULL,
+    description TEXT,
+    status TEXT DEFAULT 'new',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER NOT NULL,
+    staff_id INTEGER,
+    service_name TEXT,
+    status TEXT DEFAULT 'waiting',
+    order_price REAL,
+    payment_status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_message_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (client_id) REFERENCES users(id),
+    FOREIGN KEY (staff_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    sender_id INTEGER NOT NULL,
+    text TEXT,
+    attachment_type TEXT,
+    attachment_filename TEXT,
+    attachment_size INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (chat_id) REFERENCES chats(id),
+    FOREIGN KEY (sender_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    client_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    card_number TEXT NOT NULL,
+    status TEXT DEFAULT 'pending',
+    payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (chat_id) REFERENCES chats(id),
+    FOREIGN KEY (client_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS admin_balance (
+    admin_id INTEGER PRIMARY KEY,
+    balance REAL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (admin_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS admin_payment_card (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_id INTEGER UNIQUE,
+    card_number TEXT NOT NULL,
+    card_holder TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (admin_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS payout_cards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_id INTEGER UNIQUE NOT NULL,
+    card_number TEXT NOT NULL,
+    card_holder TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (admin_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS team_members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    position TEXT NOT NULL,
+    contract_filename TEXT NOT NULL,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    email TEXT,
+    status TEXT DEFAULT 'pending',
+    total_earned REAL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS staff_documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id INTEGER NOT NULL,
+    document_name TEXT NOT NULL,
+    document_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    description TEXT,
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (member_id) REFERENCES team_members(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS staff_payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT,
+    paid_by INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (member_id) REFERENCES team_members(id) ON DELETE CASCADE,
+    FOREIGN KEY (paid_by) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS company_archive (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    category TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    file_type TEXT,
+    file_size INTEGER,
+    uploaded_by INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_public INTEGER DEFAULT 1,
+    FOREIGN KEY (uploaded_by) REFERENCES users(id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    avatar TEXT,
+    creator_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (creator_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    role TEXT DEFAULT 'member',
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(group_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS group_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INTEGER NOT NULL,
+    sender_id INTEGER NOT NULL,
+    message TEXT,
+    image TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_read INTEGER DEFAULT 0,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS private_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender_id INTEGER NOT NULL,
+    receiver_id INTEGER NOT NULL,
+    message TEXT,
+    image TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_read INTEGER DEFAULT 0,
+    FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (receiver_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    contact_id INTEGER NOT NULL,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (contact_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, contact_id)
+);
+"""
+
+# Столбцы, которых нет в базах, созданных прежним init_db() из app.py.
+# ALTER TABLE не умеет UNIQUE и неконстантные DEFAULT — они заменены индексом и NULL.
+BASE_COLUMNS = {
+    "users": [("name", "TEXT"), ("surname", "TEXT"), ("handle", "TEXT")],
+    "chats": [
+        ("order_price", "REAL DEFAULT NULL"),
+        ("payment_status", "TEXT DEFAULT 'pending'"),
+        ("last_message_at", "TIMESTAMP"),
+    ],
+    "messages": [
+        ("attachment_type", "TEXT"),
+        ("attachment_filename", "TEXT"),
+        ("attachment_size", "INTEGER"),
+    ],
+    "team_members": [("total_earned", "REAL DEFAULT 0")],
+}
+
+INDEXES_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_chats_client ON chats(client_id);
+CREATE INDEX IF NOT EXISTS idx_chats_status ON chats(status);
+CREATE INDEX IF NOT EXISTS idx_chats_payment ON chats(payment_status);
+
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages(chat_id);
+CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id);
+
+CREATE INDEX IF NOT EXISTS idx_payments_chat ON payments(chat_id);
+CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
+CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(payment_date);
+CREATE INDEX IF NOT EXISTS idx_payments_status_date ON payments(status, payment_date);
+
+CREATE INDEX IF NOT EXISTS idx_staff_payments_member ON staff_payments(member_id);
+CREATE INDEX IF NOT EXISTS idx_staff_payments_date ON staff_payments(created_at);
+CREATE INDEX IF NOT EXISTS idx_staff_payments_member_date
+    ON staff_payments(member_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_team_members_created ON team_members(created_at);
+CREATE INDEX IF NOT EXISTS idx_team_members_status_created
+    ON team_members(status, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_staff_docs_member ON staff_documents(member_id);
+CREATE INDEX IF NOT EXISTS idx_staff_docs_member_uploaded
+    ON staff_documents(member_id, uploaded_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_archive_category ON company_archive(category);
+CREATE INDEX IF NOT EXISTS idx_archive_public ON company_archive(is_public);
+CREATE INDEX IF NOT EXISTS idx_archive_date ON company_archive(created_at);
+CREATE INDEX IF NOT EXISTS idx_archive_public_date ON company_archive(is_public, created_at);
+CREATE INDEX IF NOT EXISTS idx_archive_category_date
+    ON company_archive(category, is_public, created_at);
+CREATE INDEX IF NOT EXISTS idx_archive_uploader ON company_archive(uploaded_by);
+
+CREATE INDEX IF NOT EXISTS idx_group_members_group ON group_members(group_id);
+CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members(user_id);
+CREATE INDEX IF NOT EXISTS idx_group_messages_group ON group_messages(group_id);
+CREATE INDEX IF NOT EXISTS idx_private_messages_sender ON private_messages(sender_id);
+CREATE INDEX IF NOT EXISTS idx_private_messages_receiver ON private_messages(receiver_id);
+"""
+
+# Индексы под запросы app.py (benchmarks/query_plans.py проверяет, что
+# планы этих запросов обходятся без полного просмотра таблиц и сортировки).
+# Выражения CASE повторяют ORDER BY запросов дословно — иначе SQLite их не узнает.
+QUERY_INDEXES_SCHEMA = """
+-- вход сотрудника и проверка занятости логина
+CREATE INDEX IF NOT EXISTS idx_team_members_username ON team_members(username);
+
+-- лучшие сотрудники на /admin/payments/staff
+CREATE INDEX IF NOT EXISTS idx_team_members_status_earned
+    ON team_members(status, total_earned);
+
+-- /admin/all_documents: сначала ожидающие, затем новые
+CREATE INDEX IF NOT EXISTS idx_team_members_review_order ON team_members(
+    (CASE status WHEN 'pending' THEN 1 WHEN 'approved' THEN 2 WHEN 'rejected' THEN 3 END),
+    created_at DESC,
+    id DESC
+);
+
+-- список сотрудников на /admin/payments/staff: сначала одобренные, по имени
+CREATE INDEX IF NOT EXISTS idx_team_members_roster ON team_members(
+    (CASE status WHEN 'approved' THEN 1 WHEN 'pending' THEN 2 WHEN 'rejected' THEN 3 END),
+    first_name,
+    last_name
+);
+
+-- /admin/reviews?rating=
+CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating);
+"""
+
+# Таблицы со ссылкой на хранилище файлов: таблица -> столбец с именем файла
+BLOB_TABLES = {
+    "team_members": "contract_filename",
+    "staff_documents": "filename",
+    "messages": "attachment_filename",
+    "company_archive": "filename",
+}
+
+
+def execute_script(conn, script):
+    """
+    Выполнить SQL-скрипт по одному оператору в текущей транзакции
+    (executescript сначала сам делает COMMIT)
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def table_exists(conn, name):
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+        ).fetchone()
+        is not None
+    )
+
+
+def add_columns(conn, table, columns):
+    """Добавить недостающие столбцы; вернуть имена добавленных"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    added = []
+    for column, declaration in columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+            print(f"✅ Добавлен столбец {table}.{column}")
+            added.append(column)
+    return added
+
+
+# ==================== МИГРАЦИИ ====================
+# Каждая миграция идемпотентна: базы, созданные до schema_version, уже могут
+# содержать часть объектов. migrate() выполняет миграцию и запись её номера
+# одной транзакцией, поэтому после сбоя она повторяется целиком, вместе с
+# заполнением новых таблиц.
+
+
+def migration_base_schema(conn):
+    execute_script(conn, BASE_SCHEMA)
+    for table, columns in BASE_COLUMNS.items():
+        if "handle" in add_columns(conn, table, columns):
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_handle ON users(handle)"
+            )
+
+    if not conn.execute("SELECT 1 FROM users WHERE username = 'admin'").fetchone():
+        conn.execute(
+            """
+            INSERT INTO users (username, password, email, role, name, surname, handle)
+            VALUES ('admin', 'admin123', 'admin@arkonix.com', 'admin',
+                    'Админ', 'Администраторов', 'admin_user')
+            """
+        )
+        print("✅ Создан админ: username='admin', password='admin123'")
+
+
+def migration_indexes(conn):
+    execute_script(conn, INDEXES_SCHEMA)
+
+
+def migration_chat_summary(conn):
+    # Сводка по чатам для админ-доски и счётчики для /api/chat_stats
+    summary_exists = table_exists(conn, "chat_summary")
+    execute_script(conn, CHAT_SUMMARY_SCHEMA)
+    if not summary_exists:
+        rebuild_chat_summary(conn)
+
+    counters_exist = table_exists(conn, "chat_counters")
+    execute_script(conn, CHAT_COUNTERS_SCHEMA)
+    if not counters_exist:
+        rebuild_chat_counters(conn)
+
+
+def migration_messages_fts(conn):
+    # Полнотекстовый индекс для /api/search/messages
+    conn.execute("SAVEPOINT messages_fts")
+    try:
+        fts_exists = table_exists(conn, "messages_fts")
+        execute_script(conn, MESSAGES_FTS_SCHEMA)
+        if not fts_exists:
+            rebuild_messages_fts(conn)
+        conn.execute("RELEASE messages_fts")
+    except sqlite3.OperationalError as e:
+        conn.execute("ROLLBACK TO messages_fts")
+        conn.execute("RELEASE messages_fts")
+        print(f"⚠️ Ошибка при создании messages_fts (нужен SQLite с FTS5): {e}")
+
+
+def migration_staff_version(conn):
+    # Версия профиля сотрудника для /api/staff/status (ETag)
+    add_columns(conn, "team_members", [("version", "INTEGER NOT NULL DEFAULT 0")])
+    execute_script(conn, STAFF_VERSION_SCHEMA)
+
+
+def migration_ledger_stats(conn):
+    # Итоги по платежам для /admin/payments и /admin/payments/staff
+    ledger_exists = table_exists(conn, "ledger_stats")
+    execute_script(conn, LEDGER_STATS_SCHEMA)
+    execute_script(conn, LEDGER_PAYMENTS_SCHEMA)
+    if not ledger_exists:
+        rebuild_ledger_stats(conn)
+
+
+def migration_blobs(conn):
+    # Хранилище загрузок: blob_id в строках, счётчики ссылок — триггерами
+    execute_script(conn, BLOBS_SCHEMA)
+    for table, column in BLOB_TABLES.items():
+        add_columns(conn, table, [("blob_id", "INTEGER REFERENCES blobs(id)")])
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})"
+        )
+        execute_script(conn, blob_refcount_schema(table))
+
+
+def migration_upload_sessions(conn):
+    execute_script(conn, UPLOAD_SESSIONS_SCHEMA)
+
+
+def migration_query_indexes(conn):
+    execute_script(conn, QUERY_INDEXES_SCHEMA)
+
+
+def migration_archive_stats(conn):
+    # Счётчики архива для /admin/archive и /api/archive/stats
+    stats_exist = table_exists(conn, "archive_stats")
+    execute_script(conn, ARCHIVE_STATS_SCHEMA)
+    if not stats_exist:
+        rebuild_archive_stats(conn)
+
+
+def migration_review_stats(conn):
+    # Средняя оценка и гистограмма для главной страницы
+    stats_exist = table_exists(conn, "review_stats")
+    execute_script(conn, REVIEW_STATS_SCHEMA)
+    if not stats_exist:
+        rebuild_review_stats(conn)
+
+
+MIGRATIONS = [
+    (1, "базовая схема и администратор", migration_base_schema),
+    (2, "индексы", migration_indexes),
+    (3, "сводка и счётчики чатов", migration_chat_summary),
+    (4, "полнотекстовый индекс сообщений", migration_messages_fts),
+    (5, "версия профиля сотрудника", migration_staff_version),
+    (6, "итоги по платежам", migration_ledger_stats),
+    (7, "хранилище файлов", migration_blobs),
+    (8, "сессии загрузки частями", migration_upload_sessions),
+    (9, "счётчики архива", migration_archive_stats),
+    (10, "индексы под запросы приложения", migration_query_indexes),
+    (11, "итоги по отзывам", migration_review_stats),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """Номер последней применённой миграции (0 для новой базы)"""
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+def migrate(conn):
+    """Применить недостающие миграции по порядку; вернуть их номера"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    current = schema_version(conn)
+
+    applied = []
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN")
+        try:
+            upgrade(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"✅ Миграция {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+@contextmanager
+def migration_lock(path):
+    """Одновременно стартующие воркеры применяют миграции по очереди"""
+    if fcntl is None or path == ":memory:":
+        yield
+        return
+
+    with open(f"{path}.migrate.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def upgrade_database(path):
+    """Привести базу по пути path к LATEST_VERSION; вернуть номера применённых миграций"""
+    with migration_lock(path):
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            return migrate(conn)
+        finally:
+            conn.close()
@@ -0,0 +1,511 @@
+'use strict';
+
+// Данные из data-атрибутов
+const chatDataEl = document.getElementById('chatData');
+if (!chatDataEl) {
+    console.error('Chat data element not found');
+}
+
+const chatId = parseInt(chatDataEl?.dataset.chatId || '0');
+const userId = parseInt(chatDataEl?.dataset.userId || '0');
+const senderName = chatDataEl?.dataset.senderName || 'Администратор';
+const currentUsername = chatDataEl?.dataset.username || 'Вы';
+const isAdmin = chatDataEl?.dataset.isAdmin === 'true';
+
+// Инициализация Socket.IO
+const socket = io();
+const messagesDiv = document.getElementById("messages");
+const messageForm = document.getElementById("messageForm");
+const messageInput = document.getElementById("messageInput");
+const sendBtn = document.getElementById("sendBtn");
+
+// Файлы
+const attachBtn = document.getElementById('attachBtn');
+const fileInput = document.getElementById('fileInput');
+const fileUploadContainer = document.getElementById('fileUploadContainer');
+const filePreview = document.getElementById('filePreview');
+const fileMessageInput = document.getElementById('fileMessageInput');
+const fileUploadBtn = document.getElementById('fileUploadBtn');
+const fileCancelBtn = document.getElementById('fileCancelBtn');
+
+let selectedFile = null;
+
+// Set для отслеживания уже добавленных сообщений
+const addedMessages = new Set();
+
+// Добавляем существующие сообщения в Set
+document.querySelectorAll('.message[data-message-id]').forEach(msg => {
+    const msgId = msg.getAttribute('data-message-id');
+    if (msgId) {
+        addedMessages.add(msgId);
+    }
+});
+
+// Подключение к комнате чата
+if (chatId > 0) {
+    socket.emit("join", { chat_id: chatId });
+}
+
+// Форматирование времени
+function formatTime(timestamp) {
+    if (!timestamp) return 'только что';
+    const date = new Date(timestamp);
+    if (isNaN(date.getTime())) return 'только что';
+
+    const now = new Date();
+    const diff = Math.floor((now - date) / 1000);
+
+    if (diff < 60) return 'только что';
+    if (diff < 3600) return `${Math.floor(diff / 60)} мин назад`;
+
+    const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+    const messageDate = new Date(date.getFullYear(), date.getMonth(), date.getDate());
+    const daysDiff = Math.floor((today - messageDate) / 86400000);
+
+    if (daysDiff === 0) {
+        return date.toLocaleTimeString('ru-RU', { hour: '2-digit', minute: '2-digit' });
+    } else if (daysDiff === 1) {
+        return `вчера ${date.toLocaleTimeString('ru-RU', { hour: '2-digit', minute: '2-digit' })}`;
+    } else {
+        return date.toLocaleDateString('ru-RU', { day: '2-digit', month: '2-digit' });
+    }
+}
+
+function updateTimestamps() {
+    document.querySelectorAll('.message-time').forEach(el => {
+        const timestamp = el.dataset.timestamp;
+        if (timestamp) {
+            el.textContent = formatTime(timestamp);
+        }
+    });
+}
+
+updateTimestamps();
+setInterval(updateTimestamps, 60000);
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function formatFileSize(bytes) {
+    if (bytes < 1024) return bytes + ' B';
+    if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
+    return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
+}
+
+function getFileType(filename) {
+    const ext = filename.split('.').pop().toLowerCase();
+    const imageExt = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp'];
+    const videoExt = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv', 'webm'];
+
+    if (imageExt.includes(ext)) return 'image';
+    if (videoExt.includes(ext)) return 'video';
+    return 'file';
+}
+
+function getFileIcon(fileType) {
+    switch (fileType) {
+        case 'image': return '🖼️';
+        case 'video': return '🎥';
+        default: return '📄';
+    }
+}
+
+// === РАБОТА С ФАЙЛАМИ ===
+
+attachBtn.addEventListener('click', () => {
+    fileInput.click();
+});
+
+fileInput.addEventListener('change', (e) => {
+    const file = e.target.files[0];
+    if (!file) return;
+
+    if (file.size > 50 * 1024 * 1024) {
+        alert('Файл слишком большой! Максимальный размер: 50 МБ');
+        fileInput.value = '';
+        return;
+    }
+
+    selectedFile = file;
+    showFilePreview(file);
+    fileUploadContainer.classList.add('active');
+    attachBtn.classList.add('active');
+});
+
+function showFilePreview(file) {
+    const fileType = getFileType(file.name);
+    const fileSize = formatFileSize(file.size);
+    const icon = getFileIcon(fileType);
+
+    filePreview.innerHTML = `
+        <div class="file-preview-icon">${icon}</div>
+        <div class="file-preview-info">
+            <div class="file-preview-name">${escapeHtml(file.name)}</div>
+            <div class="file-preview-size">${fileSize}</div>
+        </div>
+        <button type="button" class="file-remove-btn" onclick="cancelFileUpload()">✕</button>
+    `;
+}
+
+function cancelFileUpload() {
+    selectedFile = null;
+    fileInput.value = '';
+    fileUploadContainer.classList.remove('active');
+    attachBtn.classList.remove('active');
+    fileMessageInput.value = '';
+}
+
+fileCancelBtn.addEventListener('click', cancelFileUpload);
+
+fileUploadBtn.addEventListener('click', async () => {
+    if (!selectedFile) return;
+
+    const messageText = fileMessageInput.value.trim();
+    const formData = new FormData();
+    formData.append('file', selectedFile);
+    formData.append('text', messageText);
+
+    fileUploadBtn.disabled = true;
+    fileCancelBtn.disabled = true;
+    fileUploadBtn.textContent = 'Загрузка...';
+
+    try {
+        if (selectedFile.size > CHUNKED_UPLOAD_THRESHOLD) {
+            await chunkedUpload(selectedFile, {
+                target: 'chat',
+                chat_id: chatId,
+                text: messageText
+            }, (sent, total) => {
+                fileUploadBtn.textContent = `Загрузка... ${Math.round(sent * 100 / total)}%`;
+            });
+            cancelFileUpload();
+            return;
+        }
+
+        const response = await fetch(`/chat/${chatId}/upload`, {
+            method: 'POST',
+            body: formData
+        });
+
+        if (response.ok) {
+            cancelFileUpload();
+        } else {
+            const error = await response.json();
+            alert('Ошибка загрузки: ' + (error.error || 'Неизвестная ошибка'));
+        }
+    } catch (error) {
+        console.error('Upload error:', error);
+        alert('Ошибка при загрузке файла');
+    } finally {
+        fileUploadBtn.disabled = false;
+        fileCancelBtn.disabled = false;
+        fileUploadBtn.textContent = 'Отправить файл';
+    }
+});
+
+// Отправка текстового сообщения
+if (messageForm) {
+    messageForm.addEventListener("submit", (e) => {
+        e.preventDefault();
+        const text = messageInput.value.trim();
+
+        if (text && text.length > 0 && text.length <= 2000) {
+            sendBtn.disabled = true;
+            socket.emit("send_message", {
+                chat_id: chatId,
+                text: text
+            });
+            messageInput.value = "";
+
+            setTimeout(() => {
+                sendBtn.disabled = false;
+            }, 500);
+        }
+    });
+}
+
+// Построение DOM-элемента сообщения
+function buildMessageElement(data, messageId) {
+    const isMyMessage = data.sender_id === userId;
+    const messageDiv = document.createElement("div");
+    messageDiv.className = `message ${isMyMessage ? 'my-message' : 'other-message'}`;
+    messageDiv.setAttribute('data-message-id', messageId);
+
+    const avatarLetter = isMyMessage
+        ? (currentUsername && currentUsername.length > 0 ? currentUsername[0].toUpperCase() : 'Я')
+        : (senderName && senderName.length > 0 ? senderName[0].toUpperCase() : 'А');
+
+    const displayName = isMyMessage ? 'Вы' : (senderName || 'Администратор');
+    const timestamp = data.created_at || new Date().toISOString();
+
+    let attachmentHtml = '';
+
+    if (data.attachment_type && data.attachment_filename) {
+        const filename = data.attachment_filename;
+        const fileType = data.attachment_type;
+        const fileSize = data.formatted_size || formatFileSize(data.attachment_size || 0);
+
+        if (fileType === 'image') {
+            attachmentHtml = `
+                <div class="message-attachment">
+                    <img src="${data.thumbnail_url || `/chat/attachment/thumb/${filename}`}"
+                         srcset="/chat/attachment/thumb/${filename}?w=640 2x"
+                         class="attachment-image"
+                         alt="Изображение" loading="lazy" decoding="async"
+                         onclick="window.open('/chat/attachment/view/${filename}', '_blank')">
+                </div>
+            `;
+        } else if (fileType === 'video') {
+            attachmentHtml = `
+                <div class="message-attachment">
+                    <video controls class="attachment-video">
+                        <source src="/chat/attachment/view/${filename}">
+                        Ваш браузер не поддерживает видео.
+                    </video>
+                </div>
+            `;
+        } else {
+            const originalName = filename.split('_').slice(3).join('_') || filename;
+            attachmentHtml = `
+                <div class="message-attachment">
+                    <div class="attachment-file" onclick="window.open('/chat/attachment/${filename}', '_blank')">
+                        <div class="file-icon">📄</div>
+                        <div class="file-info">
+                            <div class="file-name">${escapeHtml(originalName)}</div>
+                            <div class="file-size">${fileSize}</div>
+                        </div>
+                    </div>
+                </div>
+            `;
+        }
+    }
+
+    const messageText = data.text ? `<div class="message-bubble">${escapeHtml(data.text)}</div>` : '';
+
+    messageDiv.innerHTML = `
+        <div class="message-avatar">${escapeHtml(avatarLetter)}</div>
+        <div class="message-content-wrapper">
+            <div class="message-header">
+                <span class="message-sender">${escapeHtml(displayName)}</span>
+                <span class="message-time" data-timestamp="${timestamp}">только что</span>
+            </div>
+            ${messageText}
+            ${attachmentHtml}
+        </div>
+    `;
+
+    return messageDiv;
+}
+
+// Получение нового сообщения
+socket.on("new_message", (data) => {
+    const messageId = data.id
+        ? `msg-${data.id}`
+        : `${data.sender_id}-${data.created_at || Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
+
+    if (addedMessages.has(messageId)) {
+        return;
+    }
+
+    addedMessages.add(messageId);
+
+    const messageDiv = buildMessageElement(data, messageId);
+
+    const emptyChat = messagesDiv?.querySelector('.empty-chat');
+    if (emptyChat) {
+        emptyChat.remove();
+    }
+
+    if (messagesDiv) {
+        messagesDiv.appendChild(messageDiv);
+        messagesDiv.scrollTop = messagesDiv.scrollHeight;
+    }
+    updateTimestamps();
+});
+
+// Подгрузка старой истории при прокрутке вверх
+let hasMoreMessages = messagesDiv?.dataset.hasMore === 'true';
+let oldestMessageId = parseInt(messagesDiv?.dataset.oldestId || '0');
+let isLoadingHistory = false;
+
+async function loadOlderMessages() {
+    if (!hasMoreMessages || isLoadingHistory || !oldestMessageId) return;
+    isLoadingHistory = true;
+
+    try {
+        const response = await fetch(`/api/chat/${chatId}/messages?before=${oldestMessageId}`);
+        if (!response.ok) return;
+
+        const result = await response.json();
+        const previousHeight = messagesDiv.scrollHeight;
+        const fragment = document.createDocumentFragment();
+
+        result.messages.forEach(msg => {
+            const messageId = `msg-${msg.id}`;
+            if (addedMessages.has(messageId)) return;
+            addedMessages.add(messageId);
+            fragment.appendChild(buildMessageElement(msg, messageId));
+        });
+
+        messagesDiv.insertBefore(fragment, messagesDiv.firstChild);
+        messagesDiv.scrollTop += messagesDiv.scrollHeight - previousHeight;
+
+        hasMoreMessages = result.has_more;
+        if (result.next_before) {
+            oldestMessageId = result.next_before;
+        }
+        updateTimestamps();
+    } catch (error) {
+        console.error('History load error:', error);
+    } finally {
+        isLoadingHistory = false;
+    }
+}
+
+if (messagesDiv) {
+    messagesDiv.addEventListener('scroll', () => {
+        if (messagesDiv.scrollTop < 150) {
+            loadOlderMessages();
+        }
+    });
+}
+
+// Обработка ошибок Socket.IO
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+});
+
+socket.on('error', (error) => {
+    console.error('Socket error:', error);
+});
+
+socket.on('disconnect', () => {
+    console.log('Socket disconnected');
+});
+
+socket.on('connect', () => {
+    console.log('Socket connected');
+    if (chatId > 0) {
+        socket.emit("join", { chat_id: chatId });
+    }
+});
+
+// Обновление цены в реальном времени
+socket.on('price_updated', (data) => {
+    if (data.chat_id === chatId) {
+        const priceContainer = document.getElementById('priceContainer');
+        if (priceContainer) {
+            priceContainer.innerHTML = `
+                <div class="price-display" id="priceValue">${escapeHtml(String(data.price))} $</div>
+            `;
+        }
+
+        const adminPriceSetter = document.getElementById('adminPriceSetter');
+        if (adminPriceSetter) {
+            adminPriceSetter.classList.add('hidden');
+        }
+
+        const clientActions = document.getElementById('clientActions');
+        if (clientActions && !isAdmin) {
+            clientActions.innerHTML = `
+                <a href="/payment/${chatId}" class="action-btn action-btn-primary">
+                    💳 Оплатить заказ
+                </a>
+            `;
+        }
+    }
+});
+
+// Уведомление об оплате
+socket.on('payment_completed', (data) => {
+    if (data.chat_id === chatId) {
+        const priceValue = document.getElementById('priceValue');
+        if (priceValue && !priceValue.nextElementSibling?.classList.contains('payment-badge')) {
+            priceValue.insertAdjacentHTML('afterend', '<span class="payment-badge">✓ Оплачено</span>');
+        }
+
+        const clientActions = document.getElementById('clientActions');
+        if (clientActions && !isAdmin) {
+            clientActions.innerHTML = `
+                <button class="action-btn action-btn-primary" disabled>
+                    ✓ Заказ оплачен
+                </button>
+            `;
+        }
+    }
+});
+
+// Установка цены (только для админа)
+if (isAdmin) {
+    const setPriceForm = document.getElementById('setPriceForm');
+    if (setPriceForm) {
+        setPriceForm.addEventListener('submit', async (e) => {
+            e.preventDefault();
+            const priceInputField = document.getElementById('priceInput');
+            const price = parseFloat(priceInputField.value);
+            const submitBtn = e.target.querySelector('.set-price-btn');
+
+            if (isNaN(price) || price < 0 || price > 999999) {
+                alert('Пожалуйста, введите корректную цену (от 0 до 999999)');
+                return;
+            }
+
+            submitBtn.disabled = true;
+            submitBtn.textContent = 'Устанавливаю...';
+
+            try {
+                const response = await fetch('/api/set_price', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({
+                        chat_id: chatId,
+                        price: price
+                    })
+                });
+
+                const result = await response.json();
+
+                if (response.ok) {
+                    priceInputField.value = '';
+                } else {
+                    alert('Ошибка: ' + (result.error || 'Не удалось установить цену'));
+                    submitBtn.disabled = false;
+                    submitBtn.textContent = 'Установить';
+                }
+            } catch (error) {
+                console.error('Error:', error);
+                alert('Ошибка при установке цены');
+                submitBtn.disabled = false;
+                submitBtn.textContent = 'Установить';
+            }
+        });
+    }
+}
+
+// Автоскролл при загрузке
+window.addEventListener('load', () => {
+    if (messagesDiv) {
+        messagesDiv.scrollTop = messagesDiv.scrollHeight;
+    }
+});
+
+// Фокус на поле ввода
+if (messageInput) {
+    messageInput.focus();
+}
+
+// Предотвращение множественных отправок
+let isSubmitting = false;
+if (messageForm) {
+    messageForm.addEventListener('submit', (e) => {
+        if (isSubmitting) {
+            e.preventDefault();
+            return false;
+        }
+    });
+}
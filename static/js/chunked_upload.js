@@ -0,0 +1,55 @@
+// Загрузка файла частями через /api/uploads с докачкой после обрыва связи.
+// chunkedUpload(file, {target: 'chat', chat_id, text} | {target: 'archive', title, category, description}, onProgress)
+// возвращает ответ /finalize — тот же, что у обычной загрузки.
+
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const CHUNKED_UPLOAD_RETRIES = 5;
+
+async function uploadJson(response) {
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok && response.status !== 409) {
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+    return data;
+}
+
+async function chunkedUpload(file, params, onProgress) {
+    const session = await uploadJson(await fetch('/api/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...params, filename: file.name, size: file.size })
+    }));
+
+    const url = `/api/uploads/${session.upload_id}`;
+    let offset = session.offset;
+    let failures = 0;
+
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + session.chunk_size);
+        try {
+            const result = await uploadJson(await fetch(`${url}?offset=${offset}`, {
+                method: 'PUT',
+                body: chunk
+            }));
+            offset = result.offset;
+            failures = 0;
+            if (onProgress) onProgress(offset, file.size);
+        } catch (error) {
+            // обрыв: спрашиваем сервер, сколько байт дошло, и продолжаем оттуда
+            if (++failures > CHUNKED_UPLOAD_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            try {
+                offset = (await uploadJson(await fetch(url))).offset;
+            } catch (_) {
+                // сервер ещё недоступен — следующая попытка с той же позиции
+            }
+        }
+    }
+
+    const response = await fetch(`${url}/finalize`, { method: 'POST' });
+    const result = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        throw new Error(result.error || `HTTP ${response.status}`);
+    }
+    return result;
+}
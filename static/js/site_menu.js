@@ -0,0 +1,70 @@
+// Бургер-меню и переключатель языков публичных страниц (главная, услуги, команда, обсуждения)
+
+document.addEventListener('DOMContentLoaded', function () {
+    const burgerMenu = document.getElementById('burgerMenu');
+    const nav = document.getElementById('nav');
+    const userPanel = document.getElementById('userPanel');
+    const menuOverlay = document.getElementById('menuOverlay');
+    const langBtn = document.getElementById('langBtn');
+    const langDropdown = document.getElementById('langDropdown');
+
+    // Переключатель языков
+    if (langBtn && langDropdown) {
+        langBtn.addEventListener('click', function (e) {
+            e.stopPropagation();
+            langDropdown.classList.toggle('active');
+        });
+
+        // Закрытие при клике вне меню
+        document.addEventListener('click', function (e) {
+            if (!langBtn.contains(e.target) && !langDropdown.contains(e.target)) {
+                langDropdown.classList.remove('active');
+            }
+        });
+    }
+
+    // Бургер-меню
+    if (burgerMenu) {
+        function toggleMenu() {
+            const isActive = burgerMenu.classList.contains('active');
+
+            burgerMenu.classList.toggle('active');
+            nav.classList.toggle('active');
+            if (userPanel) userPanel.classList.toggle('active');
+            menuOverlay.classList.toggle('active');
+
+            // Блокировка прокрутки
+            document.body.style.overflow = !isActive ? 'hidden' : '';
+        }
+
+        burgerMenu.addEventListener('click', function (e) {
+            e.stopPropagation();
+            toggleMenu();
+        });
+
+        menuOverlay.addEventListener('click', toggleMenu);
+
+        // Закрытие при клике на навигационные ссылки
+        nav.querySelectorAll('a').forEach(link => {
+            link.addEventListener('click', () => {
+                if (window.innerWidth <= 968) {
+                    toggleMenu();
+                }
+            });
+        });
+
+        // Закрытие при изменении размера экрана
+        window.addEventListener('resize', () => {
+            if (window.innerWidth > 968 && burgerMenu.classList.contains('active')) {
+                toggleMenu();
+            }
+        });
+
+        // Закрытие по ESC
+        document.addEventListener('keydown', function (e) {
+            if (e.key === 'Escape' && burgerMenu.classList.contains('active')) {
+                toggleMenu();
+            }
+        });
+    }
+});
@@ -0,0 +1,188 @@
+"""
+Сборка статики для flask build-static: копии файлов с отпечатком содержимого
+в имени, сжатые варианты (.gz, .br) и уменьшенные AVIF/WebP-копии изображений.
+
+Результат — папка сборки и manifest.json в ней (см. static_url в app.py).
+Модуль не тянет Flask; Pillow и brotli необязательны — без них пропускаются
+варианты изображений и .br.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+# (расширение, формат Pillow, качество) — в порядке предпочтения для <picture>
+IMAGE_FORMATS = (("avif", "AVIF", 50), ("webp", "WEBP", 80))
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(relpath, digest):
+    """css/style.css -> css/style.<отпечаток>.css"""
+    root, ext = os.path.splitext(relpath)
+    return f"{root}.{digest}{ext}"
+
+
+def write_file(path, data):
+    """Запись через временное имя, чтобы файл не отдали недописанным"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def fetch_vendor_assets(static_folder, vendor_assets):
+    """Скачать недостающие сторонние файлы {путь: url}; вернуть [(путь, ошибка)]"""
+    failed = []
+    for relpath, url in vendor_assets.items():
+        path = os.path.join(static_folder, relpath)
+        if os.path.exists(path):
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                write_file(path, response.read())
+        except OSError as e:
+            failed.append((relpath, e))
+    return failed
+
+
+def image_variants(source, relpath, output_folder, widths):
+    """
+    AVIF/WebP-копии изображения для каждой ширины (не больше исходной):
+    {"avif": [[ширина, путь], ...], "webp": [...]}. Неподдерживаемый Pillow
+    формат пропускается.
+    """
+    variants = {ext: [] for ext, _, _ in IMAGE_FORMATS}
+    root = os.path.splitext(relpath)[0]
+
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            transparent = "transparency" in image.info or image.mode in ("LA", "PA")
+            image = image.convert("RGBA" if transparent else "RGB")
+
+        for width in sorted({min(width, image.width) for width in widths}):
+            resized = image
+            if width < image.width:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+
+            for ext, image_format, quality in IMAGE_FORMATS:
+                buffer = io.BytesIO()
+                try:
+                    resized.save(buffer, image_format, quality=quality)
+                except (KeyError, OSError):
+                    continue
+                data = buffer.getvalue()
+                built = hashed_name(f"{root}.w{width}.{ext}", fingerprint(data))
+                write_file(os.path.join(output_folder, built), data)
+                variants[ext].append([width, built])
+
+    return {ext: entries for ext, entries in variants.items() if entries}
+
+
+def load_manifest(output_folder):
+    try:
+        with open(os.path.join(output_folder, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "images": {}}
+
+
+def build_assets(static_folder, output_folder, image_widths):
+    """
+    Собрать файлы static_folder в output_folder и записать манифест:
+    {"files": {путь: путь с отпечатком},
+     "images": {путь: {"source": путь с отпечатком, "widths": [...],
+                       "variants": {"avif": [[ширина, путь], ...], "webp": [...]}}}}.
+    Изображение с неизменным содержимым и ширинами повторно не перекодируется.
+    """
+    previous = load_manifest(output_folder)
+    manifest = {"files": {}, "images": {}}
+    output_folder = os.path.abspath(output_folder)
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(
+            d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_folder
+        )
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            relpath = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            ext = os.path.splitext(name)[1].lower()
+            with open(source, "rb") as f:
+                data = f.read()
+
+            built = hashed_name(relpath, fingerprint(data))
+            target = os.path.join(output_folder, built)
+            if not os.path.exists(target):
+                write_file(target, data)
+                if ext in COMPRESSIBLE_EXTENSIONS:
+                    write_file(f"{target}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        write_file(f"{target}.br", brotli.compress(data, quality=11))
+            manifest["files"][relpath] = built
+
+            if Image is None or ext not in IMAGE_EXTENSIONS:
+                continue
+            old = previous["images"].get(relpath)
+            if (
+                old
+                and old["source"] == built
+                and old["widths"] == list(image_widths)
+                and all(
+                    os.path.exists(os.path.join(output_folder, path))
+                    for entries in old["variants"].values()
+                    for _, path in entries
+                )
+            ):
+                manifest["images"][relpath] = old
+            else:
+                manifest["images"][relpath] = {
+                    "source": built,
+                    "widths": list(image_widths),
+                    "variants": image_variants(source, relpath, output_folder, image_widths),
+                }
+
+    write_file(
+        os.path.join(output_folder, MANIFEST_NAME),
+        json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8"),
+    )
+    return manifest
+
+
+def clean_assets(output_folder, manifest):
+    """Удалить из сборки файлы, на которые манифест больше не ссылается"""
+    keep = {MANIFEST_NAME}
+    for built in manifest["files"].values():
+        keep.update((built, f"{built}.gz", f"{built}.br"))
+    for image in manifest["images"].values():
+        for entries in image["variants"].values():
+            keep.update(path for _, path in entries)
+
+    removed = 0
+    for root, _, files in os.walk(output_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, output_folder).replace(os.sep, "/") not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
@@ -0,0 +1,45 @@
+"""
+Миниатюры изображений-вложений чата.
+
+render_thumbnails() выполняется в пуле процессов (см. get_thumbnail_pool в app.py),
+поэтому модуль не тянет Flask и базу — только Pillow.
+"""
+
+import os
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_MIMETYPE = "image/webp"
+
+
+def render_thumbnails(source, targets, quality=80):
+    """
+    Уменьшить изображение source до каждой ширины из targets [(ширина, путь)].
+    Файлы пишутся через временное имя, чтобы их не отдали недописанными.
+    Возвращает список созданных путей.
+    """
+    largest = max(width for width, _ in targets)
+
+    with Image.open(source) as original:
+        # JPEG декодируется сразу в уменьшенном масштабе (не меньше largest по обеим сторонам)
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+
+        if image.mode not in ("RGB", "RGBA"):
+            transparent = "transparency" in image.info or image.mode in ("LA", "PA")
+            image = image.convert("RGBA" if transparent else "RGB")
+
+        created = []
+        # от большей ширины к меньшей: каждая миниатюра уменьшается из предыдущей
+        for width, target in sorted(targets, reverse=True):
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+
+            tmp = f"{target}.{os.getpid()}.tmp"
+            image.save(tmp, THUMBNAIL_FORMAT, quality=quality)
+            os.replace(tmp, target)
+            created.append(target)
+
+    return created